@@ -0,0 +1,49 @@
+import random
+from pyrestriction.model import Account, SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation
+
+# This file generates synthetic accounts for the benchmarks.
+
+# Relative weight of each operation type in a generated account
+DEFAULT_MIX = {
+    "SavingOperation": 1,
+    "RegularSavingOperation": 1,
+    "DebtOperation": 1,
+    "RegularPaymentOperation": 1
+}
+
+def _saving_operation(rng):
+    return SavingOperation(rng.randint(1, 500))
+
+def _regular_saving_operation(rng):
+    total_amount = rng.randint(100, 10000)
+    return RegularSavingOperation(total_amount, rng.randint(1, 48), rng.randint(0, total_amount))
+
+def _debt_operation(rng):
+    total_amount = rng.randint(100, 10000)
+    return DebtOperation(total_amount, rng.randint(1, 48), rng.random() < 0.5, rng.randint(0, total_amount))
+
+def _regular_payment_operation(rng):
+    return RegularPaymentOperation(rng.randint(1, 200), rng.random() < 0.5)
+
+OPERATION_FACTORIES = {
+    "SavingOperation": _saving_operation,
+    "RegularSavingOperation": _regular_saving_operation,
+    "DebtOperation": _debt_operation,
+    "RegularPaymentOperation": _regular_payment_operation
+}
+
+def generate_account(nb_operations, mix=None, seed=0, current_amount=100000, regular_income=1000):
+    """
+    Return an Account with nb_operations random operations.
+    mix gives the relative weight of each operation type (DEFAULT_MIX by default).
+    The same seed always gives the same account.
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    types = list(mix)
+    weights = [mix[operation_type] for operation_type in types]
+
+    account = Account(current_amount, regular_income, "Generated account {0}".format(seed), "PND")
+    for operation_type in rng.choices(types, weights, k=nb_operations):
+        account.add_operation(OPERATION_FACTORIES[operation_type](rng))
+    return account
@@ -0,0 +1,175 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+from pyrestriction import io
+from pyrestriction.views import AccountView, TABLE
+from benchmarks.generator import generate_account
+
+# This file runs the benchmark suite.
+#
+#   python -m benchmarks.run [--quick] [--output results.json] [--baseline benchmarks/baseline.json]
+#
+# Each benchmark is timed (best of several runs) and its peak memory is measured with tracemalloc.
+# For the benchmarks run at several sizes, the scaling exponent between the smallest and the largest size
+# is also computed: 1 for a linear cost, 2 for a quadratic one.
+# When a baseline is given, the results are compared to it, and the run fails if a benchmark got slower
+# than the threshold allows, or if its scaling exponent grew.
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SIZES = {
+    "parse_account": [1000, 10000],
+    "write_account": [1000, 10000],
+    "next_chain": [100, 1000, 10000],
+    "render": [2, 1000],
+}
+QUICK_SIZES = {
+    "parse_account": [100, 1000],
+    "write_account": [100, 1000],
+    "next_chain": [100, 1000],
+    "render": [2, 100],
+}
+CHAIN_OPERATIONS = 20
+RENDER_OPERATIONS = 20
+
+def measure(function, repeat):
+    """Return the best time of repeat calls to function, and the peak memory it allocated"""
+    best = math.inf
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def _account_string(nb_operations):
+    buffer = StringIO()
+    io.write_account(generate_account(nb_operations), buffer)
+    return buffer.getvalue()
+
+def bench_parse_account(size):
+    account_string = _account_string(size)
+    def parse():
+        #Parse for real, not from the cache
+        io._memory_cache.clear()
+        io.parse_account(100000, account_string)
+    return parse
+
+def bench_write_account(size):
+    account = generate_account(size)
+    return lambda: io.write_account(account, StringIO())
+
+def bench_next_chain(size):
+    account = generate_account(CHAIN_OPERATIONS)
+    def chain():
+        accountperiod = account
+        for i in range(size):
+            accountperiod = accountperiod.next()
+        accountperiod.avaliable()
+    return chain
+
+def bench_render(size):
+    account = generate_account(RENDER_OPERATIONS)
+    return lambda: AccountView(account, size, TABLE, StringIO()).render()
+
+BENCHMARKS = {
+    "parse_account": bench_parse_account,
+    "write_account": bench_write_account,
+    "next_chain": bench_next_chain,
+    "render": bench_render,
+}
+
+def bench_cli_startup(repeat):
+    """Time a full run of the available command, from interpreter startup"""
+    with tempfile.TemporaryDirectory() as directory:
+        account_file = os.path.join(directory, "account.act")
+        with open(account_file, "w") as file:
+            file.write(_account_string(10))
+        command = [sys.executable, "-m", "pyrestriction.entrypoint", "available", account_file, "100000"]
+        best = math.inf
+        for i in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def run(sizes, repeat):
+    results = {"benchmarks": dict(), "scaling": dict()}
+    for name, benchmark_sizes in sizes.items():
+        for size in benchmark_sizes:
+            seconds, peak = measure(BENCHMARKS[name](size), repeat)
+            results["benchmarks"]["{0}[{1}]".format(name, size)] = {"seconds": seconds, "peak_bytes": peak}
+            print("{0}[{1}]: {2:.6f} s, {3} bytes".format(name, size, seconds, peak), file=sys.stderr)
+
+        smallest, largest = benchmark_sizes[0], benchmark_sizes[-1]
+        small_time = results["benchmarks"]["{0}[{1}]".format(name, smallest)]["seconds"]
+        large_time = results["benchmarks"]["{0}[{1}]".format(name, largest)]["seconds"]
+        results["scaling"][name] = math.log(large_time / small_time) / math.log(largest / smallest)
+
+    seconds = bench_cli_startup(repeat)
+    results["benchmarks"]["cli_startup"] = {"seconds": seconds, "peak_bytes": None}
+    print("cli_startup: {0:.6f} s".format(seconds), file=sys.stderr)
+
+    results["python"] = platform.python_version()
+    results["machine"] = platform.machine()
+    return results
+
+def compare(results, baseline, threshold, scaling_tolerance):
+    """Return the list of regressions of results against baseline"""
+    regressions = list()
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        ratio = result["seconds"] / baseline["benchmarks"][name]["seconds"]
+        if ratio > threshold:
+            regressions.append("{0} is {1:.2f} times slower than the baseline".format(name, ratio))
+    for name, exponent in results["scaling"].items():
+        if name not in baseline["scaling"]:
+            continue
+        if exponent > baseline["scaling"][name] + scaling_tolerance:
+            regressions.append("{0} scales as n^{1:.2f}, the baseline as n^{2:.2f}".format(name, exponent, baseline["scaling"][name]))
+    return regressions
+
+def main():
+    argparser = argparse.ArgumentParser(description="Run the pyrestriction benchmarks.")
+    argparser.add_argument("--quick", action="store_true", help="use smaller sizes")
+    argparser.add_argument("--repeat", type=int, default=3, help="the number of runs of each benchmark (default: 3)")
+    argparser.add_argument("--output", help="write the results to this JSON file (default: standard output)")
+    argparser.add_argument("--baseline", nargs="?", const=BASELINE, help="compare the results to this JSON file (default: {0})".format(BASELINE))
+    argparser.add_argument("--threshold", type=float, default=1.5, help="the slowdown ratio above which a benchmark regressed (default: 1.5)")
+    argparser.add_argument("--scaling-tolerance", type=float, default=0.3, help="how much a scaling exponent can grow (default: 0.3)")
+    args = argparser.parse_args()
+
+    results = run(QUICK_SIZES if args.quick else SIZES, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold, args.scaling_tolerance)
+        for regression in regressions:
+            print("REGRESSION: " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
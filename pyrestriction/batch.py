@@ -0,0 +1,87 @@
+import json
+import os
+from multiprocessing import Pool
+from pyrestriction.io import read_account_file, BINARY_EXTENSION
+from pyrestriction.projection import project
+
+# This file evaluates many account files at once, on a pool of worker processes.
+# Each account is projected over a number of periods and the results are written
+# as a stream of JSON lines, one per account, in the order of the accounts.
+# An account that cannot be evaluated gives a line with an "error" key instead.
+
+ACCOUNT_FILE_EXTENSIONS = (".act", BINARY_EXTENSION)
+
+def read_jobs(source, default_amount=None):
+    """
+    Return the list of (account file, amount) to evaluate.
+
+    source is either a directory, in which case every account file it contains is evaluated with default_amount,
+    or a manifest: a text file with one account file per line, followed by the amount on the account.
+    The amount can be left out of a line, in which case default_amount is used.
+    In a manifest, blank lines and lines starting with # are ignored, and relative paths are relative to the manifest.
+    """
+    if os.path.isdir(source):
+        return [(os.path.join(source, filename), default_amount)
+                for filename in sorted(os.listdir(source)) if filename.endswith(ACCOUNT_FILE_EXTENSIONS)]
+
+    jobs = list()
+    directory = os.path.dirname(source)
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split()
+            amount = fields[1] if len(fields) > 1 else default_amount
+            jobs.append((os.path.join(directory, fields[0]), amount))
+    return jobs
+
+def _as_list(values):
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+def projection_result(account_file, account, nb_periods):
+    """Project account over nb_periods and return the result as a dictionary"""
+    result = project(account, nb_periods)
+    return {"file": account_file,
+            "name": account.name,
+            "currency": account.currency,
+            "total": _as_list(result.total),
+            "saved": _as_list(result.saved),
+            "debt": _as_list(result.debt),
+            "avaliable": _as_list(result.avaliable)}
+
+def evaluate_account(job):
+    """Evaluate one (account file, amount, number of periods, parse cache directory) job and return its result as a dictionary"""
+    account_file, amount, nb_periods, cache_dir = job
+    try:
+        if amount is None:
+            raise ValueError("No amount on account given")
+        account = read_account_file(int(amount), account_file, cache_dir = cache_dir)
+        return projection_result(account_file, account, nb_periods)
+    except Exception as exception:
+        return {"file": account_file, "error": "{0}: {1}".format(type(exception).__name__, exception)}
+
+def run_batch(jobs, nb_periods, output, nb_workers=None, chunksize=16, cache_dir=None):
+    """
+    Evaluate the (account file, amount) jobs on nb_workers processes (by default, one per CPU)
+    and write one JSON line per account to output. Parsed account files are cached in cache_dir if it is given.
+    Return the number of accounts evaluated and the number of failures.
+    """
+    tasks = [(account_file, amount, nb_periods, cache_dir) for account_file, amount in jobs]
+    nb_failures = 0
+
+    def write_results(results):
+        nonlocal nb_failures
+        for result in results:
+            if "error" in result:
+                nb_failures += 1
+            print(json.dumps(result), file=output)
+
+    if nb_workers == 1:
+        write_results(map(evaluate_account, tasks))
+    else:
+        with Pool(nb_workers) as pool:
+            write_results(pool.imap(evaluate_account, tasks, chunksize))
+    return (len(tasks), nb_failures)
@@ -0,0 +1,116 @@
+import struct
+from pyrestriction.exceptions import InvalidAccountFile
+from pyrestriction.model import Account
+from pyrestriction.table import OperationTable, TYPE_CODES, encode_operation, decode_operation
+
+# This file defines the binary account format.
+#
+# A binary account file starts with a fixed header:
+# - the magic bytes PYRB and the version of the format
+# - which of the regular income, saved amount and debt amount are ints, and if the account has integer amounts
+# - the regular income, and the saved and debt amounts of the operations, as doubles
+# - the length of the name and of the currency, and the number of operations
+# followed by the name and the currency in UTF-8, and then by one fixed-width record per operation:
+# its type code, which of its parameters are ints, its payed_this_period flag and its parameters as doubles.
+# Type codes and parameters are the ones of pyrestriction.table.
+#
+# Since the saved and debt amounts are in the header, the amounts of the current period are known
+# without reading the records, and records are only read, one by one, when the operations are needed.
+
+MAGIC = b"PYRB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxxdddIIQ")
+RECORD = struct.Struct("<BBBddd")
+
+INT_REGULAR_INCOME = 1
+INT_SAVED = 2
+INT_DEBT = 4
+INTEGER_AMOUNTS = 8
+
+def is_binary(data):
+    """Tell if data starts like a binary account file"""
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+def write_account(account, buffer):
+    """
+    Write account to the binary buffer. Only the four operation types of pyrestriction.model can be written, and periods without dates:
+    raise InvalidAccountFile for the other accounts.
+    """
+    if account.calendar is not None and account.calendar.has_dates(0):
+        raise InvalidAccountFile("the dates of the periods cannot be written in the binary format")
+    operations = account.operations
+    for operation in operations:
+        if type(operation) not in TYPE_CODES:
+            raise InvalidAccountFile("{0} cannot be written in the binary format".format(type(operation).__name__))
+
+    saved, debt = account.saved(), account.debt()
+    int_flags = 0
+    for flag, value in ((INT_REGULAR_INCOME, account.regular_income), (INT_SAVED, saved), (INT_DEBT, debt)):
+        if isinstance(value, int):
+            int_flags |= flag
+    if account.integer_amounts:
+        int_flags |= INTEGER_AMOUNTS
+
+    name = account.name.encode("utf-8")
+    currency = account.currency.encode("utf-8")
+    buffer.write(HEADER.pack(MAGIC, VERSION, int_flags, account.regular_income, saved, debt, len(name), len(currency), len(operations)))
+    buffer.write(name)
+    buffer.write(currency)
+    for operation in operations:
+        code, int_parameters, flag, parameters = encode_operation(operation)
+        buffer.write(RECORD.pack(code, int_parameters, flag, *parameters))
+
+class MappedOperationTable:
+    """
+    The operations of a binary account file, read from a buffer such as a mmap.
+    An operation is only created when it is read, and is not kept.
+    The table is read only: the operations of the next periods are stored in an OperationTable.
+    """
+    def __init__(self, buffer, offset, length, aggregates):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+        self._aggregates = aggregates
+
+    def empty_copy(self):
+        return OperationTable()
+
+    def aggregates(self):
+        return self._aggregates
+
+    def append(self, operation):
+        raise TypeError("The operations of a binary account file are read only")
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("MappedOperationTable index out of range")
+        code, int_parameters, flag, *parameters = RECORD.unpack_from(self._buffer, self._offset + index * RECORD.size)
+        return decode_operation(code, int_parameters, flag, parameters)
+
+    def __iter__(self):
+        records = memoryview(self._buffer)[self._offset:self._offset + self._length * RECORD.size]
+        for code, int_parameters, flag, *parameters in RECORD.iter_unpack(records):
+            yield decode_operation(code, int_parameters, flag, parameters)
+
+def parse_account(current_amount, buffer):
+    """Read an account from a binary buffer. The operations stay in the buffer, which must be kept open."""
+    if not is_binary(buffer):
+        raise ValueError("Not a binary account file")
+    magic, version, int_flags, regular_income, saved, debt, name_length, currency_length, length = HEADER.unpack_from(buffer, 0)
+    if version != VERSION:
+        raise ValueError("Unsupported binary account file version {0}".format(version))
+
+    as_number = lambda value, flag: int(value) if int_flags & flag else value
+    offset = HEADER.size
+    name = bytes(buffer[offset:offset + name_length]).decode("utf-8")
+    offset += name_length
+    currency = bytes(buffer[offset:offset + currency_length]).decode("utf-8")
+    offset += currency_length
+
+    operations = MappedOperationTable(buffer, offset, length, (as_number(saved, INT_SAVED), as_number(debt, INT_DEBT)))
+    return Account(current_amount, as_number(regular_income, INT_REGULAR_INCOME), name, currency, operations, bool(int_flags & INTEGER_AMOUNTS))
@@ -0,0 +1,258 @@
+import hashlib
+import mmap
+import os
+import struct
+import time
+from datetime import date
+from pyrestriction import journal, profiling
+from pyrestriction.dates import Calendar, select_periods
+from pyrestriction.exceptions import OperationsOnlyMode
+from pyrestriction.projection import Projection
+
+# This file keeps the projections shown by the available command on disk, so that asking again
+# for the same periods of an account file that did not change neither parses it nor computes anything.
+#
+# An entry is keyed by a hash of the bytes of the account file and of its journal, of the amount on
+# the account and of the periods projected, given by numbers or by dates. Its file is named after a
+# hash of the path of the account file followed by the key, so that the entries of an account file can
+# be removed when it is written (invalidate), and is a compact binary file, memory-mapped to be read:
+# - a fixed header: the magic bytes PYRP, the version of the format, the first period, the number of
+#   periods, the lengths of the name and currency of the account, and the first period with dates and
+#   the number of dates (see pyrestriction.dates)
+# - the name and the currency in UTF-8
+# - the dates of the periods projected, as the ordinals of their first days followed by the day after the last one
+# - the total, debt, saved and avaliable columns, each as a kind byte followed by its values:
+#   int64s if they are all ints, doubles followed by a byte per value telling if it is an int otherwise,
+#   so that the amounts are shown exactly as if they had been computed
+#
+# Entries not used for max_age seconds are evicted, and so are the least recently used ones when the
+# entries take more than max_size bytes. Eviction is done when an entry is added, never on a hit.
+#
+# Counters:
+# - projection_cache_hit: projections read from the cache
+# - projection_cache_miss: projections computed and added to the cache
+
+MAGIC = b"PYRP"
+VERSION = 2
+HEADER = struct.Struct("<4sBxxxQIIIqI")
+EXTENSION = ".projection"
+COLUMNS = ("total", "debt", "saved", "avaliable")
+INT_COLUMN = 0
+FLOAT_COLUMN = 1
+
+MAX_SIZE = 64 * 1024 * 1024
+MAX_AGE = 30 * 24 * 3600
+
+class CachedProjection:
+    """
+    The periods start to start+len(projection)-1 of the account called name, as a Projection,
+    with the Calendar of their dates, or None if they have none
+    """
+    def __init__(self, name, currency, start, projection, calendar=None):
+        self.name = name
+        self.currency = currency
+        self.start = start
+        self.projection = projection
+        self.calendar = calendar
+
+def project_periods(accountperiod, start, nb_periods):
+    """
+    Return the Projection of the nb_periods periods of accountperiod from the period start, with the amounts of the
+    periods shown by AccountView. Raise OperationsOnlyMode if the amount of money on the account is unknown.
+    """
+    if start:
+        periods = accountperiod.timeline(start + nb_periods).periods(start, start + nb_periods)
+    else:
+        periods = accountperiod.periods(stop=nb_periods)
+    columns = {name: list() for name in COLUMNS}
+    for period in periods:
+        if period.total is None:
+            raise OperationsOnlyMode()
+        for name in COLUMNS:
+            columns[name].append(getattr(period, name))
+    return Projection(columns["total"], columns["saved"], columns["debt"], columns["avaliable"])
+
+def _pack_column(values):
+    if all(type(value) is int for value in values):
+        return bytes([INT_COLUMN]) + struct.pack("<{0}q".format(len(values)), *values)
+    return (bytes([FLOAT_COLUMN]) + struct.pack("<{0}d".format(len(values)), *values)
+            + bytes(type(value) is int for value in values))
+
+def _unpack_column(buffer, offset, nb_periods):
+    """Return the values of the column at offset in buffer, and the offset of the next column"""
+    kind = buffer[offset]
+    offset += 1
+    if kind == INT_COLUMN:
+        return list(struct.unpack_from("<{0}q".format(nb_periods), buffer, offset)), offset + 8 * nb_periods
+    if kind != FLOAT_COLUMN:
+        raise ValueError("unknown column kind {0}".format(kind))
+    values = list(struct.unpack_from("<{0}d".format(nb_periods), buffer, offset))
+    offset += 8 * nb_periods
+    flags = buffer[offset:offset + nb_periods]
+    if len(flags) != nb_periods:
+        raise ValueError("the column is cut short")
+    return [int(value) if flag else value for value, flag in zip(values, flags)], offset + nb_periods
+
+def pack_entry(entry):
+    """Return the bytes of the file of a CachedProjection. Raise struct.error if its amounts do not fit."""
+    name = entry.name.encode("utf-8")
+    currency = entry.currency.encode("utf-8")
+    projection = entry.projection
+    dates = list()
+    first_dated_period = 0
+    if entry.calendar is not None:
+        first_dated_period = next(period for period in range(entry.start, entry.start + len(projection)) if entry.calendar.has_dates(period))
+        dated_periods = [period for period in range(first_dated_period, entry.start + len(projection)) if entry.calendar.has_dates(period)]
+        dates = [entry.calendar.first_day(period).toordinal() for period in dated_periods]
+        dates.append(entry.calendar.last_day(dated_periods[-1]).toordinal() + 1)
+    parts = [HEADER.pack(MAGIC, VERSION, entry.start, len(projection), len(name), len(currency), first_dated_period, len(dates)),
+             name, currency, struct.pack("<{0}I".format(len(dates)), *dates)]
+    parts.extend(_pack_column(list(getattr(projection, column))) for column in COLUMNS)
+    return b"".join(parts)
+
+def unpack_entry(buffer):
+    """Return the CachedProjection read from buffer. Raise ValueError or struct.error if it is not a valid entry."""
+    magic, version, start, nb_periods, name_length, currency_length, first_dated_period, nb_dates = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a projection cache entry")
+    offset = HEADER.size
+    name = bytes(buffer[offset:offset + name_length]).decode("utf-8")
+    offset += name_length
+    currency = bytes(buffer[offset:offset + currency_length]).decode("utf-8")
+    offset += currency_length
+    calendar = None
+    if nb_dates:
+        dates = struct.unpack_from("<{0}I".format(nb_dates), buffer, offset)
+        calendar = Calendar([date.fromordinal(day) for day in dates], first_dated_period)
+    offset += 4 * nb_dates
+    columns = dict()
+    for column in COLUMNS:
+        columns[column], offset = _unpack_column(buffer, offset, nb_periods)
+    projection = Projection(columns["total"], columns["saved"], columns["debt"], columns["avaliable"])
+    return CachedProjection(name, currency, start, projection, calendar)
+
+def _account_prefix(filename):
+    return hashlib.sha256(os.fsencode(os.path.abspath(filename))).hexdigest()[:16]
+
+class ProjectionCache:
+    """The projections of account files kept in the directory cache_dir"""
+    def __init__(self, cache_dir, max_size=MAX_SIZE, max_age=MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def key(self, filename, current_amount, start, nb_periods, on=None, until=None):
+        """
+        Return the key of the projection of the nb_periods periods from start of the account file filename, with current_amount on it,
+        or of the periods given by the dates on and until (see pyrestriction.dates.select_periods)
+        """
+        digest = hashlib.sha256()
+        with open(filename, "rb") as file:
+            digest.update(file.read())
+        #Whether the journal applies to the account file also depends on its size and modification time
+        status = os.stat(filename)
+        digest.update(b"\0%d\0%d\0" % (status.st_size, status.st_mtime_ns))
+        try:
+            with open(journal.journal_filename(filename), "rb") as file:
+                digest.update(file.read())
+        except FileNotFoundError:
+            pass
+        digest.update("\0{0!r}\0{1}\0{2}\0{3}\0{4}".format(current_amount, start, nb_periods, on, until).encode("utf-8"))
+        return "{0}-{1}".format(_account_prefix(filename), digest.hexdigest())
+
+    def _entry_filename(self, key):
+        return os.path.join(self.cache_dir, key + EXTENSION)
+
+    def get(self, key):
+        """Return the CachedProjection of key, or None if it is not in the cache"""
+        entry_filename = self._entry_filename(key)
+        try:
+            with open(entry_filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                entry = unpack_entry(buffer)
+            #The modification time of an entry is when it was last used
+            os.utime(entry_filename)
+        except (OSError, ValueError, struct.error):
+            return None
+        if profiling.enabled:
+            profiling.count("projection_cache_hit")
+        return entry
+
+    def put(self, key, entry):
+        """Add the CachedProjection entry under key, unless its amounts cannot be stored, and evict the old entries"""
+        if profiling.enabled:
+            profiling.count("projection_cache_miss")
+        try:
+            data = pack_entry(entry)
+        except struct.error:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_filename = self._entry_filename(key)
+        temporary_filename = "{0}.{1}.tmp".format(entry_filename, os.getpid())
+        with open(temporary_filename, "wb") as file:
+            file.write(data)
+        os.replace(temporary_filename, entry_filename)
+        self.evict()
+
+    def _entries(self):
+        """Return the (last use, size, file name) of the entries of the cache"""
+        entries = list()
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if name.endswith(EXTENSION):
+                entry_filename = os.path.join(self.cache_dir, name)
+                try:
+                    status = os.stat(entry_filename)
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, entry_filename))
+        return entries
+
+    def _remove(self, entry_filename):
+        try:
+            os.remove(entry_filename)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove the entries not used for max_age seconds, then the least recently used ones until they take at most max_size bytes"""
+        oldest = time.time() - self.max_age
+        entries = list()
+        for last_use, size, entry_filename in self._entries():
+            if last_use < oldest:
+                self._remove(entry_filename)
+            else:
+                entries.append((last_use, size, entry_filename))
+        entries.sort()
+        size = sum(entry[1] for entry in entries)
+        for last_use, entry_size, entry_filename in entries:
+            if size <= self.max_size:
+                break
+            self._remove(entry_filename)
+            size -= entry_size
+
+    def invalidate(self, filename):
+        """Remove the entries of the account file filename, once it has been written"""
+        prefix = _account_prefix(filename) + "-"
+        for last_use, size, entry_filename in self._entries():
+            if os.path.basename(entry_filename).startswith(prefix):
+                self._remove(entry_filename)
+
+    def available(self, filename, current_amount, start, nb_periods, read_account, on=None, until=None):
+        """
+        Return the CachedProjection of the nb_periods periods from start of the account file filename, with current_amount on it,
+        or of the periods given by the dates on and until.
+        On a miss, the account is read by read_account(current_amount, filename) and projected, and the result is added to the cache.
+        """
+        key = self.key(filename, current_amount, start, nb_periods, on, until)
+        entry = self.get(key)
+        if entry is None:
+            account = read_account(current_amount, filename)
+            start, nb_periods = select_periods(account.calendar, start, nb_periods, on, until)
+            with profiling.phase("compute"):
+                calendar = None if account.calendar is None else account.calendar.excerpt(start, start + nb_periods)
+                entry = CachedProjection(account.name, account.currency, start, project_periods(account, start, nb_periods), calendar)
+            self.put(key, entry)
+        return entry
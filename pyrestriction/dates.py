@@ -0,0 +1,163 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from pyrestriction.exceptions import NoPeriodDates
+
+# This file gives dates to the periods of an account.
+#
+# The dates are given in the account file, either as a cadence:
+#
+#     PERIOD_START = "2026-01-01"
+#     PERIOD_CADENCE = "monthly"
+#
+# where PERIOD_START is the first day of the current period and the periods follow each other every
+# day, week or month, or as an explicit list of the first day of each period, the last date being the
+# day after the last period:
+#
+#     PERIOD_DATES = ["2026-01-01", "2026-01-15", "2026-02-03"]
+#
+# The first days of the periods form a sorted sequence, so the period of a date is found by bisecting it.
+# With a cadence, the sequence is computed when it is read instead of being stored, so that bisecting it
+# never creates the dates of all the periods.
+# Periods have no dates after the last one of PERIOD_DATES, or after the year 9999.
+
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+CADENCES = (DAILY, WEEKLY, MONTHLY)
+# A monthly cadence keeps the day of the month of its first period, which must exist in every month
+LAST_MONTHLY_DAY = 28
+
+def parse_date(text):
+    """Return the date written as YYYY-MM-DD in text. Raise ValueError if it is not one."""
+    if not isinstance(text, str):
+        raise ValueError("dates must be written as strings, such as \"2026-01-31\"")
+    return date.fromisoformat(text)
+
+class CadenceDates:
+    """The first day of each period when they follow each other every day, week or month from start: a lazy sequence"""
+    def __init__(self, start, cadence):
+        if cadence not in CADENCES:
+            raise ValueError("unknown cadence {0}, it must be one of {1}".format(cadence, ", ".join(CADENCES)))
+        if cadence == MONTHLY and start.day > LAST_MONTHLY_DAY:
+            raise ValueError("monthly periods must start on one of the first {0} days of the month".format(LAST_MONTHLY_DAY))
+        self.start = start
+        self.cadence = cadence
+        if cadence == MONTHLY:
+            self._length = (date.max.year - start.year) * 12 + date.max.month - start.month + 1
+        else:
+            self._length = (date.max - start).days // self._days() + 1
+
+    def _days(self):
+        return 7 if self.cadence == WEEKLY else 1
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("period date index out of range")
+        if self.cadence == MONTHLY:
+            year, month = divmod(self.start.month - 1 + index, 12)
+            return self.start.replace(year = self.start.year + year, month = month + 1)
+        return self.start + timedelta(days = index * self._days())
+
+class Calendar:
+    """
+    The dates of the periods of an account. dates is a sorted sequence of dates, dates[i] being the first day
+    of the period first_period + i (0 being the current period). The last date only ends the period before it.
+    """
+    def __init__(self, dates, first_period=0):
+        self._dates = dates
+        self._first_period = first_period
+
+    def _index(self, period):
+        return period - self._first_period
+
+    def has_dates(self, period):
+        """Tell if the period has dates"""
+        return 0 <= self._index(period) < len(self._dates) - 1
+
+    def first_day(self, period):
+        """Return the first day of period. Raise NoPeriodDates if it has no dates."""
+        if not self.has_dates(period):
+            raise NoPeriodDates("period {0} has no dates".format(period))
+        return self._dates[self._index(period)]
+
+    def last_day(self, period):
+        """Return the last day of period. Raise NoPeriodDates if it has no dates."""
+        self.first_day(period)
+        return self._dates[self._index(period) + 1] - timedelta(days = 1)
+
+    def period(self, day):
+        """Return the period day is in. Raise NoPeriodDates if it is before the current period or after the last dated one."""
+        #The dates of the periods before the current one are not looked at
+        lowest = min(max(self._index(0), 0), len(self._dates))
+        index = bisect_right(self._dates, day, lowest) - 1
+        period = index + self._first_period
+        if period < 0:
+            raise NoPeriodDates("{0} is before the current period".format(day))
+        if not self.has_dates(period):
+            raise NoPeriodDates("{0} is after the last period with dates".format(day))
+        return period
+
+    def shifted(self, nb_periods):
+        """Return the calendar of the account nb_periods periods later"""
+        return Calendar(self._dates, self._first_period - nb_periods)
+
+    def excerpt(self, start, stop):
+        """Return a Calendar holding only the dates of the periods from start to stop excluded, or None if none of them has dates"""
+        first = max(self._index(start), 0)
+        last = min(self._index(stop), len(self._dates) - 1)
+        if first >= last:
+            return None
+        return Calendar([self._dates[index] for index in range(first, last + 1)], first + self._first_period)
+
+    def variables(self):
+        """Return the variables of the account file describing the calendar, or an empty dict if the current period has no dates"""
+        if not self.has_dates(0):
+            return dict()
+        if isinstance(self._dates, CadenceDates):
+            return {"PERIOD_START": self.first_day(0).isoformat(), "PERIOD_CADENCE": self._dates.cadence}
+        return {"PERIOD_DATES": [self._dates[index].isoformat() for index in range(self._index(0), len(self._dates))]}
+
+def calendar_from_variables(period_start=None, period_cadence=None, period_dates=None):
+    """
+    Return the Calendar described by the PERIOD_START, PERIOD_CADENCE and PERIOD_DATES variables of an account file,
+    or None if none of them is set. Raise ValueError if they do not describe one.
+    """
+    if period_dates is not None:
+        if period_start is not None or period_cadence is not None:
+            raise ValueError("PERIOD_DATES cannot be set with PERIOD_START or PERIOD_CADENCE")
+        if not isinstance(period_dates, (list, tuple)) or len(period_dates) < 2:
+            raise ValueError("PERIOD_DATES must be a list of at least two dates")
+        dates = [parse_date(text) for text in period_dates]
+        if any(first >= second for first, second in zip(dates, dates[1:])):
+            raise ValueError("PERIOD_DATES must be in increasing order")
+        return Calendar(dates)
+
+    if period_start is None and period_cadence is None:
+        return None
+    if period_start is None or period_cadence is None:
+        raise ValueError("PERIOD_START and PERIOD_CADENCE must be set together")
+    return Calendar(CadenceDates(parse_date(period_start), period_cadence))
+
+def select_periods(calendar, start, nb_periods, on=None, until=None):
+    """
+    Return the (first period, number of periods) to show: from the period of the date on if it is given, start otherwise,
+    and up to the period of the date until included if it is given, nb_periods periods otherwise.
+    Raise NoPeriodDates if a date is given and is not in a period of calendar.
+    """
+    if on is None and until is None:
+        return start, nb_periods
+    if calendar is None:
+        raise NoPeriodDates("the periods of the account have no dates")
+    if on is not None:
+        start = calendar.period(on)
+    if until is not None:
+        last = calendar.period(until)
+        if last < start:
+            raise NoPeriodDates("{0} is before the first period shown".format(until))
+        nb_periods = last - start + 1
+    return start, nb_periods
@@ -1,61 +1,322 @@
-from argparse import ArgumentParser, FileType
-from pyrestriction.views import AccountView, MessageView
-from pyrestriction.io import parse_account, write_account
+import sys
+from pyrestriction.views import AccountView, MessageView, SimulationView, LAYOUTS, FULL
+from pyrestriction.io import read_account_file, write_account_file, FORMATS
+from pyrestriction import journal, profiling
+from pyrestriction.exceptions import InvalidAccountFile
+
+# The modules only needed by some commands (argparse, and the batch and server modules with
+# multiprocessing, NumPy and asyncio) are imported when these commands are run, so that the
+# common available command starts quickly. So is the projection cache, with hashlib.
 
 AMOUNT_ARG = "amount_on_account"
 ACCOUNT_ARG = "account_file"
+DEFAULT_PERIODS = 2
+GOAL_PERIODS = 120
+
+def add_output_arguments(parser):
+    """Add the arguments choosing where and in which format the account file is written"""
+    parser.add_argument("--output", help = "write the account to this file instead of the account file")
+    parser.add_argument("--format", choices = FORMATS, help = "the format to write the account in (default: from the extension of the file, .actb for binary)")
 
-def write_account_to_file(account, file):
-    file.seek(0)
-    write_account(account, file)
-    file.truncate()
+def available_view(filename, current_amount, nb_periods, layout=FULL, start=0, cache_dir=None, projection_cache=None, on=None, until=None):
+    """
+    Return the view of the available command. With the dates on and until, the periods shown are the ones
+    from the period of on, up to the one of until (see pyrestriction.dates.select_periods).
+    With projection_cache, a directory, the amounts are read from the projections kept in it,
+    and added to it if they are not there (see pyrestriction.cache).
+    """
+    if projection_cache is None:
+        account = read_account_file(current_amount, filename, cache_dir = cache_dir)
+        if on is not None or until is not None:
+            from pyrestriction.dates import select_periods
+            start, nb_periods = select_periods(account.calendar, start, nb_periods, on, until)
+        return AccountView(account, nb_periods, layout, start = start)
 
+    from pyrestriction.cache import ProjectionCache
+    read_account = lambda amount, account_file: read_account_file(amount, account_file, cache_dir = cache_dir)
+    entry = ProjectionCache(projection_cache).available(filename, current_amount, start, nb_periods, read_account, on, until)
+    return AccountView(entry, len(entry.projection), layout, projection = entry.projection, start = entry.start)
 
-class PyrestrictionSubparserBase(ArgumentParser):
-    def __init__(self, *args, **kwargs):
-        super(PyrestrictionSubparserBase, self).__init__(*args, **kwargs)
-        self.add_argument(ACCOUNT_ARG, type = FileType('r+'), help = "the file containing the account of which you want to show the avaliable funds")
+def invalidate_projections(projection_cache, filename):
+    """Remove the projections of the account file filename from projection_cache, if it is given, once filename has been written"""
+    if projection_cache is not None:
+        from pyrestriction.cache import ProjectionCache
+        ProjectionCache(projection_cache).invalidate(filename)
+
+def fast_available(arguments):
+    """
+    Return the view of an available command given in its simplest form:
+    [--projection-cache DIR] available account_file amount [--periods N] [--layout LAYOUT]
+    Return None for any other command line, which must then go through the whole parser,
+    so that help, errors and abbreviations are handled by argparse.
+    """
+    projection_cache = None
+    if arguments[:1] == ["--projection-cache"] and len(arguments) > 1:
+        projection_cache, arguments = arguments[1], arguments[2:]
+    if not arguments or arguments[0] != "available":
+        return None
+    positionals = list()
+    options = {"--periods": str(DEFAULT_PERIODS), "--layout": FULL}
+    remaining = iter(arguments[1:])
+    for argument in remaining:
+        if argument in options:
+            options[argument] = next(remaining, None)
+        elif argument.startswith("-"):
+            return None
+        else:
+            positionals.append(argument)
+    if len(positionals) != 2 or options["--layout"] not in LAYOUTS:
+        return None
+    try:
+        amount, nb_periods = int(positionals[1]), int(options["--periods"])
+    except (TypeError, ValueError):
+        return None
+    if nb_periods < 1:
+        return None
+
+    return available_view(positionals[0], amount, nb_periods, options["--layout"], projection_cache = projection_cache)
 
 def entrypoint():
+    try:
+        view = fast_available(sys.argv[1:])
+    except (InvalidAccountFile, OSError):
+        #The command is run again by parse_and_run, which reports the error
+        view = None
+    if view is not None:
+        view.render()
+    else:
+        parse_and_run()
+
+def parse_and_run():
+    """Run the command given on the command line, parsing it with argparse"""
+    from argparse import ArgumentParser, FileType
+    from pyrestriction.exceptions import NoPeriodDates
+
+    def date(text):
+        """A date argument, written as YYYY-MM-DD"""
+        from pyrestriction.dates import parse_date
+        return parse_date(text)
+
+    class PyrestrictionSubparserBase(ArgumentParser):
+        """Parser of the subcommands. Unless account_file is False, they take an account file as last argument."""
+        def __init__(self, *args, account_file = True, **kwargs):
+            super(PyrestrictionSubparserBase, self).__init__(*args, **kwargs)
+            if account_file:
+                self.add_argument(ACCOUNT_ARG, help = "the file containing the account of which you want to show the avaliable funds")
+
     #Main ArgumentParser
     argparser = ArgumentParser(prog="pyrestriction", description="Tell it the amounts that you owe or want to save, and it will compute how much money is avaliable to you.", epilog="You must set the current operations restraining money from your direct usage in an account file. You can find an exemple of account file in tests/account_exemple.act.")
+    argparser.add_argument("--profile", action = "store_true", help = "show where the time went, on the error output")
+    argparser.add_argument("--parse-cache", metavar = "DIR", help = "a directory where parsed account files are kept, so that they are not parsed again until they change")
+    argparser.add_argument("--projection-cache", metavar = "DIR", help = "a directory where the amounts shown by available are kept, so that they are not computed again until the account file changes")
     subparser = argparser.add_subparsers(title="Commands", parser_class = PyrestrictionSubparserBase)
 
     #Available subcommand
     def subcommand_available(args):
-        account = parse_account(args[AMOUNT_ARG], args[ACCOUNT_ARG].read())
-        view = AccountView(account)
+        if args["on"] is not None and args["start"]:
+            argparser.error("--on cannot be used with --from")
+        if args["until"] is not None and args["periods"] is not None:
+            argparser.error("--until cannot be used with --periods")
+        if args["start"] < 0:
+            argparser.error("the first period to show cannot be before the current one")
+        if args["periods"] is not None and args["periods"] < 1:
+            argparser.error("the number of periods to show must be at least 1")
+        nb_periods = DEFAULT_PERIODS if args["periods"] is None else args["periods"]
+        try:
+            view = available_view(args[ACCOUNT_ARG], args[AMOUNT_ARG], nb_periods, args["layout"], args["start"],
+                                  args["parse_cache"], args["projection_cache"], args["on"], args["until"])
+        except NoPeriodDates as error:
+            argparser.error(str(error))
         return view
     available_parser = subparser.add_parser("available", description="Show how much money is available on your account.")
     available_parser.add_argument(AMOUNT_ARG,  type = int, help = "The amount of money currently on the account")
+    available_parser.add_argument("--periods", type = int, help = "the number of periods to show (default: 2)")
+    available_parser.add_argument("--layout", choices = LAYOUTS, default = FULL, help = "show a block per period (full) or a row per period (table)")
+    available_parser.add_argument("--from", dest = "start", type = int, default = 0, help = "the first period to show, 0 being the current one (default: 0)")
+    available_parser.add_argument("--on", type = date, help = "show the periods from the one of this date (YYYY-MM-DD), when the periods of the account have dates")
+    available_parser.add_argument("--until", type = date, help = "show the periods up to the one of this date (YYYY-MM-DD) included, when the periods of the account have dates")
     available_parser.set_defaults(func = subcommand_available)
 
     #Format subcommand
     def subcommand_format(args):
-        account = parse_account(None, args[ACCOUNT_ARG].read())
-        write_account_to_file(account, args[ACCOUNT_ARG])
-        view = MessageView("format", {"filename":args[ACCOUNT_ARG].name})
+        account = read_account_file(None, args[ACCOUNT_ARG], cache_dir = args["parse_cache"])
+        filename = args["output"] or args[ACCOUNT_ARG]
+        write_account_file(account, filename, args["format"])
+        invalidate_projections(args["projection_cache"], filename)
+        view = MessageView("format", {"filename":filename})
         return view
-    format_parser = subparser.add_parser("format", description="Format the account file")
+    format_parser = subparser.add_parser("format", description="Format the account file, or convert it to another format")
+    add_output_arguments(format_parser)
     format_parser.set_defaults(func = subcommand_format)
 
     #Endperiod subcommand
     def subcommand_endperiod(args):
-        account = parse_account(None, args[ACCOUNT_ARG].read())
-        account = account.next()
-        write_account_to_file(account, args[ACCOUNT_ARG])
-        view = MessageView("endperiod", {"account_name":account.name, "filename":args[ACCOUNT_ARG].name})
+        nb_periods = args["periods"]
+        if nb_periods < 1:
+            argparser.error("the number of periods to end must be at least 1")
+        if args["journal"]:
+            if args["output"] or args["format"]:
+                argparser.error("--journal cannot be used with --output or --format")
+            journal.append(args[ACCOUNT_ARG], nb_periods)
+            invalidate_projections(args["projection_cache"], args[ACCOUNT_ARG])
+            view = MessageView("journal", {"nb_periods":nb_periods, "filename":journal.journal_filename(args[ACCOUNT_ARG])})
+            return view
+        account = read_account_file(None, args[ACCOUNT_ARG], cache_dir = args["parse_cache"])
+        with profiling.phase("compute"):
+            #Several periods are ended at once by jumping each operation directly to its state after them
+            account = account.next() if nb_periods == 1 else account.advance(nb_periods)
+        filename = args["output"] or args[ACCOUNT_ARG]
+        write_account_file(account, filename, args["format"])
+        invalidate_projections(args["projection_cache"], filename)
+        view = MessageView("endperiod", {"account_name":account.name, "filename":filename, "nb_periods":nb_periods})
         return view
-    format_parser = subparser.add_parser("endperiod", description="End the period and write the new values to the account file")
+    format_parser = subparser.add_parser("endperiod", description="End the period, or several of them, and write the new values to the account file")
+    format_parser.add_argument("--periods", type = int, default = 1, help = "the number of periods to end (default: 1)")
+    format_parser.add_argument("--journal", action = "store_true", help = "record the end of the periods in the journal of the account file, instead of writing it again")
+    add_output_arguments(format_parser)
     format_parser.set_defaults(func = subcommand_endperiod)
 
+    #Compact subcommand
+    def subcommand_compact(args):
+        filename = args[ACCOUNT_ARG]
+        account = read_account_file(None, filename, cache_dir = args["parse_cache"])
+        write_account_file(account, filename, args["format"])
+        invalidate_projections(args["projection_cache"], filename)
+        view = MessageView("compact", {"filename":filename})
+        return view
+    format_parser = subparser.add_parser("compact", description="Write the periods ended in the journal of the account file to the account file, and remove the journal")
+    format_parser.add_argument("--format", choices = FORMATS, help = "the format to write the account in (default: from the extension of the file, .actb for binary)")
+    format_parser.set_defaults(func = subcommand_compact)
+
+    #Afford subcommand
+    def subcommand_afford(args):
+        from pyrestriction import goals
+        if args["periods"] < 1:
+            argparser.error("the number of periods to look at must be at least 1")
+        account = read_account_file(args[AMOUNT_ARG], args[ACCOUNT_ARG], cache_dir = args["parse_cache"])
+        with profiling.phase("compute"):
+            period = goals.earliest_affordable_period(account, args["price"], args["periods"])
+        if period is None:
+            key = "afford_never"
+        else:
+            key = "afford_now" if period == 0 else "afford"
+        view = MessageView(key, {"price":args["price"], "period":period, "nb_periods":args["periods"], "currency":account.currency})
+        return view
+    afford_parser = subparser.add_parser("afford", description="Tell from which period you can spend an amount without running out of money afterwards.")
+    afford_parser.add_argument(AMOUNT_ARG, type = int, help = "The amount of money currently on the account")
+    afford_parser.add_argument("price", type = int, help = "the amount to spend")
+    afford_parser.add_argument("--periods", type = int, default = GOAL_PERIODS, help = "the number of periods to look at (default: {0})".format(GOAL_PERIODS))
+    afford_parser.set_defaults(func = subcommand_afford)
+
+    #Maxsaving subcommand
+    def subcommand_maxsaving(args):
+        from pyrestriction import goals
+        if args["nb_period_left"] < 1:
+            argparser.error("the number of periods to save over must be at least 1")
+        if args["periods"] < 1:
+            argparser.error("the number of periods to look at must be at least 1")
+        account = read_account_file(args[AMOUNT_ARG], args[ACCOUNT_ARG], cache_dir = args["parse_cache"])
+        with profiling.phase("compute"):
+            amount = goals.maximum_regular_saving(account, args["nb_period_left"], args["periods"])
+        key = "maxsaving_never" if amount is None else "maxsaving"
+        view = MessageView(key, {"amount":amount, "nb_period_left":args["nb_period_left"], "nb_periods":args["periods"], "currency":account.currency})
+        return view
+    maxsaving_parser = subparser.add_parser("maxsaving", description="Tell the most you can save over a number of periods without running out of money.")
+    maxsaving_parser.add_argument(AMOUNT_ARG, type = int, help = "The amount of money currently on the account")
+    maxsaving_parser.add_argument("nb_period_left", type = int, help = "the number of periods to save over")
+    maxsaving_parser.add_argument("--periods", type = int, default = GOAL_PERIODS, help = "the number of periods to look at (default: {0})".format(GOAL_PERIODS))
+    maxsaving_parser.set_defaults(func = subcommand_maxsaving)
+
+    #Simulate subcommand
+    def subcommand_simulate(args):
+        from pyrestriction import montecarlo
+        try:
+            income = montecarlo.parse_distribution(args["income"]) if args["income"] else None
+            percentiles = [float(percentile) for percentile in args["percentiles"].split(",")]
+            montecarlo.check_arguments(args["periods"], args["paths"], percentiles, args["workers"])
+        except ValueError as error:
+            argparser.error(str(error))
+        account = read_account_file(args[AMOUNT_ARG], args[ACCOUNT_ARG], cache_dir = args["parse_cache"])
+        with profiling.phase("compute"):
+            simulation = montecarlo.simulate(account, args["periods"], args["paths"], income, args["amount_spread"],
+                                             args["seed"], percentiles, args["workers"])
+        view = SimulationView(account, simulation)
+        return view
+    simulate_parser = subparser.add_parser("simulate", description="Simulate the avaliable amounts of the account when its income varies, and show their percentiles and the probability of running out of money.")
+    simulate_parser.add_argument(AMOUNT_ARG, type = int, help = "The amount of money currently on the account")
+    simulate_parser.add_argument("--periods", type = int, default = 12, help = "the number of periods to simulate (default: 12)")
+    simulate_parser.add_argument("--paths", type = int, default = 10000, help = "the number of paths to simulate (default: 10000)")
+    simulate_parser.add_argument("--income", help = "the distribution of the income of each period: normal:MEAN:STDDEV, uniform:LOW:HIGH or fixed:VALUE (default: the regular income)")
+    simulate_parser.add_argument("--amount-spread", type = float, default = 0, help = "the standard deviation of the factor applied to the saved and debt amounts of each period (default: 0)")
+    simulate_parser.add_argument("--seed", type = int, default = 0, help = "the seed of the random streams (default: 0)")
+    simulate_parser.add_argument("--percentiles", default = "5,50,95", help = "the percentiles to show, separated by commas (default: 5,50,95)")
+    simulate_parser.add_argument("--workers", type = int, help = "the number of worker processes (default: one per CPU)")
+    simulate_parser.set_defaults(func = subcommand_simulate)
+
+    #Watch subcommand
+    def subcommand_watch(args):
+        from pyrestriction import watch
+        watch.watch(args["account_files"], args[AMOUNT_ARG], args["periods"], args["layout"], args["poll"], args["interval"])
+        view = MessageView("watch_stopped", {"nb_files":len(args["account_files"])}, sys.stderr)
+        return view
+    watch_parser = subparser.add_parser("watch", account_file = False, description="Show how much money is available on your accounts each time their files change.")
+    watch_parser.add_argument("account_files", nargs = "+", help = "the account files to watch")
+    watch_parser.add_argument(AMOUNT_ARG, type = int, help = "The amount of money currently on the accounts")
+    watch_parser.add_argument("--periods", type = int, default = DEFAULT_PERIODS, help = "the number of periods to show (default: 2)")
+    watch_parser.add_argument("--layout", choices = LAYOUTS, default = FULL, help = "show a block per period (full) or a row per period (table)")
+    watch_parser.add_argument("--poll", action = "store_true", help = "check the files regularly instead of being notified of their changes by inotify")
+    watch_parser.add_argument("--interval", type = float, default = 1.0, help = "the number of seconds between two checks of the files, with --poll or without inotify (default: 1)")
+    watch_parser.set_defaults(func = subcommand_watch)
+
+    #Batch subcommand
+    def subcommand_batch(args):
+        from pyrestriction import batch
+        jobs = batch.read_jobs(args["source"], args["amount"])
+        nb_accounts, nb_failures = batch.run_batch(jobs, args["periods"], args["output"], args["workers"], cache_dir = args["parse_cache"])
+        #The results may be written on the standard output, the summary goes elsewhere
+        view = MessageView("batch", {"nb_accounts":nb_accounts, "nb_failures":nb_failures, "output":args["output"].name}, sys.stderr)
+        return view
+    batch_parser = subparser.add_parser("batch", account_file = False, description="Compute the amounts of many accounts on several processes, and write them as JSON lines.")
+    batch_parser.add_argument("source", help = "a directory of account files, or a manifest listing an account file and the amount on it per line")
+    batch_parser.add_argument("--amount", type = int, help = "the amount on the accounts of the directory, or of the manifest lines without an amount")
+    batch_parser.add_argument("--periods", type = int, default = 2, help = "the number of periods to compute (default: 2)")
+    batch_parser.add_argument("--workers", type = int, help = "the number of worker processes (default: one per CPU)")
+    batch_parser.add_argument("--output", type = FileType('w'), default = "-", help = "the file to write the results to (default: standard output)")
+    batch_parser.set_defaults(func = subcommand_batch)
+
+    #Serve subcommand
+    def subcommand_serve(args):
+        from pyrestriction import server
+        if (args["socket"] is None) == (args["port"] is None):
+            argparser.error("serve needs either --socket or --port")
+        address = args["socket"] or "localhost:{0}".format(args["port"])
+        MessageView("serve", {"address":address}, sys.stderr).render()
+        server.serve(args["socket"], args["port"], cache_dir = args["parse_cache"])
+        view = MessageView("serve_stopped", {"address":address}, sys.stderr)
+        return view
+    serve_parser = subparser.add_parser("serve", account_file = False, description="Keep the accounts in memory and answer requests on them, sent as JSON lines on a Unix socket or a TCP port of localhost.")
+    serve_parser.add_argument("--socket", help = "the path of the Unix socket to listen on")
+    serve_parser.add_argument("--port", type = int, help = "the TCP port of localhost to listen on. Any user of the machine can connect to it: on a shared machine, use --socket")
+    serve_parser.set_defaults(func = subcommand_serve)
+
     args = argparser.parse_args()
     dict_args = vars(args)
+    if args.profile:
+        profiling.enable()
     try:
         view = args.func(dict_args)
         view.render()
     except AttributeError:
         argparser.print_help()
+    except InvalidAccountFile as error:
+        argparser.error(str(error))
+    except OSError as error:
+        #Files that cannot be opened, such as a missing account file
+        if error.filename is None:
+            raise
+        argparser.error("can't open '{0}': {1}".format(error.filename, error.strerror))
+    if args.profile:
+        print(profiling.format_report(), file=sys.stderr)
 
 if __name__ == "__main__":
     entrypoint()
@@ -4,3 +4,12 @@ class NoNextOperation(Exception):
 class OperationsOnlyMode(UnboundLocalError):
     def __init__(self):
         super(OperationsOnlyMode, self).__init__("In OperationOnly mode, the account only contains Operations and cannot compute values")
+
+class InvalidAccountFile(ValueError):
+    def __init__(self, message, line=None):
+        if line is not None:
+            message = "line {line}: {message}".format(line=line, message=message)
+        super(InvalidAccountFile, self).__init__(message)
+
+class NoPeriodDates(ValueError):
+    pass
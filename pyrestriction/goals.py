@@ -0,0 +1,73 @@
+import math
+from bisect import bisect_left
+from pyrestriction import profiling
+from pyrestriction.model import RegularSavingOperation
+from pyrestriction.scenario import Comparison
+
+# This file answers questions about what an account can afford, over the nb_periods periods following it.
+# The account is projected once, and the answers are searched by bisection over its amounts.
+#
+# Counter:
+# - goal_evaluation: candidate amounts evaluated while searching for the maximum regular saving
+
+def _suffix_minimum(values):
+    """Return, for each period, the smallest value of this period and of the following ones"""
+    minimum = list(values)
+    for period in range(len(minimum) - 2, -1, -1):
+        minimum[period] = min(minimum[period], minimum[period + 1])
+    return minimum
+
+def _check_periods(nb_periods):
+    if nb_periods < 1:
+        raise ValueError("the number of periods to look at must be at least 1")
+
+def earliest_affordable_period(account, price, nb_periods):
+    """
+    Return the first period in which price can be spent from account without the avaliable amount
+    of this period or of any later period going below zero, or None if there is none in nb_periods periods.
+    Period 0 is the current period. Raise ValueError if nb_periods is less than 1.
+    """
+    _check_periods(nb_periods)
+    comparison = Comparison(account, nb_periods)
+    #The smallest avaliable amount from a period on can only grow from one period to the next
+    minimum = _suffix_minimum(comparison.base.avaliable)
+    period = bisect_left(minimum, price)
+    return period if period < len(minimum) else None
+
+def _sustainable(comparison, scenario):
+    if profiling.enabled:
+        profiling.count("goal_evaluation")
+    return min(comparison.evaluate(scenario).avaliable) >= 0
+
+def maximum_regular_saving(account, nb_period_left, nb_periods):
+    """
+    Return the largest whole total amount of a RegularSavingOperation over nb_period_left periods
+    that can be added to account without the avaliable amount of any of the nb_periods periods going below zero,
+    or None if the avaliable amount already goes below zero.
+    Raise ValueError if nb_period_left or nb_periods is less than 1.
+    """
+    if nb_period_left < 1:
+        raise ValueError("the number of periods to save over must be at least 1")
+    _check_periods(nb_periods)
+    comparison = Comparison(account, nb_periods)
+    if min(comparison.base.avaliable) < 0:
+        return None
+
+    def sustainable(total_amount):
+        operation = RegularSavingOperation(total_amount, nb_period_left, 0, integer = account.integer_amounts)
+        return _sustainable(comparison, account.scenario(total_amount).add(operation))
+
+    #The avaliable amounts only go down as the saving grows: find an amount that is too large, then bisect.
+    #The current period saves at least total_amount/nb_period_left, rounded down, so limit is always too large.
+    limit = (math.floor(max(comparison.base.avaliable)) + 1) * nb_period_left
+    low, high = 0, 1
+    while high < limit and sustainable(high):
+        low, high = high, high * 2
+    high = min(high, limit)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if sustainable(middle):
+            low = middle
+        else:
+            high = middle
+    return low
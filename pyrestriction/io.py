@@ -1,23 +1,325 @@
-from pyrestriction.model import Account, SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation
+import gc
+import marshal
+import mmap
+import os
+import stat
+from collections import OrderedDict
+from contextlib import contextmanager
+from pyrestriction import binary, journal, profiling
+from pyrestriction.exceptions import InvalidAccountFile
+from pyrestriction.model import serializer, Account, SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation
 
-def parse_account(current_amount, account_string):
-    """Parse an account from an ACT file. The ACT file must contain four variables : NAME, REGULAR_INCOME, CURRENCY, OPERATIONS"""
-    glob = {'SavingOperation':SavingOperation, 'RegularSavingOperation':RegularSavingOperation, 'DebtOperation':DebtOperation, 'RegularPaymentOperation':RegularPaymentOperation}
-    loc = dict()
-    exec(account_string, glob, loc)
-    account = Account(current_amount, loc['REGULAR_INCOME'], loc['NAME'], loc['CURRENCY'])
-    for operation in loc['OPERATIONS']:
-        account.add_operation(operation)
+OPERATION_TYPES = {operation_type.__name__: operation_type
+                   for operation_type in (SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation)}
+ACCOUNT_VARIABLES = ("NAME", "REGULAR_INCOME", "CURRENCY", "OPERATIONS")
+# Variables that can be left out of an ACT file, with their default value
+OPTIONAL_VARIABLES = {"INTEGER_AMOUNTS": False, "PERIOD_START": None, "PERIOD_CADENCE": None, "PERIOD_DATES": None}
+# Variables giving the dates of the periods (see pyrestriction.dates)
+CALENDAR_VARIABLES = ("PERIOD_START", "PERIOD_CADENCE", "PERIOD_DATES")
+# Operation types that are created with integer set in an INTEGER_AMOUNTS account
+INTEGER_OPERATION_TYPES = ("RegularSavingOperation", "DebtOperation")
 
-    return account
+# Account files are either ACT files, in the Python syntax, or binary files (see pyrestriction.binary)
+ACT = "act"
+BINARY = "binary"
+FORMATS = (ACT, BINARY)
+BINARY_EXTENSION = ".actb"
+
+WRITE_CHUNK_SIZE = 1024
+
+# Parsed account files, by hash of their content.
+# An account file is parsed into a description made only of dicts, lists, tuples and literals,
+# from which a new Account is built each time it is read.
+MEMORY_CACHE_SIZE = 128
+_memory_cache = OrderedDict()
+CACHE_FILE_EXTENSION = ".actcache"
+
+@contextmanager
+def _gc_paused():
+    """Pause the garbage collector, which would otherwise run many times while the nodes of a large file are created"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# ast and hashlib are imported when they are first needed, since reading a binary account file needs neither.
+
+def _literal(node):
+    """Return the value of a literal node"""
+    import ast
+    if isinstance(node, ast.Constant):
+        return node.value
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        #TypeError for literals that cannot be built, such as {[]: 1}
+        raise InvalidAccountFile("only literal values are allowed", node.lineno)
+
+# The (positional parameters, required parameters, parameters) of the constructor of each operation type, by type name
+_parameters = dict()
+
+def _operation_parameters(type_name):
+    """
+    Return the names of the (positional parameters, required parameters, parameters) of the constructor of the
+    operation type type_name. They are read from its code the first time they are asked for, and then kept.
+    """
+    try:
+        return _parameters[type_name]
+    except KeyError:
+        #Read from the code of __init__ rather than with inspect, which would take longer to import than parsing a small file
+        constructor = OPERATION_TYPES[type_name].__init__
+        code = constructor.__code__
+        positional = code.co_varnames[1:code.co_argcount]
+        keyword_only = code.co_varnames[code.co_argcount:code.co_argcount + code.co_kwonlyargcount]
+        nb_defaults = len(constructor.__defaults__ or ())
+        required = set(positional[:len(positional) - nb_defaults])
+        required.update(name for name in keyword_only if name not in (constructor.__kwdefaults__ or {}))
+        _parameters[type_name] = (positional, frozenset(required), frozenset(positional + keyword_only))
+        return _parameters[type_name]
+
+def _check_arguments(type_name, arguments, keyword_arguments):
+    """Return why the operation type type_name cannot be created with arguments and keyword_arguments, or None if it can"""
+    positional, required, names = _operation_parameters(type_name)
+    if len(arguments) > len(positional):
+        return "takes {0} positional arguments but {1} were given".format(len(positional), len(arguments))
+    for name in keyword_arguments:
+        if name not in names:
+            return "got an unexpected keyword argument '{0}'".format(name)
+        if name in positional[:len(arguments)]:
+            return "got multiple values for argument '{0}'".format(name)
+    missing = required.difference(positional[:len(arguments)], keyword_arguments)
+    if missing:
+        return "missing a required argument: {0}".format(", ".join(sorted(missing)))
+    return None
+
+def _operation(node):
+    """Return the (type name, arguments, keyword arguments) of a node creating an operation"""
+    import ast
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in OPERATION_TYPES):
+        raise InvalidAccountFile("OPERATIONS must only contain {0}".format(", ".join(OPERATION_TYPES)), node.lineno)
+    if any(keyword.arg is None for keyword in node.keywords) or any(isinstance(argument, ast.Starred) for argument in node.args):
+        raise InvalidAccountFile("operations cannot be created with * or ** arguments", node.lineno)
+
+    arguments = [_literal(argument) for argument in node.args]
+    keyword_arguments = {keyword.arg: _literal(keyword.value) for keyword in node.keywords}
+    error = _check_arguments(node.func.id, arguments, keyword_arguments)
+    if error is not None:
+        raise InvalidAccountFile("{0}: {1}".format(node.func.id, error), node.lineno)
+    return (node.func.id, arguments, keyword_arguments)
+
+def parse_description(account_string):
+    """
+    Parse an ACT file into a description of the account: a dict of its variables, where OPERATIONS is a list
+    of (type name, arguments, keyword arguments).
+
+    The file is not executed: it can only assign literal values to the account variables,
+    and OPERATIONS can only be a list or a tuple of operations created with literal arguments.
+    Raise InvalidAccountFile otherwise.
+    """
+    import ast
+    try:
+        module = ast.parse(account_string)
+    except SyntaxError as error:
+        raise InvalidAccountFile(error.msg, error.lineno)
+
+    variables = ACCOUNT_VARIABLES + tuple(OPTIONAL_VARIABLES)
+    description = dict(OPTIONAL_VARIABLES)
+    for statement in module.body:
+        if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id in variables):
+            raise InvalidAccountFile("only the variables {0} can be set".format(", ".join(variables)), statement.lineno)
+
+        name = statement.targets[0].id
+        if name == "OPERATIONS":
+            if not isinstance(statement.value, (ast.List, ast.Tuple)):
+                raise InvalidAccountFile("OPERATIONS must be a list or a tuple", statement.lineno)
+            description[name] = [_operation(node) for node in statement.value.elts]
+        else:
+            description[name] = _literal(statement.value)
+
+    missing_variables = [name for name in ACCOUNT_VARIABLES if name not in description]
+    if missing_variables:
+        raise InvalidAccountFile("missing variables {0}".format(", ".join(missing_variables)))
+
+    if description["INTEGER_AMOUNTS"]:
+        amounts = [description["REGULAR_INCOME"]]
+        for type_name, arguments, keyword_arguments in description["OPERATIONS"]:
+            amounts.extend(arguments)
+            amounts.extend(keyword_arguments.values())
+        if any(isinstance(amount, float) for amount in amounts):
+            raise InvalidAccountFile("an account with INTEGER_AMOUNTS can only contain int amounts")
+    return description
+
+def _cached_description(account_string, cache_dir):
+    """Return the description of an ACT file, from the caches if it has already been parsed"""
+    import hashlib
+    key = hashlib.sha256(account_string.encode("utf-8")).hexdigest()
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    description = None
+    if cache_dir is not None:
+        #The marshal format can change between Python versions
+        cache_file = os.path.join(cache_dir, "{0}-{1}{2}".format(key, marshal.version, CACHE_FILE_EXTENSION))
+        try:
+            with open(cache_file, "rb") as file, _gc_paused():
+                description = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    if description is None:
+        with _gc_paused():
+            description = parse_description(account_string)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            temporary_file = "{0}.{1}.tmp".format(cache_file, os.getpid())
+            with open(temporary_file, "wb") as file:
+                marshal.dump(description, file)
+            os.replace(temporary_file, cache_file)
+
+    _memory_cache[key] = description
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return description
+
+def _calendar(description):
+    """Return the Calendar of the periods of a described account, or None if they have no dates"""
+    if all(description.get(name) is None for name in CALENDAR_VARIABLES):
+        return None
+    #datetime is only imported for the accounts whose periods have dates
+    from pyrestriction.dates import calendar_from_variables
+    try:
+        return calendar_from_variables(*[description.get(name) for name in CALENDAR_VARIABLES])
+    except ValueError as error:
+        raise InvalidAccountFile(str(error))
+
+def parse_account(current_amount, account_string, cache_dir=None, format=None):
+    """
+    Parse an account from an ACT file. The ACT file must contain four variables : NAME, REGULAR_INCOME, CURRENCY, OPERATIONS
+    It can also set INTEGER_AMOUNTS to True, in which case all its amounts must be ints (see Account),
+    and give dates to the periods with PERIOD_START and PERIOD_CADENCE, or PERIOD_DATES (see pyrestriction.dates).
+
+    Parsed files are kept in memory, and also in cache_dir if it is given, so that a file that did not change is not parsed again.
+
+    If format is BINARY, or if it is not given and account_string holds the bytes of a binary account file,
+    the account is read with pyrestriction.binary instead.
+    """
+    with profiling.phase("parse"):
+        if format is None and not isinstance(account_string, str) and binary.is_binary(account_string):
+            format = BINARY
+        if format == BINARY:
+            return binary.parse_account(current_amount, account_string)
+        if not isinstance(account_string, str):
+            account_string = bytes(account_string).decode("utf-8")
+
+        description = _cached_description(account_string, cache_dir)
+        integer_amounts = description.get('INTEGER_AMOUNTS', False)
+        account = Account(current_amount, description['REGULAR_INCOME'], description['NAME'], description['CURRENCY'],
+                          integer_amounts = integer_amounts, calendar = _calendar(description))
+        for type_name, arguments, keyword_arguments in description['OPERATIONS']:
+            if integer_amounts and type_name in INTEGER_OPERATION_TYPES:
+                keyword_arguments = dict(keyword_arguments, integer = True)
+            account.add_operation(OPERATION_TYPES[type_name](*arguments, **keyword_arguments))
+
+        return account
+
+def format_from_filename(filename):
+    """Return the format of an account file from its extension"""
+    return BINARY if filename.endswith(BINARY_EXTENSION) else ACT
+
+def read_account_file(current_amount, filename, format=None, cache_dir=None):
+    """
+    Read the account file filename, in the given format. By default, the format is recognised from the content of the file.
+    Binary files are memory-mapped, and their operations are only read when they are needed.
+    The periods recorded in the journal of the file are ended (see pyrestriction.journal).
+    """
+    with open(filename, "rb") as file, profiling.phase("parse"):
+        if format is None:
+            format = BINARY if binary.is_binary(file.read(len(binary.MAGIC))) else ACT
+            file.seek(0)
+        if format == BINARY:
+            account = binary.parse_account(current_amount, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            account = parse_account(current_amount, file.read().decode("utf-8"), cache_dir)
+    with profiling.phase("compute"):
+        return journal.replay(account, filename)
+
+def _keep_mode(file, filename):
+    """Give file the permissions of the file filename, if it exists"""
+    try:
+        mode = os.stat(filename).st_mode
+    except FileNotFoundError:
+        return
+    os.chmod(file.fileno(), stat.S_IMODE(mode))
+
+def write_account_file(account, filename, format=None):
+    """
+    Write account to the file filename, in the given format. By default, the format is chosen from the extension of the file.
+    The account is written to a temporary file that then replaces filename, so that filename is never left half written,
+    and so that it can be written while it is still mapped in memory.
+    When filename is a symbolic link, the file it points to is replaced. The permissions of the replaced file are kept,
+    and the temporary file is synced to the disk before replacing it, so that a crash leaves either the old or the new account.
+    The file ends with a new generation line, so that the journal of filename no longer applies to it once it is written,
+    and the journal is removed (see pyrestriction.journal).
+    """
+    if format is None:
+        format = format_from_filename(filename)
+    target = os.path.realpath(filename)
+    temporary_filename = "{0}.{1}.tmp".format(target, os.getpid())
+    try:
+        with profiling.phase("write"):
+            if format == BINARY:
+                file = open(temporary_filename, "wb")
+            else:
+                file = open(temporary_filename, "w", encoding="utf-8")
+            with file:
+                _keep_mode(file, target)
+                write_account(account, file, format)
+                #Tells this version of the account file apart from the others for its journal
+                file.write(journal.generation_line().encode("ascii") if format == BINARY else journal.generation_line())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_filename, target)
+        journal.remove(filename)
+    finally:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+def write_account(account, buffer, format=ACT):
+    """Write account to buffer: a text buffer for the ACT format, a binary one for the BINARY format"""
+    if format == BINARY:
+        binary.write_account(account, buffer)
+        return
 
-def write_account(account, buffer):
     variable = lambda name, value: "{name} = {value}".format(name=name, value=value)
     variable_string = lambda name, value: variable(name, '"{value}"'.format(value=value))
     print(variable("REGULAR_INCOME", account.regular_income), file=buffer)
     print(variable_string("NAME", account.name), file=buffer)
     print(variable_string("CURRENCY", account.currency), file=buffer)
+    if account.integer_amounts:
+        print(variable("INTEGER_AMOUNTS", True), file=buffer)
+    if account.calendar is not None:
+        for name, value in account.calendar.variables().items():
+            if isinstance(value, list):
+                print(variable(name, "[{0}]".format(", ".join('"{0}"'.format(text) for text in value))), file=buffer)
+            else:
+                print(variable_string(name, value), file=buffer)
     print("", file=buffer)
-    print(variable("OPERATIONS", "[{operations}]".format(
-        operations = ",\n".join(o.__repr__() for o in account.operations)
-    )), file=buffer)
+
+    #The operations are written by chunks, so that the whole list is never held in memory as one string
+    buffer.write("OPERATIONS = [")
+    separator = ""
+    chunk = list()
+    for operation in account.operations:
+        chunk.append(serializer(operation.__class__)(operation))
+        if len(chunk) == WRITE_CHUNK_SIZE:
+            buffer.write(separator + ",\n".join(chunk))
+            separator = ",\n"
+            chunk = list()
+    if chunk:
+        buffer.write(separator + ",\n".join(chunk))
+    buffer.write("]\n")
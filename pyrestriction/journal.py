@@ -0,0 +1,137 @@
+import os
+
+# This file records the ends of period of an account file in a journal, next to it,
+# instead of writing the whole account file again each time.
+#
+# The journal of account.act is account.act.journal. It is a text file:
+#
+#     PYRJ 1432 1767225600123456789 9f86d081884c7d659a2feaa0c55ad015
+#     endperiod 1
+#     endperiod 12
+#
+# Its first line tells the account file it was started for: its size, its modification time,
+# and its generation, a random token that pyrestriction.io.write_account_file writes on the last
+# line of each account file (or - for the account files written by hand). Once the account file
+# has been written again with the periods of the journal ended, the journal no longer matches it
+# and is ignored: its records can never be applied twice, even if the writer stopped before removing it.
+# Inodes cannot be used instead, since the file system can give the new account file the inode of
+# an account file replaced before.
+# Telling the account file only takes a stat and a read of its last line, so that recording an end
+# of period takes the same time whatever the size of the account file.
+# The account file is synced to the disk before it replaces the old one, so that after a crash,
+# the journal matches the account file unless its periods have been written to it.
+#
+# Each record is appended with a single write, and is only complete with its newline.
+# A record that was cut short is ignored, since the end of period it was recording never finished.
+
+EXTENSION = ".journal"
+MAGIC = "PYRJ"
+RECORD = "endperiod"
+# The last line of the account files written by pyrestriction.io.write_account_file.
+# It is a comment in ACT files, and binary files end after their records.
+GENERATION_PREFIX = "# pyrestriction generation "
+GENERATION_SIZE = 16
+GENERATION_LINE_LENGTH = len(GENERATION_PREFIX) + 2 * GENERATION_SIZE + 1
+
+def journal_filename(filename):
+    return filename + EXTENSION
+
+def generation_line():
+    """Return a new generation line, to end an account file with"""
+    return "{0}{1}\n".format(GENERATION_PREFIX, os.urandom(GENERATION_SIZE).hex())
+
+def _generation(file, size):
+    """Return the generation written on the last line of the account file file, of size bytes, or - if it has none"""
+    if size < GENERATION_LINE_LENGTH:
+        return "-"
+    file.seek(size - GENERATION_LINE_LENGTH)
+    line = file.read(GENERATION_LINE_LENGTH).decode("ascii", errors="replace")
+    if not (line.startswith(GENERATION_PREFIX) and line.endswith("\n")):
+        return "-"
+    return line[len(GENERATION_PREFIX):-1]
+
+def _header(filename):
+    with open(filename, "rb") as file:
+        status = os.fstat(file.fileno())
+        generation = _generation(file, status.st_size)
+    return "{0} {1} {2} {3}\n".format(MAGIC, status.st_size, status.st_mtime_ns, generation)
+
+def _read(filename):
+    """Return the content of the journal of filename if it matches filename, None otherwise"""
+    try:
+        with open(journal_filename(filename), encoding="utf-8") as journal:
+            content = journal.read()
+    except FileNotFoundError:
+        return None
+    if not content.startswith(_header(filename)):
+        return None
+    return content
+
+def records(filename):
+    """Return the number of periods ended by each record of the journal of filename"""
+    content = _read(filename)
+    if content is None:
+        return []
+
+    nb_periods = list()
+    for line in content.splitlines(keepends=True)[1:]:
+        fields = line.split()
+        if line.endswith("\n") and len(fields) == 2 and fields[0] == RECORD and fields[1].isdigit():
+            nb_periods.append(int(fields[1]))
+    return nb_periods
+
+def append(filename, nb_periods):
+    """Record that nb_periods periods of the account file filename have ended"""
+    if nb_periods < 1:
+        raise ValueError("the number of periods to end must be at least 1")
+    content = _read(filename)
+    record = "{0} {1}\n".format(RECORD, nb_periods)
+    if content is None:
+        #No journal, or one left from a previous version of the account file
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        record = _header(filename) + record
+    else:
+        flags = os.O_WRONLY | os.O_APPEND
+        if not content.endswith("\n"):
+            #Drop the record that was cut short, which would otherwise be completed by this one
+            complete = content[:content.rindex("\n") + 1]
+            os.truncate(journal_filename(filename), len(complete.encode("utf-8")))
+
+    descriptor = os.open(journal_filename(filename), flags, 0o644)
+    try:
+        os.write(descriptor, record.encode("utf-8"))
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def replay(account, filename):
+    """
+    Return account, read from filename, with the periods of the journal of filename ended.
+    The money on the returned account is the one on account.
+    """
+    nb_periods_list = records(filename)
+    if not nb_periods_list:
+        return account
+
+    accountperiod = account
+    for nb_periods in nb_periods_list:
+        #Each record is replayed as endperiod computed it
+        accountperiod = accountperiod.next() if nb_periods == 1 else accountperiod.advance(nb_periods)
+    return accountperiod.with_amount(account.money_begining_period)
+
+def version(filename):
+    """Return what changes when filename or its journal is written: their modification times and sizes"""
+    status = os.stat(filename)
+    try:
+        journal_status = os.stat(journal_filename(filename))
+        journal_version = (journal_status.st_mtime_ns, journal_status.st_size)
+    except FileNotFoundError:
+        journal_version = None
+    return (status.st_mtime_ns, status.st_size, journal_version)
+
+def remove(filename):
+    """Remove the journal of filename, once filename has been written again"""
+    try:
+        os.remove(journal_filename(filename))
+    except FileNotFoundError:
+        pass
@@ -1,9 +1,17 @@
-from inspect import signature
+from collections import namedtuple
+from pyrestriction import profiling
 from pyrestriction.exceptions import NoNextOperation, OperationsOnlyMode
 
 # This file defines the model of the application: the bank account and the
 # various operations that are on going on it.
 
+# The number of periods after which Operation.last_period gives up looking for the end of an operation
+LAST_PERIOD_HORIZON = 100000
+
+# The amounts of a period, as given by AccountPeriodMixin.periods.
+# In OperationOnly mode, total and avaliable are None.
+PeriodSnapshot = namedtuple("PeriodSnapshot", ["number", "total", "saved", "debt", "avaliable", "operations"])
+
 class AccountPeriodMixin:
     """
     This mixin compute these numbers for a period:
@@ -12,26 +20,54 @@ class AccountPeriodMixin:
     - The amount of money saved this month: money unavaliable to the user but kept on the account at the end of the month
     - The amount of debt: money unavaliable to the user and that is taken away from the account at the end of the period
 
-    Its money_begining_period, regular_income, name, and currency properties must be implemented by each of its subclasses
+    Its money_begining_period, regular_income, name, currency, integer_amounts and calendar properties must be implemented by each of its subclasses
 
     It has the operation for its period, although it does not provide any way to add operations.
     Sublasses must, or not, do this bit.
 
     It is in charge to generate, if it can, the AccountPeriod for the next period
+
+    The saved and debt amounts are computed once, in a single pass over the operations, and kept
+    until the operations change. Subclasses that let the operations change must call
+    _invalidate_amounts.
+
+    The operations can be any sequence of Operation. If it has an aggregates method, like
+    pyrestriction.table.OperationTable, the saved and debt amounts are asked to it instead of being added up,
+    and the operations of the next periods are stored in a sequence of the same kind.
     """
     def __init__(self, operations=None):
         if operations == None:
             self._operations = list()
         else:
             self._operations = operations
+        self._amounts = None
+
+    def _add_amounts(self):
+        """Return the (saved, debt) amounts of the period, computing them if needed"""
+        if self._amounts is None and hasattr(self._operations, "aggregates"):
+            self._amounts = self._operations.aggregates()
+        elif self._amounts is None:
+            if profiling.enabled:
+                profiling.count("aggregate")
+            saved = 0
+            debt = 0
+            for operation in self._operations:
+                if operation.debt:
+                    debt += operation.amount
+                else:
+                    saved += operation.amount
+            self._amounts = (saved, debt)
+        return self._amounts
+
+    def _invalidate_amounts(self):
+        self._amounts = None
+
+    def _empty_operations(self):
+        """Return an empty sequence of the same kind as the operations of this period"""
+        if hasattr(self._operations, "empty_copy"):
+            return self._operations.empty_copy()
+        return list()
 
-    def  _add_amounts(self, debt):
-        result = 0
-        for operation in self._operations:
-            if operation.debt == debt:
-                result += operation.amount
-        return result
- 
     def total(self):
         if self.money_begining_period:
             return self.money_begining_period
@@ -39,53 +75,174 @@ class AccountPeriodMixin:
             raise OperationsOnlyMode()
 
     def saved(self):
-        return self._add_amounts(False)
+        return self._add_amounts()[0]
 
     def debt(self):
-        return self._add_amounts(True)
+        return self._add_amounts()[1]
 
     def avaliable(self):
         return self.total() - (self.saved() + self.debt())
 
     def next(self):
-        next_operations = list()
+        next_operations = self._empty_operations()
         for op in self._operations:
             try:
                 next_op = op.next()
                 next_operations.append(next_op)
             except NoNextOperation:
                 pass
+        if profiling.enabled:
+            profiling.count("operation_next", len(self._operations))
 
         return AccountPeriod(self, next_operations)
 
+    def timeline(self, nb_periods=None):
+        """Return the pyrestriction.timeline.Timeline of the periods starting with this one, or of the nb_periods first ones"""
+        from pyrestriction.timeline import Timeline
+        return Timeline(self, nb_periods)
+
+    def with_amount(self, current_amount):
+        """Return an Account with current_amount on it, and the operations of this period. It shares the operations and their amounts."""
+        account = Account(current_amount, self.regular_income, self.name, self.currency, self._operations, self.integer_amounts, self.calendar)
+        account._amounts = self._add_amounts()
+        return account
+
+    def advance(self, nb_periods):
+        """
+        Return the AccountPeriod nb_periods after this one, without creating the periods in between.
+        Each operation jumps directly to its state in that period.
+        """
+        operations = self._empty_operations()
+        debt_paid = 0
+        for op in self._operations:
+            if op.debt:
+                debt_paid += op.amount_sum(nb_periods)
+            try:
+                operations.append(op.advance(nb_periods))
+            except NoNextOperation:
+                pass
+
+        try:
+            money_begining_period = (self.total() - debt_paid) + nb_periods * self.regular_income
+        except OperationsOnlyMode:
+            money_begining_period = None
+        return AccountPeriod(self, operations, money_begining_period, nb_periods)
+
+    def periods(self, start=0, stop=None):
+        """
+        Yield a PeriodSnapshot for each period from start (0 being this period) to stop excluded, or forever if stop is None.
+
+        Only the money on the account and the operations of the current period are carried from one period
+        to the next, so that iterating over many periods uses the same memory as iterating over one.
+        The amounts are computed the same way as by the chain of AccountPeriod. When start is not 0,
+        the first period is reached through advance.
+        """
+        accountperiod = self.advance(start) if start else self
+        try:
+            total = accountperiod.total()
+        except OperationsOnlyMode:
+            total = None
+        operations = accountperiod.operations
+        regular_income = self.regular_income
+
+        number = start
+        while stop is None or number < stop:
+            saved = 0
+            debt = 0
+            next_operations = accountperiod._empty_operations()
+            for op in operations:
+                if op.debt:
+                    debt += op.amount
+                else:
+                    saved += op.amount
+                try:
+                    next_operations.append(op.next())
+                except NoNextOperation:
+                    pass
+            if profiling.enabled:
+                profiling.count("operation_next", len(operations))
+                profiling.count("aggregate")
+
+            avaliable = None if total is None else total - (saved + debt)
+            yield PeriodSnapshot(number, total, saved, debt, avaliable, operations)
+
+            if total is not None:
+                total = (total - debt) + regular_income
+            operations = next_operations
+            number += 1
+
     @property
     def operations(self):
         return self._operations
 
 
+_NOT_COMPUTED = object()
+
 class AccountPeriod(AccountPeriodMixin):
     """
-    This account period retrieve
+    This account period retrieve its money from the previous one: what was left on the account
+    at the end of the previous period, plus the regular income.
+
+    The money at the begining of the period is computed once and cached. When it is asked for,
+    the chain of previous periods is walked back iteratively up to the first one that knows its
+    own money, then computed forward, so that long chains never recurse.
+    The regular income, name and currency are copied from the previous period when it is created,
+    and so is its calendar, shifted by the nb_periods periods between them.
+
+    money_begining_period can be given when it is already known, for instance when jumping
+    several periods ahead. In that case, previous_accountperiod is only used for the regular income,
+    name, currency and calendar.
     """
-    def __init__(self, previous_accountperiod, operations):
+    def __init__(self, previous_accountperiod, operations, money_begining_period=_NOT_COMPUTED, nb_periods=1):
         super(AccountPeriod, self).__init__(operations)
+        if profiling.enabled:
+            profiling.count("accountperiod")
         self._previous_accountperiod = previous_accountperiod
+        self._money_begining_period = money_begining_period
+        self._regular_income = previous_accountperiod.regular_income
+        self._name = previous_accountperiod.name
+        self._currency = previous_accountperiod.currency
+        self._integer_amounts = previous_accountperiod.integer_amounts
+        calendar = previous_accountperiod.calendar
+        self._calendar = None if calendar is None else calendar.shifted(nb_periods)
+
+    def _compute_money_begining_period(self):
+        self._money_begining_period = (self._previous_accountperiod.total() - self._previous_accountperiod.debt())+self.regular_income
 
     @property
     def money_begining_period(self):
-        return (self._previous_accountperiod.total() - self._previous_accountperiod.debt())+self.regular_income
+        if self._money_begining_period is _NOT_COMPUTED:
+            #Walk back to the first period whose money is known...
+            uncomputed_periods = list()
+            period = self
+            while isinstance(period, AccountPeriod) and period._money_begining_period is _NOT_COMPUTED:
+                uncomputed_periods.append(period)
+                period = period._previous_accountperiod
+
+            #...then compute forward, each period only looking at its already computed previous one
+            for period in reversed(uncomputed_periods):
+                period._compute_money_begining_period()
+        return self._money_begining_period
 
     @property
     def regular_income(self):
-        return self._previous_accountperiod.regular_income
+        return self._regular_income
 
     @property
     def name(self):
-        return self._previous_accountperiod.name
+        return self._name
 
     @property
     def currency(self):
-        return self._previous_accountperiod.currency
+        return self._currency
+
+    @property
+    def integer_amounts(self):
+        return self._integer_amounts
+
+    @property
+    def calendar(self):
+        return self._calendar
 
 class Account(AccountPeriodMixin):
     """
@@ -95,18 +252,92 @@ class Account(AccountPeriodMixin):
     An accunt has three simple property :
     - The amount of money currently on
     - The amount of money that enter in it at the end of period
+
+    Its operations are stored in a list, unless another sequence, like an OperationTable, is given.
+
+    With integer_amounts, all the amounts of the account are ints in the minor unit of the currency (for instance, cents),
+    and its RegularSavingOperation and DebtOperation must be created with integer set.
+
+    With a calendar, a pyrestriction.dates.Calendar, the periods of the account have dates.
+
+    The saved and debt amounts are kept up to date as operations are added, removed or replaced,
+    so they are never added up again. Operations must be changed through these methods.
     """
-    def __init__(self, current_amount, regular_income, account_name, account_currency):
-        super(Account, self).__init__()
+    def __init__(self, current_amount, regular_income, account_name, account_currency, operations=None, integer_amounts=False, calendar=None):
+        super(Account, self).__init__(operations)
         self.money_begining_period = current_amount
         self.regular_income = regular_income
         self.name = account_name
         self.currency = account_currency
+        self.integer_amounts = integer_amounts
+        self.calendar = calendar
+
+    #Scenario part: the modules are imported here since they need NumPy when it is installed
+    def scenario(self, name):
+        """Return a new pyrestriction.scenario.Scenario on this account, to which changes can be made without changing the account"""
+        from pyrestriction.scenario import Scenario
+        return Scenario(self, name)
+
+    def compare(self, scenarios, nb_periods):
+        """Return the pyrestriction.scenario.Comparison of this account and of scenarios over nb_periods periods"""
+        from pyrestriction.scenario import Comparison
+        comparison = Comparison(self, nb_periods)
+        for scenario in scenarios:
+            comparison.evaluate(scenario)
+        return comparison
 
     #Operation handling part
+    def _update_amounts(self, saved_debt, operation, sign):
+        saved, debt = saved_debt
+        if operation.debt:
+            debt += sign * operation.amount
+        else:
+            saved += sign * operation.amount
+        return (saved, debt)
+
+    #The amounts are always read before the operations are changed, so that they do not already include the change
     def add_operation(self, operation):
+        amounts = self._add_amounts()
         self.operations.append(operation)
-        
+        self._amounts = self._update_amounts(amounts, operation, 1)
+
+    def remove_operation(self, operation):
+        """Remove the first operation equal to operation. Raise ValueError if there is none."""
+        amounts = self._add_amounts()
+        self.operations.remove(operation)
+        self._amounts = self._update_amounts(amounts, operation, -1)
+
+    def replace_operation(self, old_operation, new_operation):
+        """Replace the first operation equal to old_operation by new_operation. Raise ValueError if there is none."""
+        amounts = self._add_amounts()
+        index = self.operations.index(old_operation)
+        amounts = self._update_amounts(amounts, self.operations[index], -1)
+        self.operations[index] = new_operation
+        self._amounts = self._update_amounts(amounts, new_operation, 1)
+
+
+_serializers = dict()
+
+def serializer(operation_class):
+    """
+    Return the function giving the representation of the operations of operation_class:
+    "ClassName(parameter = value, ...)" for each parameter of its __init__ function.
+    It is generated the first time it is asked for, and then kept.
+    """
+    try:
+        return _serializers[operation_class]
+    except KeyError:
+        #inspect takes a while to import, and is only needed when account files are written
+        from inspect import signature
+        #Keyword only parameters, such as integer, are settings of the account and are not written with the operations
+        constructor_parameters = [parameter.name for parameter in signature(operation_class.__init__).parameters.values()
+                                  if parameter.kind != parameter.KEYWORD_ONLY]
+        constructor_parameters.pop(0)
+        #A single format string reading every attribute, such as "SavingOperation(amount = {0._amount})"
+        arguments = ", ".join("{p} = {{0._{p}}}".format(p = parameter) for parameter in constructor_parameters)
+        template = "{classname}({arguments})".format(classname=operation_class.__name__, arguments=arguments)
+        _serializers[operation_class] = template.format
+        return template.format
 
 class Operation:
     """
@@ -115,10 +346,17 @@ class Operation:
 
     Every subclasses of Operation must store all the parameters of their __init__ function as
     self._{name of the parameter}
-    This is used by the __repr__ function of Operation, which is used to format account files
+    This is used by the __repr__ function of Operation, which is used to format account files.
+    The serializer of each subclass is generated once from its __init__ signature, see serializer.
+    Keyword only parameters are not part of the representation.
 
     Its method "next" is responsible to create the Operation for the next period.
     If there is no next operation, it must raise NoNextOperation.
+
+    The methods schedule, amount_at, amount_sum, last_period, segments and advance give random access to the
+    following periods. Here, they are implemented by calling "next" repeatedly. Subclasses override them
+    with formulas derived from their constructor parameters.
+    Period 0 is the period of the operation itself.
     """
     def __init__(self, amount, debt = False):
         self._amount = amount
@@ -133,15 +371,85 @@ class Operation:
         return self._debt
 
     def __repr__(self):
-        constructor_parameters = list(signature(self.__class__.__init__).parameters)
-        constructor_parameters.pop(0)
-        textual_argument = ["{p} = {a}".format(p = parameter, a = self.__getattribute__("_"+parameter))
-                            for parameter in constructor_parameters]
-        arguments = ", ".join(textual_argument)
+        return serializer(self.__class__)(self)
+
+    def schedule(self, nb_periods):
+        """Return the amounts of the operation for at most nb_periods periods. The list stops with the operation."""
+        amounts = list()
+        operation = self
+        while len(amounts) < nb_periods:
+            amounts.append(operation.amount)
+            try:
+                operation = operation.next()
+            except NoNextOperation:
+                break
+        if profiling.enabled:
+            profiling.count("operation_next", len(amounts))
+        return amounts
+
+    def amount_at(self, period):
+        """Return the amount of the operation in the given period, 0 if the operation is over"""
+        amounts = self.schedule(period + 1)
+        if len(amounts) > period:
+            return amounts[period]
+        else:
+            return 0
 
-        classname = self.__class__.__name__
+    def amount_sum(self, nb_periods):
+        """Return the sum of the amounts of the operation over the nb_periods first periods"""
+        result = 0
+        for amount in self.schedule(nb_periods):
+            result += amount
+        return result
 
-        return "{classname}({arguments})".format(classname=classname, arguments=arguments)
+    def last_period(self):
+        """
+        Return the last period in which the operation exists, or None if it never ends.
+        Calling next cannot tell that an operation never ends: this version raises ValueError if the operation
+        still exists after LAST_PERIOD_HORIZON periods. Operations that never end must override it.
+        """
+        period = 0
+        operation = self
+        while period < LAST_PERIOD_HORIZON:
+            try:
+                operation = operation.next()
+            except NoNextOperation:
+                return period
+            period += 1
+        raise ValueError("{0} does not end within {1} periods, its last_period and segments methods must be overridden".format(
+            type(self).__name__, LAST_PERIOD_HORIZON))
+
+    def segments(self, nb_periods=None):
+        """
+        Return the amounts of the operation as a list of (start, amount, slope), sorted by start, the first one starting at 0.
+        From the period start until the start of the next segment, or forever for the last one,
+        the amount of the operation in period p is amount + slope * (p - start).
+
+        With nb_periods, the segments only need to give the amounts of the nb_periods first periods. This version then
+        reads them from the schedule, without looking for the end of the operation (see last_period).
+        """
+        if nb_periods is None:
+            amounts = self.schedule(self.last_period() + 1)
+            ended = True
+        else:
+            amounts = self.schedule(nb_periods)
+            ended = len(amounts) < nb_periods
+        segments = list()
+        for period, amount in enumerate(amounts):
+            if not segments or segments[-1][1] != amount:
+                segments.append((period, amount, 0))
+        if ended or not segments:
+            segments.append((len(amounts), 0, 0))
+        return segments
+
+    def advance(self, nb_periods):
+        """Return the operation nb_periods later. Raise NoNextOperation if it is over by then."""
+        if profiling.enabled:
+            profiling.count("operation_next", nb_periods)
+        operation = self
+        for i in range(nb_periods):
+            operation = operation.next()
+        return operation
 
 class SavingOperation(Operation):
     """Save money during one period"""
@@ -151,36 +459,216 @@ class SavingOperation(Operation):
     def next(self):
         raise NoNextOperation()
 
+    def schedule(self, nb_periods):
+        return [self.amount][:nb_periods]
+
+    def amount_at(self, period):
+        return self.amount if period == 0 else 0
+
+    def amount_sum(self, nb_periods):
+        return self.amount if nb_periods >= 1 else 0
+
+    def last_period(self):
+        return 0
+
+    def segments(self, nb_periods=None):
+        return [(0, self.amount, 0), (1, 0, 0)]
+
+    def advance(self, nb_periods):
+        if nb_periods == 0:
+            return self
+        raise NoNextOperation()
+
+# Splitting an amount over several periods.
+# With integer amounts (for instance, cents), each period gets the integer part of its share of what is left.
+# The remainder is thus spread, one unit per period, over the last periods: splitting 100 over 3 periods gives 33, 33 and 34.
+
+def _divide(amount, nb_periods, integer):
+    """Return the share of amount for the current period, when what is left of it is split over nb_periods periods"""
+    if integer:
+        return amount // nb_periods
+    return amount / nb_periods
+
+def _share(amount, nb_periods, index, integer):
+    """Return the share of the period index (from 0) of amount split over nb_periods periods"""
+    if integer:
+        quotient, remainder = divmod(amount, nb_periods)
+        return quotient + (1 if index >= nb_periods - remainder else 0)
+    return amount / nb_periods
+
+def _shares_sum(amount, nb_periods, nb_shares, integer):
+    """Return the sum of the nb_shares first shares of amount split over nb_periods periods"""
+    if integer:
+        quotient, remainder = divmod(amount, nb_periods)
+        return quotient * nb_shares + max(0, nb_shares - (nb_periods - remainder))
+    return amount * nb_shares / nb_periods
+
+def _shares_sums_sum(amount, nb_periods, nb_shares, integer):
+    """Return the sum of _shares_sum(amount, nb_periods, i, integer) for i from 1 to nb_shares"""
+    if integer:
+        quotient, remainder = divmod(amount, nb_periods)
+        extra_shares = max(0, nb_shares - (nb_periods - remainder))
+        return quotient * nb_shares * (nb_shares + 1) // 2 + extra_shares * (extra_shares + 1) // 2
+    return amount * nb_shares * (nb_shares + 1) / (2 * nb_periods)
+
 class RegularSavingOperation(Operation):
-    """Save an amount of money over several periods"""
-    def __init__(self, total_amount, nb_period_left, saved_amount):
+    """
+    Save an amount of money over several periods
+
+    With integer set, the amounts must be ints, and each period saves an integer amount (see _divide).
+    """
+    def __init__(self, total_amount, nb_period_left, saved_amount, *, integer=False):
         self._total_amount = total_amount
         self._nb_period_left = nb_period_left
         self._saved_amount = saved_amount
+        self._integer = integer
 
         saved_this_period = 0
         if self._nb_period_left >= 1 :
-            saved_this_period = (total_amount-saved_amount)/self._nb_period_left
+            saved_this_period = _divide(total_amount-saved_amount, self._nb_period_left, integer)
         super(RegularSavingOperation, self).__init__(saved_amount + saved_this_period)
 
     def next(self):
-        return RegularSavingOperation(self._total_amount, self._nb_period_left-1, self.amount)
+        return RegularSavingOperation(self._total_amount, self._nb_period_left-1, self.amount, integer=self._integer)
+
+    def schedule(self, nb_periods):
+        #Same computation as the chain of next(), without creating the operations
+        amounts = list()
+        saved_amount = self._saved_amount
+        nb_period_left = self._nb_period_left
+        for i in range(nb_periods):
+            if nb_period_left >= 1:
+                saved_amount = saved_amount + _divide(self._total_amount-saved_amount, nb_period_left, self._integer)
+            amounts.append(saved_amount)
+            nb_period_left -= 1
+        return amounts
+
+    def amount_at(self, period):
+        if self._nb_period_left < 1:
+            return self._saved_amount
+        elif period < self._nb_period_left:
+            return self._saved_amount + _shares_sum(self._total_amount-self._saved_amount, self._nb_period_left, period+1, self._integer)
+        else:
+            return self._total_amount
+
+    def amount_sum(self, nb_periods):
+        if self._nb_period_left < 1:
+            return self._saved_amount * nb_periods
+        saving_periods = min(nb_periods, self._nb_period_left)
+        saving = self._saved_amount*saving_periods + _shares_sums_sum(self._total_amount-self._saved_amount, self._nb_period_left, saving_periods, self._integer)
+        return saving + self._total_amount*(nb_periods-saving_periods)
+
+    def last_period(self):
+        return None
+
+    def segments(self, nb_periods=None):
+        if self._nb_period_left < 1:
+            return [(0, self._saved_amount, 0)]
+        amount, nb_periods = self._total_amount - self._saved_amount, self._nb_period_left
+        if not self._integer:
+            step = amount / nb_periods
+            return [(0, self._saved_amount + step, step), (nb_periods, self._total_amount, 0)]
+        #The last periods save one more unit (see _share)
+        quotient, remainder = divmod(amount, nb_periods)
+        segments = list()
+        if remainder < nb_periods:
+            segments.append((0, self._saved_amount + quotient, quotient))
+        if remainder:
+            first_larger = nb_periods - remainder
+            segments.append((first_larger, self._saved_amount + quotient * (first_larger + 1) + 1, quotient + 1))
+        segments.append((nb_periods, self._total_amount, 0))
+        return segments
+
+    def advance(self, nb_periods):
+        if nb_periods == 0:
+            return self
+        return RegularSavingOperation(self._total_amount, self._nb_period_left-nb_periods, self.amount_at(nb_periods-1), integer=self._integer)
 
 class DebtOperation(Operation):
-    """Pay a debt over a number of period"""
-    def __init__(self, total_amount, nb_period_left, payed_this_period, payed_amount):
+    """
+    Pay a debt over a number of period
+
+    With integer set, the amounts must be ints, and each period pays an integer amount (see _divide).
+    """
+    def __init__(self, total_amount, nb_period_left, payed_this_period, payed_amount, *, integer=False):
         if not payed_this_period:
-            super(DebtOperation, self).__init__((total_amount-payed_amount)/nb_period_left, True)
+            super(DebtOperation, self).__init__(_divide(total_amount-payed_amount, nb_period_left, integer), True)
         else :
             super(DebtOperation, self).__init__(0, True)
         self._total_amount = total_amount
         self._nb_period_left = nb_period_left
         self._payed_this_period = payed_this_period
         self._payed_amount = payed_amount
+        self._integer = integer
 
     def next(self):
         if self._nb_period_left - 1 >= 1 : 
-            return DebtOperation(self._total_amount, self._nb_period_left - 1, False, self._payed_amount + self.amount)
+            return DebtOperation(self._total_amount, self._nb_period_left - 1, False, self._payed_amount + self.amount, integer=self._integer)
+        else:
+            raise NoNextOperation()
+
+    def schedule(self, nb_periods):
+        #Same computation as the chain of next(), without creating the operations
+        amounts = list()
+        payed_amount = self._payed_amount
+        nb_period_left = self._nb_period_left
+        payed_this_period = self._payed_this_period
+        while len(amounts) < nb_periods:
+            amount = 0 if payed_this_period else _divide(self._total_amount-payed_amount, nb_period_left, self._integer)
+            amounts.append(amount)
+            if nb_period_left - 1 < 1:
+                break
+            payed_amount = payed_amount + amount
+            nb_period_left -= 1
+            payed_this_period = False
+        return amounts
+
+    def _paying_periods(self):
+        """Return the first period in which something is payed, and the number of periods in which something is payed"""
+        first_period = 1 if self._payed_this_period else 0
+        return first_period, self.last_period() + 1 - first_period
+
+    def amount_at(self, period):
+        first_period, nb_paying_periods = self._paying_periods()
+        if first_period <= period < first_period + nb_paying_periods:
+            return _share(self._total_amount-self._payed_amount, nb_paying_periods, period-first_period, self._integer)
+        elif period == 0:
+            return self.amount
+        else:
+            return 0
+
+    def amount_sum(self, nb_periods):
+        first_period, nb_paying_periods = self._paying_periods()
+        nb_payments = min(max(nb_periods - first_period, 0), nb_paying_periods)
+        if nb_payments == 0:
+            return 0
+        return _shares_sum(self._total_amount-self._payed_amount, nb_paying_periods, nb_payments, self._integer)
+
+    def last_period(self):
+        return max(self._nb_period_left - 1, 0)
+
+    def segments(self, nb_periods=None):
+        first_period, nb_paying_periods = self._paying_periods()
+        segments = [(0, self.amount, 0)] if first_period else []
+        if nb_paying_periods:
+            amount = self._total_amount - self._payed_amount
+            if not self._integer:
+                segments.append((first_period, amount / nb_paying_periods, 0))
+            else:
+                #The last periods pay one more unit (see _share)
+                quotient, remainder = divmod(amount, nb_paying_periods)
+                if remainder < nb_paying_periods:
+                    segments.append((first_period, quotient, 0))
+                if remainder:
+                    segments.append((first_period + nb_paying_periods - remainder, quotient + 1, 0))
+        segments.append((first_period + nb_paying_periods, 0, 0))
+        return segments
+
+    def advance(self, nb_periods):
+        if nb_periods == 0:
+            return self
+        elif nb_periods <= self.last_period():
+            return DebtOperation(self._total_amount, self._nb_period_left - nb_periods, False, self._payed_amount + self.amount_sum(nb_periods), integer=self._integer)
         else:
             raise NoNextOperation()
 
@@ -196,3 +684,27 @@ class RegularPaymentOperation(Operation):
 
       def next(self):
           return RegularPaymentOperation(self._regular_amount, False)
+
+      def schedule(self, nb_periods):
+          return [self.amount][:nb_periods] + [self._regular_amount] * (nb_periods - 1)
+
+      def amount_at(self, period):
+          return self.amount if period == 0 else self._regular_amount
+
+      def amount_sum(self, nb_periods):
+          if nb_periods <= 0:
+              return 0
+          return self.amount + self._regular_amount * (nb_periods - 1)
+
+      def last_period(self):
+          return None
+
+      def segments(self, nb_periods=None):
+          if self._payed_this_period:
+              return [(0, self.amount, 0), (1, self._regular_amount, 0)]
+          return [(0, self._regular_amount, 0)]
+
+      def advance(self, nb_periods):
+          if nb_periods == 0:
+              return self
+          return RegularPaymentOperation(self._regular_amount, False)
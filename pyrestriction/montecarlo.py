@@ -0,0 +1,198 @@
+import random
+from multiprocessing import Pool
+from pyrestriction.projection import project, numpy
+
+# This file simulates the amounts of an account when its income varies.
+#
+# Each simulated path draws the income of every period from a distribution, and can also scale the
+# saved and debt amounts of every period by a random factor around 1 (the amount spread).
+# The operations themselves are only projected once.
+#
+# The paths are simulated by batches, with NumPy when it is installed and in plain Python otherwise,
+# on a pool of worker processes. Each batch has its own random stream, derived from the seed and from
+# the number of the batch, so that the results only depend on the seed, the number of paths and the batch
+# size, and not on the number of workers.
+
+BATCH_SIZE = 10000
+PERCENTILES = (5, 50, 95)
+
+class Fixed:
+    """Always the same value"""
+    def __init__(self, value):
+        self.value = value
+
+    def sample(self, generator, nb_values):
+        return [self.value] * nb_values
+
+    def numpy_sample(self, generator, shape):
+        return numpy.full(shape, self.value, numpy.float64)
+
+class Normal:
+    def __init__(self, mean, stddev):
+        self.mean = mean
+        self.stddev = stddev
+
+    def sample(self, generator, nb_values):
+        return [generator.gauss(self.mean, self.stddev) for i in range(nb_values)]
+
+    def numpy_sample(self, generator, shape):
+        return generator.normal(self.mean, self.stddev, shape)
+
+class Uniform:
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, generator, nb_values):
+        return [generator.uniform(self.low, self.high) for i in range(nb_values)]
+
+    def numpy_sample(self, generator, shape):
+        return generator.uniform(self.low, self.high, shape)
+
+DISTRIBUTIONS = {"fixed": Fixed, "normal": Normal, "uniform": Uniform}
+
+def parse_distribution(text):
+    """Return the distribution described by text, such as "normal:1000:150" or "uniform:800:1200" """
+    name, *parameters = text.split(":")
+    if name not in DISTRIBUTIONS:
+        raise ValueError("Unknown distribution {0}, it must be one of {1}".format(name, ", ".join(DISTRIBUTIONS)))
+    try:
+        return DISTRIBUTIONS[name](*[float(parameter) for parameter in parameters])
+    except TypeError:
+        raise ValueError("Wrong number of parameters for the {0} distribution".format(name))
+
+class Simulation:
+    """
+    The result of simulate: for each period, the avaliable amount at each of the percentiles,
+    and the probability that the avaliable amount is below zero.
+    """
+    def __init__(self, nb_paths, percentiles, shortfall):
+        self.nb_paths = nb_paths
+        self.percentiles = percentiles
+        self.shortfall = shortfall
+
+    def __len__(self):
+        return len(self.shortfall)
+
+def _simulate_numpy(opening, saved, debt, income, amount_spread, nb_paths, seed):
+    generator = numpy.random.default_rng(seed)
+    shape = (nb_paths, len(saved))
+    incomes = income.numpy_sample(generator, shape)
+    #Without spread, the saved and debt amounts are the same for every path
+    saved = numpy.array(saved, numpy.float64)
+    debt = numpy.array(debt, numpy.float64)
+    if amount_spread:
+        saved = saved * generator.normal(1, amount_spread, shape)
+        debt = debt * generator.normal(1, amount_spread, shape)
+
+    #The money of a period is the opening amount, plus the incomes and minus the debts of the previous periods
+    total = numpy.empty(shape)
+    total[:, 0] = opening
+    numpy.cumsum(incomes[:, :-1] - debt[..., :-1], axis=1, out=total[:, 1:])
+    total[:, 1:] += opening
+    #One row per period, so that the paths of a period are contiguous when they are summarized
+    return numpy.ascontiguousarray((total - (saved + debt)).T)
+
+def _simulate_lists(opening, saved, debt, income, amount_spread, nb_paths, seed):
+    generator = random.Random(seed)
+    paths = list()
+    for path in range(nb_paths):
+        incomes = income.sample(generator, len(saved))
+        total = opening
+        avaliable = list()
+        for period in range(len(saved)):
+            period_saved, period_debt = saved[period], debt[period]
+            if amount_spread:
+                period_saved *= generator.gauss(1, amount_spread)
+                period_debt *= generator.gauss(1, amount_spread)
+            avaliable.append(total - (period_saved + period_debt))
+            total = (total - period_debt) + incomes[period]
+        paths.append(avaliable)
+    return paths
+
+def simulate_batch(task):
+    """
+    Simulate one (opening, saved, debt, income, amount spread, number of paths, seed, use NumPy) batch,
+    and return the avaliable amounts of its paths: a list per path, or with NumPy, an array with a row per period.
+    """
+    *arguments, use_numpy = task
+    if use_numpy:
+        return _simulate_numpy(*arguments)
+    return _simulate_lists(*arguments)
+
+def _percentile(ordered, percentile):
+    """Return the percentile of the ordered values, interpolated linearly like NumPy does by default"""
+    position = (len(ordered) - 1) * percentile / 100
+    index = int(position)
+    if index + 1 >= len(ordered):
+        return ordered[-1]
+    return ordered[index] + (ordered[index + 1] - ordered[index]) * (position - index)
+
+def _summarize_numpy(batches, percentiles):
+    avaliable = numpy.concatenate(batches, axis=1)
+    results = numpy.percentile(avaliable, percentiles, axis=1)
+    return ({percentile: result.tolist() for percentile, result in zip(percentiles, results)},
+            (avaliable < 0).mean(axis=1).tolist())
+
+def _summarize_lists(batches, percentiles, nb_periods):
+    paths = [path for batch in batches for path in batch]
+    results = {percentile: list() for percentile in percentiles}
+    shortfall = list()
+    for period in range(nb_periods):
+        ordered = sorted(path[period] for path in paths)
+        for percentile in percentiles:
+            results[percentile].append(_percentile(ordered, percentile))
+        shortfall.append(sum(1 for amount in ordered if amount < 0) / len(ordered))
+    return results, shortfall
+
+def check_arguments(nb_periods, nb_paths, percentiles, nb_workers=None):
+    """Raise ValueError if there are no periods, paths or workers to simulate, or if a percentile is not between 0 and 100"""
+    if nb_periods < 1:
+        raise ValueError("the number of periods to simulate must be at least 1")
+    if nb_paths < 1:
+        raise ValueError("the number of paths to simulate must be at least 1")
+    if nb_workers is not None and nb_workers < 1:
+        raise ValueError("the number of workers must be at least 1")
+    if not percentiles or any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise ValueError("the percentiles must be between 0 and 100")
+
+def simulate(account, nb_periods, nb_paths, income=None, amount_spread=0, seed=0, percentiles=PERCENTILES,
+             nb_workers=None, batch_size=BATCH_SIZE, use_numpy=None):
+    """
+    Simulate nb_paths paths of the nb_periods periods of account, and return a Simulation.
+
+    income is the distribution of the income of each period, by default always the regular income of the account.
+    amount_spread is the standard deviation of the factor applied to the saved and debt amounts of each period.
+    The paths are simulated on nb_workers processes (by default, one per CPU, and in this process if it is 1).
+    use_numpy forces or prevents the use of NumPy. By default, NumPy is used if it is installed.
+    Raise ValueError if there are no periods, paths or workers, or if a percentile is not between 0 and 100.
+    """
+    check_arguments(nb_periods, nb_paths, percentiles, nb_workers)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError("NumPy is not installed")
+    if income is None:
+        income = Fixed(account.regular_income)
+
+    base = project(account, nb_periods, use_numpy=False)
+    opening = account.total()
+    sizes = [min(batch_size, nb_paths - start) for start in range(0, nb_paths, batch_size)]
+    if use_numpy:
+        seeds = numpy.random.SeedSequence(seed).spawn(len(sizes))
+    else:
+        seeds = ["{0}-{1}".format(seed, batch) for batch in range(len(sizes))]
+    tasks = [(opening, base.saved, base.debt, income, amount_spread, size, batch_seed, use_numpy)
+             for size, batch_seed in zip(sizes, seeds)]
+
+    if nb_workers == 1 or len(tasks) == 1:
+        batches = list(map(simulate_batch, tasks))
+    else:
+        with Pool(nb_workers) as pool:
+            batches = pool.map(simulate_batch, tasks)
+
+    if use_numpy:
+        results, shortfall = _summarize_numpy(batches, percentiles)
+    else:
+        results, shortfall = _summarize_lists(batches, percentiles, nb_periods)
+    return Simulation(nb_paths, results, shortfall)
@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+
+# This file counts what happens on the hot paths of pyrestriction, and times its phases
+# (parse, compute, write, render).
+#
+# It is disabled by default. The hot paths check the enabled flag before counting,
+# so that it costs a single attribute lookup when disabled:
+#
+#     if profiling.enabled:
+#         profiling.count("operation_next", len(operations))
+#
+# Counters:
+# - operation_next: calls to Operation.next
+# - accountperiod: AccountPeriod created
+# - aggregate: saved and debt amounts added up from the operations
+
+enabled = False
+_counters = dict()
+_phases = dict()
+_active_phases = set()
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    _counters.clear()
+    _phases.clear()
+
+def count(name, number=1):
+    _counters[name] = _counters.get(name, 0) + number
+
+@contextmanager
+def phase(name):
+    """Time what happens in the with block as the phase name. A phase nested in itself is only timed once."""
+    if not enabled or name in _active_phases:
+        yield
+        return
+
+    _active_phases.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = _phases.get(name, 0) + time.perf_counter() - start
+        _active_phases.discard(name)
+
+def report():
+    """Return the counters and the time spent in each phase, in seconds"""
+    return {"counters": dict(_counters), "phases": dict(_phases)}
+
+def format_report():
+    lines = ["Profile :", "Phases :"]
+    lines.extend("  {0} : {1:.6f} s".format(name, seconds) for name, seconds in sorted(_phases.items()))
+    lines.append("Counters :")
+    lines.extend("  {0} : {1}".format(name, number) for name, number in sorted(_counters.items()))
+    return "\n".join(lines)
+
+@contextmanager
+def profiled():
+    """Enable profiling, from zero, for the with block, and give the report"""
+    reset()
+    enable()
+    result = dict()
+    try:
+        yield result
+    finally:
+        disable()
+        result.update(report())
@@ -0,0 +1,109 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# This file computes the amounts of an account over many periods at once.
+# Instead of building an AccountPeriod per period, each operation is turned into
+# its amounts for each period, which are added together.
+#
+# With plain lists, each operation gives its schedule, and the amounts are added in the
+# same order as AccountPeriodMixin does, so the results are exactly the ones of the
+# AccountPeriod chain.
+# With NumPy, each operation gives its segments (see Operation.segments), which fill the
+# columns a slice at a time, and the money on the account is a cumulative sum of the
+# income and of the debts. This only gives exactly the results of the chain with int
+# amounts: float amounts would be added in another order, and rounded differently, so
+# accounts with float amounts are always projected with plain lists.
+# NumPy is used when it is installed, plain lists are used otherwise.
+
+class Projection:
+    """
+    The amounts of an account for a number of periods.
+    Period 0 is the current period.
+
+    total, saved, debt and avaliable are sequences of the same length: NumPy arrays of ints if NumPy was used,
+    lists otherwise.
+    """
+    def __init__(self, total, saved, debt, avaliable):
+        self.total = total
+        self.saved = saved
+        self.debt = debt
+        self.avaliable = avaliable
+
+    def __len__(self):
+        return len(self.total)
+
+def _totals(total, income, debts):
+    """Carry the money on the account forward from one period to the next, like AccountPeriod does"""
+    totals = list()
+    for debt in debts:
+        totals.append(total)
+        total = (total - debt) + income
+    return totals
+
+def _project_lists(opening, income, schedules, nb_periods):
+    saved = [0] * nb_periods
+    debt = [0] * nb_periods
+    for is_debt, amounts in schedules:
+        column = debt if is_debt else saved
+        for period, amount in enumerate(amounts):
+            column[period] += amount
+
+    total = _totals(opening, income, debt)
+    avaliable = [t - (s + d) for t, s, d in zip(total, saved, debt)]
+    return Projection(total, saved, debt, avaliable)
+
+def _has_floats(opening, income, segments):
+    """Tell if any of the amounts of a projection is a float"""
+    values = [opening, income]
+    values.extend(value for is_debt, operation_segments in segments for start, amount, slope in operation_segments for value in (amount, slope))
+    return any(isinstance(value, float) for value in values)
+
+def _project_numpy(opening, income, segments, nb_periods):
+    dtype = numpy.int64
+    saved = numpy.zeros(nb_periods, dtype)
+    debt = numpy.zeros(nb_periods, dtype)
+    offsets = numpy.arange(nb_periods, dtype=dtype)
+    for is_debt, operation_segments in segments:
+        column = debt if is_debt else saved
+        stops = [start for start, amount, slope in operation_segments[1:]] + [nb_periods]
+        for (start, amount, slope), stop in zip(operation_segments, stops):
+            stop = min(stop, nb_periods)
+            if start >= stop:
+                continue
+            column[start:stop] += amount
+            if slope:
+                column[start:stop] += slope * offsets[:stop - start]
+
+    #The money of a period is the opening amount, plus the incomes and minus the debts of the previous periods
+    total = numpy.empty(nb_periods, dtype)
+    if nb_periods:
+        total[0] = opening
+        numpy.cumsum(income - debt[:-1], out=total[1:])
+        total[1:] += opening
+    avaliable = total - (saved + debt)
+    return Projection(total, saved, debt, avaliable)
+
+def project(accountperiod, nb_periods, use_numpy=None):
+    """
+    Compute the amounts of accountperiod and of the nb_periods-1 periods following it.
+    Raise OperationsOnlyMode if the amount of money on the account is unknown.
+
+    use_numpy forces or prevents the use of NumPy. By default, NumPy is used if it is installed.
+    Even then, the amounts of an account with float amounts are computed with plain lists.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError("NumPy is not installed")
+
+    opening = accountperiod.total()
+    if use_numpy:
+        segments = [(operation.debt, operation.segments(nb_periods)) for operation in accountperiod.operations]
+        if not _has_floats(opening, accountperiod.regular_income, segments):
+            return _project_numpy(opening, accountperiod.regular_income, segments, nb_periods)
+
+    schedules = [(operation.debt, operation.schedule(nb_periods))
+                 for operation in accountperiod.operations]
+    return _project_lists(opening, accountperiod.regular_income, schedules, nb_periods)
@@ -0,0 +1,92 @@
+from pyrestriction.projection import Projection, project, numpy
+
+# This file compares what-if scenarios on an account: the same account with some operations
+# added, removed or replaced.
+#
+# The account is projected once, as the base of every scenario. A scenario is then computed from
+# the base and from the schedules of the operations it changes only: each change moves the saved
+# or debt amount of the periods by the amounts of its operation, and a change in the debt paid
+# at the end of a period moves the money on the account in all the periods after it.
+# With float amounts, the results can differ from a projection of the changed account by rounding.
+
+class Scenario:
+    """
+    Changes to the operations of an account, made with add, remove and override.
+    They are only recorded: the account is never changed.
+    """
+    def __init__(self, account, name):
+        self._account = account
+        self.name = name
+        self._changes = list()
+
+    def add(self, operation):
+        """Add operation to the account. Return the scenario, so that changes can be chained."""
+        self._changes.append((operation, 1))
+        return self
+
+    def remove(self, operation, *, known=False):
+        """
+        Remove operation from the account. Raise ValueError if the account does not have it.
+        With known set, operation is known to be one of the operations of the account, and is not looked for:
+        their sequence then needs no index method, as for binary account files.
+        """
+        if not known:
+            self._account.operations.index(operation)
+        self._changes.append((operation, -1))
+        return self
+
+    def override(self, old_operation, new_operation):
+        """Replace old_operation by new_operation. Raise ValueError if the account does not have old_operation."""
+        return self.remove(old_operation).add(new_operation)
+
+    def deltas(self, nb_periods):
+        """Return the changes of the saved and debt amounts of each of the nb_periods periods"""
+        saved = [0] * nb_periods
+        debt = [0] * nb_periods
+        for operation, sign in self._changes:
+            column = debt if operation.debt else saved
+            for period, amount in enumerate(operation.schedule(nb_periods)):
+                column[period] += sign * amount
+        return saved, debt
+
+def _plus(values, delta):
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values + numpy.array(delta)
+    return [value + change for value, change in zip(values, delta)]
+
+class Comparison:
+    """
+    The amounts of an account and of scenarios on it, for nb_periods periods.
+    The account is projected once, when the comparison is created, unless its projection is given as base.
+    """
+    def __init__(self, account, nb_periods, base=None):
+        self._account = account
+        self.nb_periods = nb_periods
+        self.base = project(account, nb_periods) if base is None else base
+        self.projections = dict()
+
+    def evaluate(self, scenario):
+        """Return the Projection of the account with the changes of scenario, and keep it under the name of scenario"""
+        saved_delta, debt_delta = scenario.deltas(self.nb_periods)
+
+        #The debt paid at the end of a period is taken from the money of all the following periods
+        total_delta = list()
+        paid = 0
+        for delta in debt_delta:
+            total_delta.append(-paid)
+            paid += delta
+        avaliable_delta = [t - (s + d) for t, s, d in zip(total_delta, saved_delta, debt_delta)]
+
+        result = Projection(_plus(self.base.total, total_delta),
+                            _plus(self.base.saved, saved_delta),
+                            _plus(self.base.debt, debt_delta),
+                            _plus(self.base.avaliable, avaliable_delta))
+        self.projections[scenario.name] = result
+        return result
+
+    def avaliable(self):
+        """Return the names of the account and of the evaluated scenarios, and the avaliable amount of each period for each of them"""
+        names = [self._account.name] + list(self.projections)
+        columns = [self.base.avaliable] + [result.avaliable for result in self.projections.values()]
+        rows = [[column[period] for column in columns] for period in range(self.nb_periods)]
+        return names, rows
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+from pyrestriction.io import read_account_file, write_account_file
+from pyrestriction.batch import projection_result
+from pyrestriction import journal
+
+# This file serves the accounts to many clients, from a long running process.
+#
+# The server listens on a Unix socket, or on a TCP port of localhost. Clients send
+# one JSON request per line, and get one JSON response per line, in the same order:
+#
+#     {"command": "available", "account_file": "account.act", "amount": 20000, "periods": 2}
+#     {"command": "projection", "account_file": "account.act", "amount": 20000, "periods": 12}
+#     {"command": "endperiod", "account_file": "account.act", "periods": 1}
+#     {"command": "endperiod", "account_file": "account.act", "periods": 1, "journal": true}
+#
+# available gives the amounts of each period, projection gives them as the batch command does,
+# and endperiod ends periods and writes the account file, in its own format,
+# or only records them in the journal of the account file.
+# A request that fails gives a response with an "error" key instead, as does one asking for more than MAX_PERIODS periods.
+#
+# Requests are not authenticated: anyone who can connect can read and write the account files the server can.
+# A TCP port of localhost can be connected to by every user of the machine, so on a shared machine only serve
+# on a Unix socket in a directory that only its owner can open.
+#
+# Parsed accounts are kept in memory, and an account file is only read again when it or its journal changes.
+# The end of periods of an account file are done one at a time.
+
+COMMANDS = ("available", "projection", "endperiod")
+# The most periods a request can ask for, so that a single request cannot hold the server for long
+MAX_PERIODS = 10000
+
+def _periods(request, default):
+    """Return the number of periods of request. Raise ValueError if it is not between 1 and MAX_PERIODS."""
+    nb_periods = int(request.get("periods", default))
+    if not 1 <= nb_periods <= MAX_PERIODS:
+        raise ValueError("the number of periods must be between 1 and {0}".format(MAX_PERIODS))
+    return nb_periods
+
+class AccountCache:
+    """The accounts read from account files, read again when their file is modified"""
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+        self._accounts = dict()
+
+    def get(self, filename):
+        """Return the account of filename, without money on it"""
+        version = journal.version(filename)
+        cached = self._accounts.get(filename)
+        if cached is None or cached[0] != version:
+            cached = (version, read_account_file(None, filename, cache_dir = self._cache_dir))
+            self._accounts[filename] = cached
+        return cached[1]
+
+    def put(self, filename, account):
+        """Keep account as the content of filename, that has just been written"""
+        self._accounts[filename] = (journal.version(filename), account)
+
+class Server:
+    """Answer the requests on the accounts, keeping them in an AccountCache"""
+    def __init__(self, cache_dir=None):
+        self._cache = AccountCache(cache_dir)
+        self._locks = dict()
+
+    def _lock(self, filename):
+        if filename not in self._locks:
+            self._locks[filename] = asyncio.Lock()
+        return self._locks[filename]
+
+    def _account(self, request):
+        account = self._cache.get(os.path.abspath(request["account_file"]))
+        return account.with_amount(int(request["amount"]))
+
+    async def available(self, request):
+        account = self._account(request)
+        periods = [{"number": period.number,
+                    "total": period.total,
+                    "saved": period.saved,
+                    "debt": period.debt,
+                    "avaliable": period.avaliable}
+                   for period in account.periods(stop=_periods(request, 2))]
+        return {"name": account.name, "currency": account.currency, "periods": periods}
+
+    async def projection(self, request):
+        return projection_result(request["account_file"], self._account(request), _periods(request, 2))
+
+    async def endperiod(self, request):
+        filename = os.path.abspath(request["account_file"])
+        #Only the account file can be written, so that clients cannot write anywhere the server can
+        if "output" in request or "format" in request:
+            raise ValueError("endperiod only writes the account file, output and format cannot be given")
+        nb_periods = _periods(request, 1)
+
+        #The account is read and written under the lock of the file, so that no end of period is lost
+        async with self._lock(filename):
+            if request.get("journal"):
+                journal.append(filename, nb_periods)
+                return {"journal": journal.journal_filename(filename)}
+            account = self._cache.get(filename)
+            account = account.next() if nb_periods == 1 else account.advance(nb_periods)
+            #The file is written by another thread, so that the other requests are answered meanwhile
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, write_account_file, account, filename)
+            #A new Account sharing the operations is kept, so that the periods before it are not kept alive
+            self._cache.put(filename, account.with_amount(None))
+        return {"account_name": account.name, "filename": filename}
+
+    async def answer(self, request):
+        """Return the response to request, a dictionary"""
+        try:
+            command = request.get("command")
+            if command not in COMMANDS:
+                raise ValueError("Unknown command {0}".format(command))
+            return await getattr(self, command)(request)
+        except Exception as exception:
+            return {"error": "{0}: {1}".format(type(exception).__name__, exception)}
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request must be a JSON object")
+                except ValueError as exception:
+                    response = {"error": "{0}: {1}".format(type(exception).__name__, exception)}
+                else:
+                    response = await self.answer(request)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, socket_path=None, port=None):
+        """Start listening on the Unix socket socket_path, or on port of localhost, and return the asyncio server"""
+        if socket_path is not None:
+            return await asyncio.start_unix_server(self.handle_client, socket_path)
+        return await asyncio.start_server(self.handle_client, "127.0.0.1", port)
+
+def serve(socket_path=None, port=None, cache_dir=None):
+    """Serve the accounts until interrupted"""
+    async def run():
+        server = await Server(cache_dir).start(socket_path, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,191 @@
+from array import array
+from pyrestriction.model import SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation
+
+# This file defines a compact storage for the operations of an account.
+# Instead of keeping one Operation object per operation, the constructor parameters
+# of the operations are kept in parallel arrays, one item per operation.
+# The amount and the debt flag of each operation, as they were added to the saved and debt
+# amounts of the table, have their own columns, so that a row is taken out of these amounts
+# without creating its operation again.
+
+# Type codes of the operations that are stored in columns, and the numeric parameters
+# of their constructors. The boolean parameter payed_this_period has its own column.
+# Operations of any other type are kept as objects, with the type code OTHER.
+OTHER = 0
+OPERATION_TYPES = [None, SavingOperation, RegularSavingOperation, DebtOperation, RegularPaymentOperation]
+TYPE_CODES = {operation_type: code for code, operation_type in enumerate(OPERATION_TYPES) if operation_type}
+NUMERIC_PARAMETERS = {
+    SavingOperation: ("amount",),
+    RegularSavingOperation: ("total_amount", "nb_period_left", "saved_amount"),
+    DebtOperation: ("total_amount", "nb_period_left", "payed_amount"),
+    RegularPaymentOperation: ("regular_amount",)
+}
+FLAG_PARAMETER = "payed_this_period"
+NB_PARAMETERS = 3
+# Operation types that can be created with integer set, and the bit of the int parameters telling that it is
+INTEGER_OPERATION_TYPES = (RegularSavingOperation, DebtOperation)
+INTEGER_OPERATION = 0x80
+
+def encode_operation(operation):
+    """
+    Return the (type code, int parameters, flag, parameters) row of an operation of one of the OPERATION_TYPES.
+    Bit i of int parameters is set when the parameter i is an int, so that it is given back as an int.
+    The INTEGER_OPERATION bit is set for operations created with integer set.
+    """
+    code = TYPE_CODES[type(operation)]
+    parameters = [0] * NB_PARAMETERS
+    int_parameters = 0
+    for i, name in enumerate(NUMERIC_PARAMETERS[OPERATION_TYPES[code]]):
+        value = getattr(operation, "_" + name)
+        parameters[i] = value
+        if isinstance(value, int):
+            int_parameters |= 1 << i
+    if getattr(operation, "_integer", False):
+        int_parameters |= INTEGER_OPERATION
+    flag = getattr(operation, "_" + FLAG_PARAMETER, False)
+    return (code, int_parameters, flag, parameters)
+
+def decode_operation(code, int_parameters, flag, parameters):
+    """Create the operation of a row given by encode_operation"""
+    operation_type = OPERATION_TYPES[code]
+    arguments = dict()
+    for i, name in enumerate(NUMERIC_PARAMETERS[operation_type]):
+        value = parameters[i]
+        arguments[name] = int(value) if int_parameters & (1 << i) else value
+    if operation_type in (DebtOperation, RegularPaymentOperation):
+        arguments[FLAG_PARAMETER] = bool(flag)
+    if operation_type in INTEGER_OPERATION_TYPES:
+        arguments["integer"] = bool(int_parameters & INTEGER_OPERATION)
+    return operation_type(**arguments)
+
+class OperationTable:
+    """
+    A sequence of operations stored in columns.
+
+    The saved and debt amounts are added up as operations are appended, and the amounts of deleted
+    or replaced rows are taken from the amount and debt columns, so aggregates() does not have to go
+    through the operations.
+    Operations are only created when they are read, by iterating or indexing the table.
+    Operations of other types are kept in a dict, under a key stored in their first parameter,
+    and are removed from it when their row is deleted or replaced.
+    """
+    def __init__(self, operations=()):
+        self._types = array('B')
+        self._amounts = array('d')
+        self._debts = array('B')
+        self._flags = array('B')
+        self._int_parameters = array('B')
+        self._parameters = [array('d') for i in range(NB_PARAMETERS)]
+        self._others = dict()
+        self._next_other = 0
+        self._saved = 0
+        self._debt = 0
+        for operation in operations:
+            self.append(operation)
+
+    def empty_copy(self):
+        """Return an empty OperationTable. Used by AccountPeriodMixin to store the operations of the next period"""
+        return OperationTable()
+
+    def _encode(self, operation):
+        """Return the row of the columns for operation, keeping it in self._others if it is not of one of the OPERATION_TYPES"""
+        if type(operation) in TYPE_CODES:
+            return encode_operation(operation)
+        key = self._next_other
+        self._next_other += 1
+        self._others[key] = operation
+        return (OTHER, 0, False, [key] + [0] * (NB_PARAMETERS - 1))
+
+    def _forget(self, index):
+        """Remove the operation of the row index from self._others, if it is kept there"""
+        if self._types[index] == OTHER:
+            del self._others[int(self._parameters[0][index])]
+
+    def _add_to_aggregates(self, operation):
+        """Add the amount of operation to the aggregates, and return the (amount, debt) of its row"""
+        amount = operation.amount
+        if operation.debt:
+            self._debt += amount
+        else:
+            self._saved += amount
+        return (amount, operation.debt)
+
+    def _remove_from_aggregates(self, index):
+        """Take the amount of the row index out of the aggregates"""
+        amount = self._amounts[index]
+        #An aggregate is only an int if all the amounts added to it were ints
+        if self._debts[index]:
+            self._debt -= int(amount) if isinstance(self._debt, int) else amount
+        else:
+            self._saved -= int(amount) if isinstance(self._saved, int) else amount
+
+    def append(self, operation):
+        code, int_parameters, flag, parameters = self._encode(operation)
+        amount, debt = self._add_to_aggregates(operation)
+        self._types.append(code)
+        self._amounts.append(amount)
+        self._debts.append(debt)
+        self._flags.append(flag)
+        self._int_parameters.append(int_parameters)
+        for column, value in zip(self._parameters, parameters):
+            column.append(value)
+
+    def index(self, operation):
+        """
+        Return the index of the first operation of the table equal to operation:
+        of the same type and with the same parameters. Operations stored as objects are compared by identity.
+        """
+        if TYPE_CODES.get(type(operation), OTHER) == OTHER:
+            for index, code in enumerate(self._types):
+                if code == OTHER and self[index] is operation:
+                    return index
+        else:
+            code, int_parameters, flag, parameters = encode_operation(operation)
+            for index in range(len(self)):
+                if (self._types[index] == code and self._flags[index] == flag
+                        and all(column[index] == value for column, value in zip(self._parameters, parameters))):
+                    return index
+        raise ValueError("Operation not in the table")
+
+    def remove(self, operation):
+        del self[self.index(operation)]
+
+    def __delitem__(self, index):
+        self._remove_from_aggregates(index)
+        self._forget(index)
+        for column in [self._types, self._amounts, self._debts, self._flags, self._int_parameters] + self._parameters:
+            del column[index]
+
+    def __setitem__(self, index, operation):
+        self._remove_from_aggregates(index)
+        self._forget(index)
+        code, int_parameters, flag, parameters = self._encode(operation)
+        self._amounts[index], self._debts[index] = self._add_to_aggregates(operation)
+        self._types[index] = code
+        self._flags[index] = flag
+        self._int_parameters[index] = int_parameters
+        for column, value in zip(self._parameters, parameters):
+            column[index] = value
+
+    def aggregates(self):
+        """Return the (saved, debt) amounts of the operations"""
+        return (self._saved, self._debt)
+
+    def __len__(self):
+        return len(self._types)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("OperationTable index out of range")
+
+        code = self._types[index]
+        if code == OTHER:
+            return self._others[int(self._parameters[0][index])]
+        return decode_operation(code, self._int_parameters[index], self._flags[index],
+                                [column[index] for column in self._parameters])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,129 @@
+from bisect import bisect_right
+from pyrestriction.exceptions import OperationsOnlyMode
+from pyrestriction.model import PeriodSnapshot
+
+# This file indexes the amounts of the periods of an account by segments.
+#
+# Between the periods where an operation starts, ends, or changes the way its amount grows,
+# the saved and debt amounts change by a fixed amount each period, and so does the money on the
+# account. The timeline keeps the sorted periods where a segment starts, and for each segment, the
+# amounts of its first period and how they change, so that the amounts of any period are found
+# by a binary search, without going through the periods before it.
+#
+# The saved and debt amounts of the first period of a segment are the sums of the amounts of the
+# operations in this period, added in the order of the operations as AccountPeriod does, instead of
+# being carried from one segment to the next, which would accumulate rounding errors.
+# With float amounts, the other periods of a segment can still differ from the chain of AccountPeriod by rounding.
+
+def _add_segments(changes, index, segments):
+    """Record in changes, by period, the segments of the operation index that start in this period"""
+    for segment in segments:
+        changes.setdefault(segment[0], list()).append((index, segment))
+
+def _sum_at(active, period):
+    """Return the sum of the amounts in period of the active segments, in the order of their operations, and the sum of their slopes"""
+    amount, slope = 0, 0
+    for index in sorted(active):
+        start, segment_amount, segment_slope = active[index]
+        amount += segment_amount + segment_slope * (period - start)
+        slope += segment_slope
+    return amount, slope
+
+def _start_segments(active, changes, period):
+    """Start the segments of changes in active, and return the sums of the amounts in period and of the slopes of the active segments"""
+    for index, segment in changes:
+        start, amount, slope = segment
+        #The int zero segment of an ended operation adds nothing, as an ended operation is no longer in the AccountPeriod
+        if type(amount) is int and type(slope) is int and amount == slope == 0:
+            active.pop(index, None)
+        else:
+            active[index] = segment
+    return _sum_at(active, period)
+
+class Timeline:
+    """
+    The amounts of an account period and of the periods following it, by segments.
+    Period 0 is the period the timeline was made from.
+    In OperationOnly mode, the total and avaliable amounts are None.
+
+    With nb_periods, the timeline only holds the nb_periods first periods, so that operations
+    that only know their amounts by calling next can be used (see Operation.segments).
+    """
+    def __init__(self, accountperiod, nb_periods=None):
+        self._nb_periods = nb_periods
+        self._income = accountperiod.regular_income
+        try:
+            total = accountperiod.total()
+        except OperationsOnlyMode:
+            total = None
+
+        saved_changes, debt_changes = dict(), dict()
+        for index, operation in enumerate(accountperiod.operations):
+            _add_segments(debt_changes if operation.debt else saved_changes, index, operation.segments(nb_periods))
+
+        #For each segment: its first period, and the saved amount, the debt amount, their slopes and the total of that period
+        self.starts = sorted(set(saved_changes) | set(debt_changes) | {0})
+        self._segments = list()
+        #The segment of each operation that has not ended, by index of operation
+        saved_active, debt_active = dict(), dict()
+        saved, saved_slope, debt, debt_slope = 0, 0, 0, 0
+        previous_start = 0
+        for start in self.starts:
+            length = start - previous_start
+            if total is not None and length:
+                #The debt of each period of the previous segment has been paid, and the income received
+                total = total + length * self._income - (debt * length + debt_slope * (length * (length - 1) // 2))
+            if start in saved_changes:
+                saved, saved_slope = _start_segments(saved_active, saved_changes[start], start)
+            elif saved_slope:
+                saved, saved_slope = _sum_at(saved_active, start)
+            if start in debt_changes:
+                debt, debt_slope = _start_segments(debt_active, debt_changes[start], start)
+            elif debt_slope:
+                debt, debt_slope = _sum_at(debt_active, start)
+            self._segments.append((saved, saved_slope, debt, debt_slope, total))
+            previous_start = start
+
+    def __len__(self):
+        """Return the number of segments"""
+        return len(self.starts)
+
+    def _snapshot(self, period, index):
+        saved, saved_slope, debt, debt_slope, total = self._segments[index]
+        offset = period - self.starts[index]
+        if offset:
+            saved = saved + saved_slope * offset
+            period_debt = debt + debt_slope * offset
+        else:
+            period_debt = debt
+        if total is None:
+            return PeriodSnapshot(period, None, saved, period_debt, None, None)
+        if offset:
+            total = total + offset * self._income - (debt * offset + debt_slope * (offset * (offset - 1) // 2))
+        return PeriodSnapshot(period, total, saved, period_debt, total - (saved + period_debt), None)
+
+    def _check(self, period):
+        if period < 0:
+            raise IndexError("Periods start at 0")
+        if self._nb_periods is not None and period >= self._nb_periods:
+            raise IndexError("The timeline only holds {0} periods".format(self._nb_periods))
+
+    def at(self, period):
+        """Return the PeriodSnapshot of period, without its operations"""
+        self._check(period)
+        return self._snapshot(period, bisect_right(self.starts, period) - 1)
+
+    def periods(self, start=0, stop=None):
+        """Yield the PeriodSnapshot of each period from start to stop excluded, or forever if stop is None, without their operations"""
+        self._check(start)
+        if stop is not None and stop > start:
+            self._check(stop - 1)
+        elif stop is None and self._nb_periods is not None:
+            stop = self._nb_periods
+        index = bisect_right(self.starts, start) - 1
+        period = start
+        while stop is None or period < stop:
+            if index + 1 < len(self.starts) and self.starts[index + 1] <= period:
+                index += 1
+            yield self._snapshot(period, index)
+            period += 1
@@ -1,55 +1,183 @@
+import sys
+from pyrestriction import profiling
+from pyrestriction.exceptions import OperationsOnlyMode
+from pyrestriction.model import PeriodSnapshot
+
 #This file contains all the views that can display accounts
 
 SEPARATOR = "-------------------"
-def _surround_separators(func):
-    def function(*args, **kwargs):
-        print(SEPARATOR)
-        func(*args, **kwargs)
-        print(SEPARATOR)
-    return function
-        
+TABLE_COLUMNS = ("Period", "Total", "Debt", "Saved", "Avaliable")
+DATE_COLUMNS = ("From", "To")
+FULL = "full"
+TABLE = "table"
+LAYOUTS = (FULL, TABLE)
+
+def _surround_separators(lines):
+    return [SEPARATOR] + lines + [SEPARATOR]
+
+def _period_name(period_number):
+    if(period_number == 0):
+        return "Current"
+    else:
+        return str(period_number)
+
 class AccountView(object):
-    
-    def __init__(self, accountperiod):
+    """
+    Show the amounts of the first nb_periods periods of an account, in one of the LAYOUTS:
+    - FULL: a block of lines per period
+    - TABLE: one row per period
+
+    The amounts of each period are computed once, and the whole output is written at once.
+    They are taken from projection instead, a pyrestriction.projection.Projection, if it is given.
+
+    With start, the periods shown start with the period start (0 being the current one). They are then
+    found with the timeline of the account, without going through the periods before them.
+    A projection given with start holds the periods from start.
+
+    When the periods of the account have dates (see pyrestriction.dates), their first and last days are shown.
+    """
+    def __init__(self, accountperiod, nb_periods=2, layout=FULL, file=None, projection=None, start=0):
         self._accountperiod = accountperiod
+        self._nb_periods = nb_periods
+        self._layout = layout
+        self._file = file
+        self._projection = projection
+        self._start = start
 
-    @_surround_separators
     def _render_header_account(self, accountperiod):
-        print("Account : {account.name}".format(account = accountperiod))
-        
-    @_surround_separators
-    def _render_period(self, period_number, accountperiod):
-        #Print period number 
-        print("Period : ", end = "")
-        if(period_number == 0):
-            print("Current")
+        return _surround_separators(["Account : {account.name}".format(account = accountperiod)])
+
+    def _period_name(self, period_number):
+        return _period_name(period_number)
+
+    def _dates(self, period_number):
+        """Return the first and last days of the period, or None if it has no dates"""
+        calendar = self._accountperiod.calendar
+        if calendar is None or not calendar.has_dates(period_number):
+            return None
+        return (calendar.first_day(period_number), calendar.last_day(period_number))
+
+    def _render_period(self, period):
+        lines = ["Period : {0}".format(self._period_name(period.number))]
+        dates = self._dates(period.number)
+        if dates is not None:
+            lines.append("Dates : {0} to {1}".format(*dates))
+        return _surround_separators(lines + [
+            SEPARATOR,
+            "Amounts :",
+            "Total amount : {0}".format(period.total),
+            "Debt amount : {0}".format(period.debt),
+            "Saved amount : {0}".format(period.saved),
+            "Avaliable amount : {0}".format(period.avaliable),
+        ])
+
+    def _render_table(self, periods):
+        dates = [self._dates(period.number) for period in periods]
+        with_dates = any(period_dates is not None for period_dates in dates)
+        rows = [TABLE_COLUMNS[:1] + DATE_COLUMNS + TABLE_COLUMNS[1:] if with_dates else TABLE_COLUMNS]
+        for period, period_dates in zip(periods, dates):
+            row = [self._period_name(period.number)]
+            if with_dates:
+                row.extend(("", "") if period_dates is None else (str(day) for day in period_dates))
+            row.extend((str(period.total), str(period.debt), str(period.saved), str(period.avaliable)))
+            rows.append(row)
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        return [" | ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows]
+
+    def _periods(self):
+        """Return the amounts of the periods to show, without their operations"""
+        if self._projection is not None:
+            projection = self._projection
+            return [PeriodSnapshot(self._start + index, projection.total[index], projection.saved[index], projection.debt[index], projection.avaliable[index], None)
+                    for index in range(min(self._nb_periods, len(projection)))]
+        if self._start:
+            snapshots = self._accountperiod.timeline(self._start + self._nb_periods).periods(self._start, self._start + self._nb_periods)
         else:
-            print(period_number)
+            snapshots = self._accountperiod.periods(stop=self._nb_periods)
+        periods = list()
+        for period in snapshots:
+            if period.total is None:
+                raise OperationsOnlyMode()
+            periods.append(period._replace(operations=None))
+        return periods
+
+    def render(self):
+        with profiling.phase("compute"):
+            periods = self._periods()
 
-        print(SEPARATOR)
+        with profiling.phase("render"):
+            lines = self._render_header_account(self._accountperiod)
+            if self._layout == TABLE:
+                lines.extend(self._render_table(periods))
+            else:
+                for period in periods:
+                    lines.extend(self._render_period(period))
 
-        #Print avaliable money
-        print("Amounts :")
-        print("Total amount : {0}".format(accountperiod.total()))
-        print("Debt amount : {0}".format(accountperiod.debt()))
-        print("Saved amount : {0}".format(accountperiod.saved()))
-        print("Avaliable amount : {0}".format(accountperiod.avaliable()))
+            lines.append("")
+            (self._file or sys.stdout).write("\n".join(lines))
+
+class ComparisonView(object):
+    """Show the avaliable amounts of an account and of scenarios on it side by side, one row per period"""
+    def __init__(self, comparison, file=None):
+        self._comparison = comparison
+        self._file = file
 
     def render(self):
-        self._render_header_account(self._accountperiod)
+        names, avaliable = self._comparison.avaliable()
+        rows = [["Period"] + names]
+        rows.extend([_period_name(number)] + [str(amount) for amount in amounts]
+                    for number, amounts in enumerate(avaliable))
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        lines = _surround_separators(["Avaliable amounts"])
+        lines.extend(" | ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+        lines.append("")
+        (self._file or sys.stdout).write("\n".join(lines))
+
+class SimulationView(object):
+    """Show the avaliable amount of each period at each percentile of a simulation, and the probability that it is below zero"""
+    def __init__(self, accountperiod, simulation, file=None):
+        self._accountperiod = accountperiod
+        self._simulation = simulation
+        self._file = file
 
-        accountperiod = self._accountperiod
-        for i in range(2):
-            self._render_period(i, accountperiod)
-            accountperiod = accountperiod.next()
+    def render(self):
+        percentiles = sorted(self._simulation.percentiles)
+        rows = [["Period"] + ["P{0:g}".format(percentile) for percentile in percentiles] + ["Shortfall"]]
+        for period in range(len(self._simulation)):
+            row = [_period_name(period)]
+            row.extend("{0:.2f}".format(self._simulation.percentiles[percentile][period]) for percentile in percentiles)
+            row.append("{0:.2%}".format(self._simulation.shortfall[period]))
+            rows.append(row)
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        lines = _surround_separators(["Account : {0}, {1} simulated paths".format(self._accountperiod.name, self._simulation.nb_paths)])
+        lines.extend(" | ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+        lines.append("")
+        (self._file or sys.stdout).write("\n".join(lines))
 
 class MessageView():
-    messages = {"format": "Formated {filename}.", 
-                "endperiod": "All the operations on {account_name} have been passed to the next period and written to {filename}."} 
+    messages = {"format": "Formated {filename}.",
+                "endperiod": "All the operations on {account_name} have been passed to the next period and written to {filename}.",
+                "endperiods": "All the operations on {account_name} have been passed {nb_periods} periods later and written to {filename}.",
+                "journal": "The end of {nb_periods} period(s) has been recorded in {filename}.",
+                "compact": "Wrote the journal of {filename} to it.",
+                "afford": "You can afford {price} {currency} in {period} period(s).",
+                "afford_now": "You can afford {price} {currency} now.",
+                "afford_never": "You cannot afford {price} {currency} in the next {nb_periods} periods.",
+                "maxsaving": "You can save up to {amount} {currency} over {nb_period_left} period(s).",
+                "maxsaving_never": "You cannot save anything: you will run out of money in the next {nb_periods} periods.",
+                "watch_stopped": "Stopped watching {nb_files} account file(s).",
+                "batch": "Evaluated {nb_accounts} accounts, {nb_failures} failed. The results have been written to {output}.",
+                "serve": "Serving the accounts on {address}.",
+                "serve_stopped": "Stopped serving the accounts on {address}."}
 
-    def __init__(self, key, format_arguments):
+    def __init__(self, key, format_arguments, file=None):
         self._key = key
         self._format_arguments = format_arguments
+        self._file = file
 
     def render(self):
-        print(self.messages[self._key].format(**self._format_arguments))
+        key = self._key
+        #The endperiod message depends on the number of periods ended
+        if key == "endperiod" and self._format_arguments.get("nb_periods", 1) > 1:
+            key = "endperiods"
+        print(self.messages[key].format(**self._format_arguments), file=self._file)
@@ -0,0 +1,191 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from io import StringIO
+from pyrestriction import journal
+from pyrestriction.io import read_account_file
+from pyrestriction.projection import project
+from pyrestriction.scenario import Comparison
+from pyrestriction.views import AccountView, FULL
+
+# This file watches account files, and shows their amounts again each time they change.
+#
+# Changes are notified by inotify when it is available (on Linux), and found by checking the
+# modification time of the files regularly otherwise.
+#
+# When only some operations of a file changed, the amounts of its periods are updated from the
+# previous ones with the amounts of these operations only (see pyrestriction.scenario), instead of
+# being computed again from all the operations. The amounts are shown again only if they changed.
+
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class Poller:
+    """Find the watched files that changed by checking them every interval seconds"""
+    def __init__(self, filenames, interval=POLL_INTERVAL):
+        self._filenames = filenames
+        self._interval = interval
+
+    def wait(self, timeout=None):
+        """Wait for changes, and return the files that may have changed"""
+        time.sleep(self._interval if timeout is None else min(timeout, self._interval))
+        return set(self._filenames)
+
+    def close(self):
+        pass
+
+class Inotify:
+    """Be notified of the changes of the watched files by inotify. Raise OSError if inotify cannot be used."""
+    def __init__(self, filenames):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._descriptor = libc.inotify_init1(os.O_CLOEXEC)
+        if self._descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        #Editors often save by writing another file and renaming it, so the directories are watched
+        self._directories = dict()
+        self._filenames = set(filenames)
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for directory in {os.path.dirname(filename) for filename in filenames}:
+            watch = libc.inotify_add_watch(self._descriptor, os.fsencode(directory), mask)
+            if watch < 0:
+                os.close(self._descriptor)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed on {0}".format(directory))
+            self._directories[watch] = directory
+
+    def wait(self, timeout=None):
+        """Wait for changes, and return the watched files that changed"""
+        if not select.select([self._descriptor], [], [], timeout)[0]:
+            return set()
+        data = os.read(self._descriptor, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            #Events were lost: any of the files may have changed
+            if mask & IN_Q_OVERFLOW:
+                return set(self._filenames)
+            #Other events of no watched directory tell nothing about the files
+            if watch not in self._directories:
+                continue
+            filename = os.path.join(self._directories[watch], name)
+            #A change of the journal of a file is a change of the file
+            if filename.endswith(journal.EXTENSION):
+                filename = filename[:-len(journal.EXTENSION)]
+            if filename in self._filenames:
+                changed.add(filename)
+        return changed
+
+    def close(self):
+        os.close(self._descriptor)
+
+def notifier(filenames, poll=False, interval=POLL_INTERVAL):
+    """Return an Inotify on filenames, or a Poller if poll is set or if inotify cannot be used"""
+    if not poll:
+        try:
+            return Inotify(filenames)
+        except (OSError, AttributeError):
+            pass
+    return Poller(filenames, interval)
+
+def diff_operations(old_operations, new_operations):
+    """Return the operations of old_operations that are not in new_operations, and the ones of new_operations that are not in old_operations"""
+    remaining = dict()
+    for operation in old_operations:
+        remaining.setdefault(repr(operation), list()).append(operation)
+    added = list()
+    for operation in new_operations:
+        same = remaining.get(repr(operation))
+        if same:
+            same.pop()
+        else:
+            added.append(operation)
+    removed = [operation for operations in remaining.values() for operation in operations]
+    return removed, added
+
+class WatchedAccount:
+    """An account file, with the amounts of its periods and how they were last shown"""
+    def __init__(self, filename, current_amount, nb_periods, layout=FULL):
+        self.filename = filename
+        self._current_amount = current_amount
+        self._nb_periods = nb_periods
+        self._layout = layout
+        self._version = None
+        self._account = None
+        self.projection = None
+        self.output = None
+
+    def _update_projection(self, account):
+        """Compute the projection of account, from the previous one if few of its operations changed"""
+        previous = self._account
+        if previous is None or (previous.regular_income, previous.integer_amounts) != (account.regular_income, account.integer_amounts):
+            return project(account, self._nb_periods, use_numpy=False)
+
+        removed, added = diff_operations(previous.operations, account.operations)
+        #Changing most of the operations is faster to compute again
+        if len(removed) + len(added) > len(account.operations) // 2:
+            return project(account, self._nb_periods, use_numpy=False)
+        scenario = previous.scenario(self.filename)
+        for operation in removed:
+            #The removed operations were found in the previous operations by diff_operations
+            scenario.remove(operation, known = True)
+        for operation in added:
+            scenario.add(operation)
+        return Comparison(previous, self._nb_periods, self.projection).evaluate(scenario)
+
+    def refresh(self):
+        """Read the file again if it changed, and return its new output if it is not the one last shown, None otherwise"""
+        version = journal.version(self.filename)
+        if version == self._version:
+            return None
+        account = read_account_file(self._current_amount, self.filename)
+        self.projection = self._update_projection(account)
+        self._account = account
+        self._version = version
+
+        output = StringIO()
+        AccountView(account, self._nb_periods, self._layout, output, self.projection).render()
+        if output.getvalue() == self.output:
+            return None
+        self.output = output.getvalue()
+        return self.output
+
+def watch(filenames, current_amount, nb_periods, layout=FULL, poll=False, interval=POLL_INTERVAL, file=None):
+    """Show the amounts of the account files, and show them again each time they change, until interrupted"""
+    file = file or sys.stdout
+    accounts = {os.path.abspath(filename): WatchedAccount(os.path.abspath(filename), current_amount, nb_periods, layout)
+                for filename in filenames}
+    changes = notifier(list(accounts), poll, interval)
+    try:
+        changed = set(accounts)
+        while True:
+            for filename in sorted(changed):
+                try:
+                    output = accounts[filename].refresh()
+                except Exception as exception:
+                    #The file may be half saved, or being edited: the next change will be read
+                    print("{0}: {1}: {2}".format(filename, type(exception).__name__, exception), file=sys.stderr)
+                    continue
+                if output is not None:
+                    file.write(output)
+                    file.flush()
+            changed = changes.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        changes.close()
@@ -1,7 +1,24 @@
 import unittest
+import asyncio
 from pyrestriction.model import *
-from pyrestriction.io import write_account
-from io import StringIO
+from pyrestriction.io import write_account, parse_account
+from pyrestriction import io
+from pyrestriction.exceptions import InvalidAccountFile, NoPeriodDates
+from pyrestriction import projection
+from pyrestriction.table import OperationTable, OTHER
+from pyrestriction.views import AccountView, ComparisonView, TABLE
+from pyrestriction import batch, binary, cache, dates, goals, journal, montecarlo, profiling, server, watch
+from pyrestriction.entrypoint import entrypoint, fast_available
+from io import StringIO, BytesIO
+import datetime
+import json
+import marshal
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
 
 class OperationWithNext(Operation):
     def __init__(self, amount, debt, counter=0):
@@ -80,6 +97,33 @@ class TestBothModeMixin:
         self._setupfunction = self.AMOUNT_ON_ACCOUNT
         super(TestBothModeMixin, self).run(*args, **kwargs)
 
+class AccountFileTestMixin:
+    """
+    Base set up for the tests on account files: a temporary directory, removed after each test,
+    holding a copy of the example account file
+    """
+    EXAMPLE_ACCOUNT = os.path.join(os.path.dirname(__file__), "example_account.act")
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._account_file = self.copy_example("example.act")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def copy_example(self, name):
+        """Copy the example account file to name in the temporary directory, and return its path"""
+        account_file = os.path.join(self._directory.name, name)
+        with open(self.EXAMPLE_ACCOUNT) as example, open(account_file, "w") as account:
+            account.write(example.read())
+        return account_file
+
+    def run_command(self, *arguments):
+        """Run the command line with arguments, and return what it wrote on the standard output"""
+        with patch("sys.argv", ["pyrestriction"] + list(arguments)), patch("sys.stdout", StringIO()) as stdout:
+            entrypoint()
+        return stdout.getvalue()
+
 class AccountTest(TestBothModeMixin, unittest.TestCase, AccountTestBase):
     """Test Account and AccountPeriodMixin in both mode"""
     def setUp(self):
@@ -135,6 +179,369 @@ class AccountPeriodNormalModeTest(unittest.TestCase, AccountTestBase):
         self.assertEqual(self.AMOUNT_ON_ACCOUNT  - sum(x for x in self.OPERATIONS_DEBT) + self.REGULAR_INCOME, self._instance.money_begining_period)
     
 
+class AccountPeriodChainTest(unittest.TestCase):
+    """Test long chains of AccountPeriod"""
+    NB_PERIODS = 5000
+    AMOUNT_ON_ACCOUNT = 10000
+    REGULAR_INCOME = 1000
+    REGULAR_PAYMENT = 300
+
+    def setUp(self):
+        self._account = Account(self.AMOUNT_ON_ACCOUNT, self.REGULAR_INCOME, "Chain test", "PND")
+        self._account.add_operation(RegularPaymentOperation(self.REGULAR_PAYMENT, False))
+        self._account.add_operation(SavingOperation(200))
+
+    def test_longchain(self):
+        """Test that the last period of a chain longer than the recursion limit can compute its amounts"""
+        accountperiod = self._account
+        for i in range(self.NB_PERIODS):
+            accountperiod = accountperiod.next()
+
+        self.assertEqual(self.AMOUNT_ON_ACCOUNT + self.NB_PERIODS * (self.REGULAR_INCOME - self.REGULAR_PAYMENT), accountperiod.total())
+        self.assertEqual(accountperiod.total() - self.REGULAR_PAYMENT, accountperiod.avaliable())
+
+    def test_addoperation(self):
+        """Test that adding an operation to an account updates its amounts"""
+        self.assertEqual(200, self._account.saved())
+        self._account.add_operation(SavingOperation(50))
+        self.assertEqual(250, self._account.saved())
+
+class AccountOperationHandlingTest(unittest.TestCase):
+    """Test that the amounts of an account follow the changes to its operations"""
+    def run(self, *args, **kwargs):
+        self._operations = list
+        super(AccountOperationHandlingTest, self).run(*args, **kwargs)
+
+        self._operations = OperationTable
+        super(AccountOperationHandlingTest, self).run(*args, **kwargs)
+
+    def setUp(self):
+        self._saving = SavingOperation(200)
+        self._debt = DebtOperation(300, 3, False, 0)
+        self._account = Account(10000, 1000, "Operation handling test", "PND", self._operations())
+        self._account.add_operation(self._saving)
+        self._account.add_operation(self._debt)
+
+    def test_addoperation(self):
+        self.assertEqual((200, 100), (self._account.saved(), self._account.debt()))
+        self._account.add_operation(RegularPaymentOperation(50, False))
+        self.assertEqual((200, 150), (self._account.saved(), self._account.debt()))
+        self.assertEqual(10000 - 350, self._account.avaliable())
+
+    def test_removeoperation(self):
+        self._account.remove_operation(self._debt)
+        self.assertEqual((200, 0), (self._account.saved(), self._account.debt()))
+        self.assertEqual(1, len(self._account.operations))
+        with self.assertRaises(ValueError):
+            self._account.remove_operation(self._debt)
+
+    def test_replaceoperation(self):
+        self._account.replace_operation(self._saving, RegularPaymentOperation(50, False))
+        self.assertEqual((0, 150), (self._account.saved(), self._account.debt()))
+        self.assertEqual("RegularPaymentOperation", type(self._account.operations[0]).__name__)
+
+class PeriodsTest(unittest.TestCase):
+    """Test the iteration over the periods of an account"""
+    NB_PERIODS = 15
+
+    def setUp(self):
+        self._account = Account(10000, 1000, "Periods test", "PND")
+        for operation in AdvanceTest.OPERATIONS:
+            self._account.add_operation(operation)
+
+    def test_periods(self):
+        """Test that the periods have the amounts of the chain of AccountPeriod"""
+        accountperiod = self._account
+        for number, period in enumerate(self._account.periods(stop=self.NB_PERIODS)):
+            self.assertEqual(number, period.number)
+            self.assertEqual((accountperiod.total(), accountperiod.saved(), accountperiod.debt(), accountperiod.avaliable()),
+                             (period.total, period.saved, period.debt, period.avaliable))
+            self.assertEqual(len(accountperiod.operations), len(period.operations))
+            accountperiod = accountperiod.next()
+        self.assertEqual(self.NB_PERIODS, number + 1)
+
+    def test_periodsstart(self):
+        """Test that the periods can start later"""
+        periods = list(self._account.periods(5, 8))
+        self.assertEqual([5, 6, 7], [period.number for period in periods])
+        self.assertAlmostEqual(self._account.advance(7).avaliable(), periods[-1].avaliable)
+
+    def test_periodsoperationsonly(self):
+        """Test that in OperationOnly mode, only the saved and debt amounts are given"""
+        self._account.money_begining_period = None
+        period = next(self._account.periods())
+        self.assertEqual((None, None), (period.total, period.avaliable))
+        self.assertEqual(self._account.debt(), period.debt)
+
+class ProjectionTest(unittest.TestCase):
+    """Test that the projection gives the same amounts as the AccountPeriod chain"""
+    NB_PERIODS = 15
+
+    def setUp(self):
+        self._account = Account(10000, 1000, "Projection test", "PND")
+        self._account.add_operation(SavingOperation(200))
+        self._account.add_operation(RegularSavingOperation(500, 10, 70))
+        self._account.add_operation(DebtOperation(200, 3, False, 150))
+        self._account.add_operation(DebtOperation(1000, 7, True, 100))
+        self._account.add_operation(RegularPaymentOperation(35, False))
+
+    def assertMatchesChain(self, result, account=None):
+        self.assertEqual(self.NB_PERIODS, len(result))
+        accountperiod = account or self._account
+        for i in range(self.NB_PERIODS):
+            self.assertEqual(accountperiod.total(), result.total[i])
+            self.assertEqual(accountperiod.saved(), result.saved[i])
+            self.assertEqual(accountperiod.debt(), result.debt[i])
+            self.assertEqual(accountperiod.avaliable(), result.avaliable[i])
+            accountperiod = accountperiod.next()
+
+    def test_lists(self):
+        self.assertMatchesChain(projection.project(self._account, self.NB_PERIODS, use_numpy=False))
+
+    @unittest.skipIf(projection.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        """Test that the NumPy projection gives exactly the amounts of the chain with float amounts, which it computes with lists"""
+        result = projection.project(self._account, self.NB_PERIODS, use_numpy=True)
+        self.assertIsInstance(result.total, list)
+        self.assertMatchesChain(result)
+
+    @unittest.skipIf(projection.numpy is None, "NumPy is not installed")
+    def test_numpyintegers(self):
+        """Test that the NumPy projection gives exactly the amounts of the chain with int amounts"""
+        account = Account(10000, 1000, "Projection test", "PND", IntegerAmountsTest.OPERATIONS[:3] + [OperationWithNext(40, True)], integer_amounts=True)
+        result = projection.project(account, self.NB_PERIODS, use_numpy=True)
+        self.assertEqual(projection.numpy.int64, result.total.dtype)
+        self.assertMatchesChain(result, account)
+
+    def test_operationsonlymode(self):
+        """Test that the amounts cannot be projected without the amount of money on the account"""
+        self._account.money_begining_period = None
+        with self.assertRaises(OperationsOnlyMode):
+            projection.project(self._account, self.NB_PERIODS)
+
+class AdvanceTest(unittest.TestCase):
+    """Test the random access to the following periods of operations and accounts"""
+    NB_PERIODS = 12
+
+    OPERATIONS = [
+        SavingOperation(200),
+        RegularSavingOperation(500, 10, 70),
+        RegularSavingOperation(300, 4, 100),
+        RegularSavingOperation(300, 0, 300),
+        DebtOperation(200, 3, False, 150),
+        DebtOperation(1000, 8, True, 100),
+        DebtOperation(100, 1, True, 0),
+        RegularPaymentOperation(35, False),
+        RegularPaymentOperation(35, True),
+        OperationWithNext(40, True),
+    ]
+
+    def chain(self, operation):
+        """Return the operations created by calling next, up to NB_PERIODS"""
+        operations = list()
+        while len(operations) < self.NB_PERIODS:
+            operations.append(operation)
+            try:
+                operation = operation.next()
+            except NoNextOperation:
+                break
+        return operations
+
+    def test_schedule(self):
+        """Test that the schedule is the list of the amounts of the chain of operations"""
+        for operation in self.OPERATIONS:
+            self.assertEqual([op.amount for op in self.chain(operation)], operation.schedule(self.NB_PERIODS))
+
+    def test_amountat(self):
+        """Test that amount_at and amount_sum match the chain of operations, and are 0 once the operation is over"""
+        for operation in self.OPERATIONS:
+            amounts = [op.amount for op in self.chain(operation)]
+            amounts += [0] * (self.NB_PERIODS - len(amounts))
+            for period in range(self.NB_PERIODS):
+                self.assertAlmostEqual(amounts[period], operation.amount_at(period))
+                self.assertAlmostEqual(sum(amounts[:period]), operation.amount_sum(period))
+
+    def test_lastperiod(self):
+        """Test that the last period is the one of the last operation of the chain"""
+        for operation in self.OPERATIONS:
+            operations = self.chain(operation)
+            if len(operations) < self.NB_PERIODS:
+                self.assertEqual(len(operations) - 1, operation.last_period())
+            else:
+                self.assertIsNone(operation.last_period())
+
+    def test_advance(self):
+        """Test that advancing an operation gives the same operation as the chain"""
+        for operation in self.OPERATIONS:
+            operations = self.chain(operation)
+            for period in range(self.NB_PERIODS):
+                if period < len(operations):
+                    advanced = operation.advance(period)
+                    self.assertEqual(type(operations[period]), type(advanced))
+                    self.assertAlmostEqual(operations[period].amount, advanced.amount)
+                    for expected, amount in zip(operations[period].schedule(3), advanced.schedule(3)):
+                        self.assertAlmostEqual(expected, amount)
+                elif operation.last_period() is not None:
+                    with self.assertRaises(NoNextOperation):
+                        operation.advance(period)
+
+    def test_accountadvance(self):
+        """Test that advancing an account gives the same amounts as the chain of AccountPeriod"""
+        account = Account(10000, 1000, "Advance test", "PND")
+        for operation in self.OPERATIONS:
+            account.add_operation(operation)
+
+        accountperiod = account
+        for period in range(self.NB_PERIODS):
+            advanced = account.advance(period)
+            self.assertEqual(len(accountperiod.operations), len(advanced.operations))
+            self.assertAlmostEqual(accountperiod.total(), advanced.total())
+            self.assertAlmostEqual(accountperiod.avaliable(), advanced.avaliable())
+            accountperiod = accountperiod.next()
+
+    def test_endperiodperiods(self):
+        """Test that endperiod --periods writes the account of the chain of periods, without the operations that are over"""
+        account = Account(None, 1000, "Advance test", "PND")
+        for operation in self.OPERATIONS[:-1]:
+            account.add_operation(operation)
+        accountperiod = account
+        for period in range(self.NB_PERIODS):
+            accountperiod = accountperiod.next()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "account.act")
+            io.write_account_file(account, path)
+            with patch("sys.argv", ["pyrestriction", "endperiod", path, "--periods", str(self.NB_PERIODS)]), patch("sys.stdout", StringIO()) as stdout:
+                entrypoint()
+            self.assertIn("{0} periods later".format(self.NB_PERIODS), stdout.getvalue())
+            advanced = io.read_account_file(10000, path)
+        self.assertEqual([type(op) for op in accountperiod.operations], [type(op) for op in advanced.operations])
+        for expected, operation in zip(accountperiod.operations, advanced.operations):
+            self.assertAlmostEqual(expected.amount, operation.amount)
+
+    def test_accountadvanceoperationsonly(self):
+        """Test that an advanced account in OperationOnly mode stays in OperationOnly mode"""
+        account = Account(None, 1000, "Advance test", "PND")
+        account.add_operation(SavingOperation(200))
+        with self.assertRaises(OperationsOnlyMode):
+            account.advance(3).total()
+
+class IntegerAmountsTest(unittest.TestCase):
+    """Test the accounts whose amounts are ints in the minor unit of their currency"""
+    OPERATIONS = [
+        RegularSavingOperation(100, 3, 0, integer=True),
+        RegularSavingOperation(1001, 7, 13, integer=True),
+        DebtOperation(100, 3, False, 0, integer=True),
+        DebtOperation(1000, 7, True, 1),
+    ]
+    ACCOUNT_STRING = """REGULAR_INCOME = 100000
+NAME = "Cents"
+CURRENCY = "PND"
+INTEGER_AMOUNTS = True
+
+OPERATIONS = [RegularSavingOperation(total_amount = 100, nb_period_left = 3, saved_amount = 0),
+DebtOperation(total_amount = 100, nb_period_left = 3, payed_this_period = False, payed_amount = 0)]
+"""
+
+    def test_remainder(self):
+        """Test that the remainder of a division goes to the last periods"""
+        self.assertEqual([33, 33, 34], DebtOperation(100, 3, False, 0, integer=True).schedule(5))
+        self.assertEqual([33, 66, 100, 100], RegularSavingOperation(100, 3, 0, integer=True).schedule(4))
+
+    def test_closedforms(self):
+        """Test that amount_at, amount_sum and advance match the chain of operations exactly"""
+        for operation in self.OPERATIONS:
+            chain = AdvanceTest.chain(AdvanceTest(), operation)
+            amounts = [op.amount for op in chain]
+            for period in range(len(chain)):
+                if operation._integer:
+                    self.assertIsInstance(operation.amount_at(period), int)
+                self.assertEqual(amounts[period], operation.amount_at(period))
+                self.assertEqual(sum(amounts[:period]), operation.amount_sum(period))
+                self.assertEqual(repr(chain[period]), repr(operation.advance(period)))
+                self.assertEqual(amounts[period:], operation.advance(period).schedule(len(chain) - period))
+
+    def test_parseaccount(self):
+        """Test that INTEGER_AMOUNTS accounts are parsed with integer operations, and written back the same"""
+        io._memory_cache.clear()
+        account = parse_account(20000, self.ACCOUNT_STRING)
+        self.assertTrue(account.integer_amounts)
+        self.assertTrue(account.next().integer_amounts)
+        self.assertEqual([33, 33], [op.amount for op in account.operations])
+        formated_account = StringIO()
+        write_account(account, formated_account)
+        self.assertEqual(self.ACCOUNT_STRING, formated_account.getvalue())
+
+        buffer = BytesIO()
+        write_account(account, buffer, io.BINARY)
+        binary_account = parse_account(20000, buffer.getvalue())
+        self.assertTrue(binary_account.integer_amounts)
+        self.assertEqual([100, 34], [op.amount for op in binary_account.advance(2).operations])
+
+    def test_refusefloats(self):
+        """Test that INTEGER_AMOUNTS accounts with float amounts are refused"""
+        for account_string in (self.ACCOUNT_STRING.replace("100000", "1000.5"), self.ACCOUNT_STRING.replace("saved_amount = 0", "saved_amount = 0.5")):
+            with self.assertRaises(InvalidAccountFile):
+                parse_account(20000, account_string)
+
+class OperationTableTest(unittest.TestCase):
+    """Test the storage of operations in columns"""
+    OPERATIONS = AdvanceTest.OPERATIONS
+
+    def setUp(self):
+        self._table = OperationTable(self.OPERATIONS)
+
+    def test_operations(self):
+        """Test that the operations read from the table are the ones that were stored"""
+        self.assertEqual(len(self.OPERATIONS), len(self._table))
+        self.assertEqual([repr(op) for op in self.OPERATIONS], [repr(op) for op in self._table])
+        self.assertEqual(repr(self.OPERATIONS[-1]), repr(self._table[-1]))
+
+    def test_aggregates(self):
+        """Test that the saved and debt amounts are the ones of a list of operations"""
+        account = Account(10000, 1000, "Table test", "PND")
+        for operation in self.OPERATIONS:
+            account.add_operation(operation)
+        table_account = Account(10000, 1000, "Table test", "PND", OperationTable())
+        for operation in self.OPERATIONS:
+            table_account.add_operation(operation)
+
+        self.assertEqual((account.saved(), account.debt()), self._table.aggregates())
+        for i in range(5):
+            self.assertEqual(type(table_account.operations), OperationTable)
+            self.assertEqual(account.avaliable(), table_account.avaliable())
+            account = account.next()
+            table_account = table_account.next()
+
+    def test_removedamounts(self):
+        """Test that the amounts of deleted and replaced rows are taken from their columns, keeping int aggregates ints"""
+        table = OperationTable(IntegerAmountsTest.OPERATIONS)
+        with patch("pyrestriction.table.decode_operation") as decode:
+            del table[0]
+            table[-1] = SavingOperation(5)
+            self.assertFalse(decode.called)
+        operations = list(table)
+        expected = (sum(op.amount for op in operations if not op.debt), sum(op.amount for op in operations if op.debt))
+        self.assertEqual(expected, table.aggregates())
+        self.assertEqual((int, int), tuple(type(amount) for amount in table.aggregates()))
+        self.assertEqual([op.amount for op in operations], list(table._amounts))
+        self.assertEqual([op.debt for op in operations], [bool(debt) for debt in table._debts])
+
+    def test_others(self):
+        """Test that operations stored as objects are freed when their row is deleted or replaced"""
+        first, second, third = OperationWithNext(10, False), OperationWithNext(20, True), OperationWithNext(30, False)
+        self._table.append(first)
+        self._table.append(second)
+        self._table.append(third)
+        self._table.remove(first)
+        self._table[-1] = SavingOperation(5)
+        self.assertEqual(len([code for code in self._table._types if code == OTHER]), len(self._table._others))
+        self.assertIn(second, self._table._others.values())
+        self.assertNotIn(first, self._table._others.values())
+        self.assertNotIn(third, self._table._others.values())
+        self.assertIs(second, self._table[-2])
+        self.assertEqual("SavingOperation(amount = 5)", repr(self._table[-1]))
+
 class AccountOperationsOnlyModeTest(unittest.TestCase, AccountTestBase):
     """Test Account and AccountPeriod in OperationOnly mode :
        The objects have not been made aware of how much money is on the account and only serve as a container for the remaining data."""
@@ -339,3 +746,986 @@ class WriteAccountTest(unittest.TestCase):
                 AMOUNT = self.OPERATION_AMOUNT
             )
         )
+
+    def test_formatlongaccount(self):
+        """Test that accounts with more operations than a written chunk are written whole"""
+        operations = [SavingOperation(i) for i in range(io.WRITE_CHUNK_SIZE * 2 + 1)]
+        for operation in operations:
+            self._account.add_operation(operation)
+        formated_account = StringIO()
+        write_account(self._account, formated_account)
+        self.assertTrue(formated_account.getvalue().endswith(
+            ",\n".join(repr(op) for op in operations) + "]\n"
+        ))
+        self.assertIs(serializer(SavingOperation), serializer(SavingOperation))
+
+
+class ParseAccountTest(unittest.TestCase):
+    EXAMPLE_ACCOUNT = os.path.join(os.path.dirname(__file__), "example_account.act")
+
+    def setUp(self):
+        with open(self.EXAMPLE_ACCOUNT) as example:
+            self._account_string = example.read()
+        io._memory_cache.clear()
+
+    def test_parseaccount(self):
+        """Test that the variables and operations of the example account file are read"""
+        account = parse_account(20000, self._account_string)
+        self.assertEqual("Pfif's temp account", account.name)
+        self.assertEqual("PND", account.currency)
+        self.assertEqual(1000, account.regular_income)
+        self.assertEqual(
+            ["SavingOperation(amount = 200)",
+             "RegularSavingOperation(total_amount = 500, nb_period_left = 10, saved_amount = 70)",
+             "DebtOperation(total_amount = 200, nb_period_left = 2, payed_this_period = False, payed_amount = 150)"],
+            [repr(op) for op in account.operations]
+        )
+
+    def test_parsewrittenaccount(self):
+        """Test that a written account can be parsed again"""
+        account = parse_account(20000, self._account_string)
+        formated_account = StringIO()
+        write_account(account, formated_account)
+        parsed_account = parse_account(20000, formated_account.getvalue())
+        self.assertEqual([repr(op) for op in account.operations], [repr(op) for op in parsed_account.operations])
+
+    def test_refusecode(self):
+        """Test that files doing anything but setting the account variables are refused"""
+        invalid_strings = [
+            "import os",
+            self._account_string + "\nNAME = __import__('os').getcwd()",
+            self._account_string + "\nOPERATIONS = [SavingOperation(len('abc'))]",
+            self._account_string + "\nOPERATIONS = [OperationWithNext(1, True)]",
+            self._account_string + "\nOTHER = 1",
+            self._account_string + "\nOPERATIONS = [SavingOperation()]",
+            self._account_string + "\nOPERATIONS = [DebtOperation(200, 2, paid = False)]",
+            self._account_string + "\nOPERATIONS = [SavingOperation(1, 2)]",
+            self._account_string + "\nOPERATIONS = [SavingOperation(1, amount = 2)]",
+            self._account_string + "\nOPERATIONS = [SavingOperation(amount = {[]: 1})]",
+            self._account_string + "\nNAME = {[]: 1}",
+            'NAME = "Missing variables"',
+        ]
+        for account_string in invalid_strings:
+            with self.assertRaises(InvalidAccountFile):
+                parse_account(20000, account_string)
+
+    def test_diskcache(self):
+        """Test that parsed files are read from the cache directory"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            parse_account(20000, self._account_string, cache_dir)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+
+            io._memory_cache.clear()
+            cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_file, "wb") as file:
+                file.write(marshal.dumps(dict(io.parse_description(self._account_string), NAME="From the cache")))
+            self.assertEqual("From the cache", parse_account(20000, self._account_string, cache_dir).name)
+
+class BinaryAccountTest(unittest.TestCase):
+    """Test the binary account format"""
+    def setUp(self):
+        self._account = Account(20000, 1000, "Binary test", "PND")
+        for operation in AdvanceTest.OPERATIONS[:-1]:
+            self._account.add_operation(operation)
+
+    def assertSameAccount(self, account):
+        self.assertEqual((self._account.name, self._account.currency, self._account.regular_income), (account.name, account.currency, account.regular_income))
+        self.assertEqual((self._account.saved(), self._account.debt()), (account.saved(), account.debt()))
+        self.assertEqual([repr(op) for op in self._account.operations], [repr(op) for op in account.operations])
+        self.assertEqual(repr(self._account.operations[3]), repr(account.operations[3]))
+        self.assertEqual(self._account.next().avaliable(), account.next().avaliable())
+
+    def test_binarybuffer(self):
+        """Test that an account written in the binary format is read back the same"""
+        buffer = BytesIO()
+        write_account(self._account, buffer, io.BINARY)
+        self.assertSameAccount(parse_account(20000, buffer.getvalue()))
+
+    def test_binaryfile(self):
+        """Test that account files are written in the format of their extension, and read in the format of their content"""
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in ("account.act", "account.actb"):
+                path = os.path.join(directory, filename)
+                io.write_account_file(self._account, path)
+                with open(path, "rb") as file:
+                    self.assertEqual(filename.endswith(".actb"), file.read(4) == b"PYRB")
+                self.assertSameAccount(io.read_account_file(20000, path))
+
+    def test_replacedfile(self):
+        """Test that writing an account file through a symbolic link replaces the file it points to, keeping its permissions"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "account.actb")
+            link = os.path.join(directory, "link.actb")
+            io.write_account_file(self._account, path)
+            os.chmod(path, 0o600)
+            os.symlink(path, link)
+            io.write_account_file(self._account.next(), link)
+            self.assertTrue(os.path.islink(link))
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            self.assertEqual(["account.actb", "link.actb"], sorted(os.listdir(directory)))
+            self.assertEqual([repr(op) for op in self._account.next().operations], [repr(op) for op in io.read_account_file(20000, path).operations])
+
+            with patch("sys.argv", ["pyrestriction", "available", os.path.join(directory, "missing.act"), "20000"]), \
+                    patch("sys.stderr", StringIO()) as stderr:
+                self.assertRaises(SystemExit, entrypoint)
+            self.assertIn("can't open", stderr.getvalue())
+
+    def test_otheroperations(self):
+        """Test that operations of other types cannot be written in the binary format"""
+        self._account.add_operation(OperationWithNext(40, True))
+        with self.assertRaises(InvalidAccountFile):
+            write_account(self._account, BytesIO(), io.BINARY)
+
+class AccountViewTest(unittest.TestCase):
+    def setUp(self):
+        self._account = Account(20000, 1000, "View test", "PND")
+        self._account.add_operation(SavingOperation(200))
+        self._account.add_operation(RegularPaymentOperation(50, False))
+
+    def render(self, *args):
+        output = StringIO()
+        AccountView(self._account, *args, file=output).render()
+        return output.getvalue()
+
+    def test_renderfull(self):
+        """Test that each period is shown in its own block"""
+        self.assertEqual(
+            "-------------------\nAccount : View test\n-------------------\n"
+            "-------------------\nPeriod : Current\n-------------------\nAmounts :\n"
+            "Total amount : 20000\nDebt amount : 50\nSaved amount : 200\nAvaliable amount : 19750\n-------------------\n"
+            "-------------------\nPeriod : 1\n-------------------\nAmounts :\n"
+            "Total amount : 20950\nDebt amount : 50\nSaved amount : 0\nAvaliable amount : 20900\n-------------------\n",
+            self.render()
+        )
+
+    def test_rendertable(self):
+        """Test that each period is shown in a row"""
+        lines = self.render(1000, TABLE).splitlines()
+        self.assertEqual(3 + 1 + 1000, len(lines))
+        self.assertEqual(" Period |  Total | Debt | Saved | Avaliable", lines[3])
+        self.assertEqual("Current |  20000 |   50 |   200 |     19750", lines[4])
+        self.assertEqual("    999 | 969050 |   50 |     0 |    969000", lines[-1])
+
+    def test_renderoperationsonly(self):
+        self._account.money_begining_period = None
+        with self.assertRaises(OperationsOnlyMode):
+            self.render()
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self._account = Account(20000, 1000, "Profiling test", "PND")
+        self._account.add_operation(SavingOperation(200))
+        self._account.add_operation(RegularPaymentOperation(50, False))
+
+    def test_profiled(self):
+        """Test that the operations, periods and phases are counted while profiling"""
+        with profiling.profiled() as report:
+            self._account.next().next().avaliable()
+            AccountView(self._account, 3, file=StringIO()).render()
+        self.assertEqual({"operation_next": 2 + 1 + 2 + 1 + 1, "accountperiod": 2, "aggregate": 2 + 3}, report["counters"])
+        self.assertEqual({"compute", "render"}, set(report["phases"]))
+
+    def test_disabled(self):
+        """Test that nothing is counted when profiling is disabled"""
+        profiling.reset()
+        self._account.next().next().avaliable()
+        self.assertEqual({"counters": {}, "phases": {}}, profiling.report())
+
+class BatchTest(AccountFileTestMixin, unittest.TestCase):
+    def setUp(self):
+        super(BatchTest, self).setUp()
+        with open(os.path.join(self._directory.name, "broken.act"), "w") as account:
+            account.write("OPERATIONS = (")
+        self._manifest = os.path.join(self._directory.name, "manifest")
+        with open(self._manifest, "w") as manifest:
+            manifest.write("# Accounts\nexample.act 20000\n\nbroken.act 100\nexample.act\n")
+
+    def test_readjobs(self):
+        """Test that the accounts of a manifest and of a directory are all found, with their amounts"""
+        example = os.path.join(self._directory.name, "example.act")
+        broken = os.path.join(self._directory.name, "broken.act")
+        self.assertEqual([(example, "20000"), (broken, "100"), (example, 5)], batch.read_jobs(self._manifest, 5))
+        self.assertEqual([(broken, 5), (example, 5)], batch.read_jobs(self._directory.name, 5))
+
+    def test_runbatch(self):
+        """Test that every account gets a line, failed accounts with an error"""
+        output = StringIO()
+        result = batch.run_batch(batch.read_jobs(self._manifest), 2, output, 1)
+        self.assertEqual((3, 2), result)
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(3, len(lines))
+        self.assertEqual("Pfif's temp account", lines[0]["name"])
+        self.assertEqual([20000, 20975], lines[0]["total"])
+        self.assertIn("error", lines[1])
+        self.assertIn("error", lines[2])
+
+class ServerTest(AccountFileTestMixin, unittest.TestCase):
+    def setUp(self):
+        super(ServerTest, self).setUp()
+        self._socket = os.path.join(self._directory.name, "socket")
+
+    def requests(self, *requests):
+        """Send requests to a server, each on its own connection at the same time, and return the responses"""
+        async def send(request):
+            reader, writer = await asyncio.open_unix_connection(self._socket)
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            response = json.loads(await reader.readline())
+            writer.close()
+            return response
+
+        async def run():
+            async with await server.Server().start(self._socket):
+                return await asyncio.gather(*(send(request) for request in requests))
+        return asyncio.run(run())
+
+    def test_available(self):
+        """Test that the amounts of the periods are given, and that a changed file is read again"""
+        request = {"command": "available", "account_file": self._account_file, "amount": 20000}
+        expected = [{key: value for key, value in period._asdict().items() if key != "operations"}
+                    for period in io.read_account_file(20000, self._account_file).periods(stop=2)]
+        response = self.requests(request)[0]
+        self.assertEqual("Pfif's temp account", response["name"])
+        self.assertEqual(expected, response["periods"])
+
+        self.assertEqual([20000, 20975], self.requests(dict(request, command="projection"))[0]["total"])
+
+    def test_reload(self):
+        """Test that an account file is read again when it changes, and only then"""
+        cache = server.AccountCache()
+        account = cache.get(self._account_file)
+        self.assertIs(account, cache.get(self._account_file))
+        with open(self._account_file, "a") as file:
+            file.write("NAME = \"Changed\"\n")
+        self.assertEqual("Changed", cache.get(self._account_file).name)
+
+    def test_endperiod(self):
+        """Test that concurrent ends of period on the same account are all written"""
+        expected = io.read_account_file(None, self._account_file).next().next().next()
+        responses = self.requests(*[{"command": "endperiod", "account_file": self._account_file}] * 3)
+        self.assertEqual([self._account_file] * 3, [response["filename"] for response in responses])
+        account = io.read_account_file(None, self._account_file)
+        self.assertEqual([repr(op) for op in expected.operations], [repr(op) for op in account.operations])
+
+        request = {"command": "available", "account_file": self._account_file, "amount": 20000}
+        responses = self.requests({"command": "endperiod", "account_file": self._account_file, "journal": True}, request)
+        self.assertEqual(journal.journal_filename(self._account_file), responses[0]["journal"])
+        expected = expected.next().with_amount(20000)
+        self.assertEqual(expected.avaliable(), responses[1]["periods"][0]["avaliable"])
+
+    def test_endperiodcache(self):
+        """Test that the account kept after an end of period does not keep the periods before it"""
+        answering = server.Server()
+        for i in range(3):
+            asyncio.run(answering.endperiod({"command": "endperiod", "account_file": self._account_file}))
+        account = answering._cache.get(os.path.abspath(self._account_file))
+        self.assertIs(Account, type(account))
+        self.assertEqual([repr(op) for op in io.read_account_file(None, self._account_file).operations], [repr(op) for op in account.operations])
+
+    def test_errors(self):
+        """Test that invalid requests get an error"""
+        responses = self.requests({"command": "unknown"}, {"command": "available", "account_file": self._account_file},
+                                  {"command": "endperiod", "account_file": self._account_file, "output": self._account_file + ".copy"},
+                                  {"command": "available", "account_file": self._account_file, "amount": 20000, "periods": 10 ** 9},
+                                  {"command": "endperiod", "account_file": self._account_file, "periods": server.MAX_PERIODS + 1},
+                                  {"command": "endperiod", "account_file": self._account_file, "periods": 0})
+        self.assertEqual([["error"]] * 6, [list(response) for response in responses])
+        self.assertFalse(os.path.exists(self._account_file + ".copy"))
+
+class StartupTest(unittest.TestCase):
+    """Test that the command line starts quickly"""
+    EXAMPLE_ACCOUNT = os.path.join(os.path.dirname(__file__), "example_account.act")
+    #Microseconds that importing the entrypoint may take, as measured by -X importtime (about 30000 when written)
+    IMPORT_TIME_BUDGET = 100000
+    SLOW_MODULES = ("argparse", "ast", "inspect", "hashlib", "asyncio", "multiprocessing", "numpy")
+
+    def import_times(self):
+        """Return the cumulative import time of each module imported by the entrypoint, in microseconds"""
+        command = [sys.executable, "-X", "importtime", "-c", "import pyrestriction.entrypoint"]
+        result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        times = dict()
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1])
+        return times
+
+    def test_importtime(self):
+        """Test that importing the entrypoint stays within its budget, without importing the modules only some commands need"""
+        runs = [self.import_times() for i in range(3)]
+        self.assertEqual([], [module for module in self.SLOW_MODULES if module in runs[0]])
+        self.assertLess(min(times["pyrestriction.entrypoint"] for times in runs), self.IMPORT_TIME_BUDGET)
+
+    def test_fastavailable(self):
+        """Test that the fast available command shows the same thing as the parser, and leaves anything else to the parser"""
+        for nb_periods, layout in (("2", "full"), ("5", "table")):
+            outputs = list()
+            #--periods=N is not handled by the fast command
+            for options in (["--periods", nb_periods, "--layout", layout], ["--periods=" + nb_periods, "--layout", layout]):
+                with patch("sys.argv", ["pyrestriction", "available", self.EXAMPLE_ACCOUNT, "20000"] + options), patch("sys.stdout", StringIO()) as stdout:
+                    entrypoint()
+                outputs.append(stdout.getvalue())
+            self.assertIn("Pfif's temp account", outputs[0])
+            self.assertEqual(outputs[0], outputs[1])
+
+        for arguments in (["available", self.EXAMPLE_ACCOUNT], ["available", self.EXAMPLE_ACCOUNT, "20000", "--periods"],
+                          ["available", self.EXAMPLE_ACCOUNT, "a lot"], ["available", "-h"], ["format", self.EXAMPLE_ACCOUNT],
+                          ["available", self.EXAMPLE_ACCOUNT, "20000", "--periods", "0"]):
+            self.assertIsNone(fast_available(arguments))
+
+    def test_wrongperiods(self):
+        """Test that periods before the current one, or no periods at all, cannot be shown"""
+        for wrong in (["--from", "-1"], ["--periods", "0"], ["--periods", "-3"]):
+            with patch("sys.argv", ["pyrestriction", "available", self.EXAMPLE_ACCOUNT, "20000"] + wrong), \
+                    patch("sys.stdout", StringIO()) as stdout, patch("sys.stderr", StringIO()) as stderr:
+                self.assertRaises(SystemExit, entrypoint)
+            self.assertEqual("", stdout.getvalue())
+            self.assertIn("period", stderr.getvalue())
+
+    def test_invalidaccountfile(self):
+        """Test that an invalid account file is reported as an error of the command line, by the fast command as well"""
+        with tempfile.TemporaryDirectory() as directory:
+            account_file = os.path.join(directory, "invalid.act")
+            with open(account_file, "w") as file:
+                file.write('NAME = "Invalid"\nREGULAR_INCOME = 0\nCURRENCY = "PND"\nOPERATIONS = [SavingOperation()]\n')
+            for arguments in (["available", account_file, "20000"], ["endperiod", account_file]):
+                with patch("sys.argv", ["pyrestriction"] + arguments), patch("sys.stdout", StringIO()), patch("sys.stderr", StringIO()) as stderr:
+                    self.assertRaises(SystemExit, entrypoint)
+                self.assertIn("line 4: SavingOperation: missing a required argument", stderr.getvalue())
+
+class JournalTest(AccountFileTestMixin, unittest.TestCase):
+    def setUp(self):
+        super(JournalTest, self).setUp()
+        self._expected = io.read_account_file(None, self._account_file).next().advance(3)
+
+    def assertExpectedAccount(self, account):
+        self.assertEqual([repr(op) for op in self._expected.operations], [repr(op) for op in account.operations])
+
+    def test_journal(self):
+        """Test that ends of period are recorded in the journal without writing the account file, and read back"""
+        with open(self._account_file) as file:
+            content = file.read()
+        self.run_command("endperiod", "--journal", self._account_file)
+        self.run_command("endperiod", "--journal", "--periods", "3", self._account_file)
+        with open(self._account_file) as file:
+            self.assertEqual(content, file.read())
+        self.assertEqual([1, 3], journal.records(self._account_file))
+
+        account = io.read_account_file(20000, self._account_file)
+        self.assertExpectedAccount(account)
+        self.assertEqual(20000, account.total())
+        self.assertIn("Total amount : 20000", self.run_command("available", self._account_file, "20000"))
+
+    def test_compact(self):
+        """Test that compact writes the journal to the account file and removes it, and that an old journal is ignored"""
+        self.run_command("endperiod", "--journal", self._account_file)
+        self.run_command("endperiod", "--journal", "--periods", "3", self._account_file)
+        with open(journal.journal_filename(self._account_file)) as file:
+            old_journal = file.read()
+        self.run_command("compact", self._account_file)
+        self.assertFalse(os.path.exists(journal.journal_filename(self._account_file)))
+        self.assertExpectedAccount(io.read_account_file(None, self._account_file))
+
+        #As if compact had stopped before removing the journal
+        with open(journal.journal_filename(self._account_file), "w") as file:
+            file.write(old_journal)
+        self.assertEqual([], journal.records(self._account_file))
+        self.assertExpectedAccount(io.read_account_file(None, self._account_file))
+
+    def test_generation(self):
+        """Test that a journal is ignored once its account file changed, even with the same size, modification time and inode"""
+        account = io.read_account_file(None, self._account_file)
+        io.write_account_file(account, self._account_file)
+        journal.append(self._account_file, 2)
+        self.assertEqual([2], journal.records(self._account_file))
+
+        status = os.stat(self._account_file)
+        with open(self._account_file, "rb") as file:
+            content = file.read()
+        #Written again in place, with the same account but another generation
+        with open(self._account_file, "wb") as file:
+            file.write(content[:-journal.GENERATION_LINE_LENGTH] + journal.generation_line().encode("ascii"))
+        os.utime(self._account_file, ns=(status.st_atime_ns, status.st_mtime_ns))
+        self.assertEqual((status.st_ino, status.st_size), (os.stat(self._account_file).st_ino, os.stat(self._account_file).st_size))
+        self.assertEqual([], journal.records(self._account_file))
+
+        #Account files written by hand are told by their size and modification time
+        with open(self.EXAMPLE_ACCOUNT) as example, open(self._account_file, "w") as file:
+            file.write(example.read())
+        journal.append(self._account_file, 1)
+        self.assertEqual([1], journal.records(self._account_file))
+        with open(self._account_file, "a") as file:
+            file.write("\n")
+        self.assertEqual([], journal.records(self._account_file))
+
+    def test_cutrecord(self):
+        """Test that a record cut short is ignored, and does not spoil the next ones"""
+        journal.append(self._account_file, 1)
+        with open(journal.journal_filename(self._account_file), "a") as file:
+            file.write("endperiod 5")
+        self.assertEqual([1], journal.records(self._account_file))
+        journal.append(self._account_file, 3)
+        self.assertEqual([1, 3], journal.records(self._account_file))
+
+class ScenarioTest(unittest.TestCase):
+    """Test the comparison of what-if scenarios on an account"""
+    NB_PERIODS = 12
+
+    def setUp(self):
+        self._operations = list(AdvanceTest.OPERATIONS[:-1])
+        self._account = Account(20000, 1000, "Scenario test", "PND", list(self._operations))
+
+    def assertSameProjection(self, expected, result):
+        for name in ("total", "saved", "debt", "avaliable"):
+            for expected_amount, amount in zip(getattr(expected, name), getattr(result, name)):
+                self.assertAlmostEqual(expected_amount, amount)
+
+    def test_scenarios(self):
+        """Test that each scenario gives the amounts of the account changed the same way"""
+        new_debt = DebtOperation(600, 4, False, 0)
+        scenarios = [
+            self._account.scenario("Nothing"),
+            self._account.scenario("New debt").add(new_debt),
+            self._account.scenario("No payment").remove(self._operations[7]),
+            self._account.scenario("Other debt").override(self._operations[4], new_debt).add(SavingOperation(50)),
+        ]
+        expected_operations = [
+            self._operations,
+            self._operations + [new_debt],
+            self._operations[:7] + self._operations[8:],
+            self._operations[:4] + [new_debt] + self._operations[5:] + [SavingOperation(50)],
+        ]
+
+        comparison = self._account.compare(scenarios, self.NB_PERIODS)
+        for scenario, operations in zip(scenarios, expected_operations):
+            expected = projection.project(Account(20000, 1000, "Scenario test", "PND", operations), self.NB_PERIODS)
+            self.assertSameProjection(expected, comparison.projections[scenario.name])
+        self.assertEqual(len(self._operations), len(self._account.operations))
+
+        names, avaliable = comparison.avaliable()
+        self.assertEqual(["Scenario test", "Nothing", "New debt", "No payment", "Other debt"], names)
+        self.assertEqual(self.NB_PERIODS, len(avaliable))
+        self.assertEqual(comparison.base.avaliable[3], avaliable[3][0])
+        self.assertEqual(comparison.projections["New debt"].avaliable[3], avaliable[3][2])
+
+    def test_removeunknown(self):
+        """Test that an operation the account does not have cannot be removed"""
+        with self.assertRaises(ValueError):
+            self._account.scenario("Unknown").remove(SavingOperation(1))
+
+    def test_comparisonview(self):
+        """Test that the avaliable amounts are shown in a column per scenario"""
+        scenario = self._account.scenario("New debt").add(DebtOperation(600, 4, False, 0))
+        output = StringIO()
+        ComparisonView(self._account.compare([scenario], 3), output).render()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(["Period", "Scenario test", "New debt"], [column.strip() for column in lines[3].split("|")])
+        self.assertEqual("Current", lines[4].split("|")[0].strip())
+        self.assertEqual(3, len(lines) - 4)
+
+class GoalsTest(unittest.TestCase):
+    """Test the questions about what an account can afford"""
+    NB_PERIODS = 24
+
+    def setUp(self):
+        self._account = Account(2000, 1000, "Goals test", "PND", list(AdvanceTest.OPERATIONS[:-1]))
+        self._avaliable = projection.project(self._account, self.NB_PERIODS, use_numpy=False).avaliable
+
+    def test_earliestaffordableperiod(self):
+        """Test that the period found is the first one from which the price can be taken from every avaliable amount"""
+        for price in (0, 500, 2000, 5000, 15000, 10 ** 6):
+            expected = next((period for period in range(self.NB_PERIODS)
+                             if all(amount >= price for amount in self._avaliable[period:])), None)
+            self.assertEqual(expected, goals.earliest_affordable_period(self._account, price, self.NB_PERIODS))
+
+    def test_maximumregularsaving(self):
+        """Test that the saving found can be added, but not one more, with logarithmically many evaluations"""
+        def lowest_avaliable(total_amount):
+            account = Account(2000, 1000, "Goals test", "PND", list(AdvanceTest.OPERATIONS[:-1]) + [RegularSavingOperation(total_amount, 6, 0)])
+            return min(projection.project(account, self.NB_PERIODS, use_numpy=False).avaliable)
+
+        with profiling.profiled() as report:
+            amount = goals.maximum_regular_saving(self._account, 6, self.NB_PERIODS)
+        self.assertGreaterEqual(lowest_avaliable(amount), 0)
+        self.assertLess(lowest_avaliable(amount + 1), 0)
+        self.assertLessEqual(report["counters"]["goal_evaluation"], 2 * amount.bit_length() + 2)
+
+    def test_nosaving(self):
+        """Test that nothing can be saved on an account that runs out of money"""
+        account = Account(10, 0, "Goals test", "PND", [DebtOperation(100, 2, False, 0)])
+        self.assertIsNone(goals.maximum_regular_saving(account, 6, self.NB_PERIODS))
+        self.assertIsNone(goals.earliest_affordable_period(account, 10, self.NB_PERIODS))
+
+    def test_wrongperiods(self):
+        """Test that the searches refuse to look at no period or to save over no period, and always end"""
+        for nb_period_left, nb_periods in ((0, self.NB_PERIODS), (-1, self.NB_PERIODS), (6, 0)):
+            self.assertRaises(ValueError, goals.maximum_regular_saving, self._account, nb_period_left, nb_periods)
+        self.assertRaises(ValueError, goals.earliest_affordable_period, self._account, 10, 0)
+        self.assertEqual(1000, goals.maximum_regular_saving(Account(1000, 0, "Goals test", "PND"), 1, self.NB_PERIODS))
+        self.assertEqual(1000, goals.maximum_regular_saving(Account(1000.5, 0, "Goals test", "PND"), 1, self.NB_PERIODS))
+
+        example_account = os.path.join(os.path.dirname(__file__), "example_account.act")
+        with patch("sys.stderr", StringIO()):
+            for arguments in (["maxsaving", example_account, "20000", "0"], ["maxsaving", example_account, "20000", "6", "--periods", "0"],
+                              ["afford", example_account, "20000", "10", "--periods", "0"]):
+                with patch("sys.argv", ["pyrestriction"] + arguments):
+                    self.assertRaises(SystemExit, entrypoint)
+
+class MonteCarloTest(unittest.TestCase):
+    """Test the simulation of accounts with a varying income"""
+    NB_PERIODS = 12
+    #NumPy is optional: without it, only the lists are tested
+    USE_NUMPY = (True, False) if montecarlo.numpy is not None else (False,)
+
+    def setUp(self):
+        self._account = Account(2000, 1000, "Monte Carlo test", "PND", list(AdvanceTest.OPERATIONS[:-1]))
+
+    def test_fixedincome(self):
+        """Test that without randomness, every percentile is the projected avaliable amount and there is no shortfall"""
+        expected = projection.project(self._account, self.NB_PERIODS, use_numpy=False).avaliable
+        for use_numpy in self.USE_NUMPY:
+            simulation = montecarlo.simulate(self._account, self.NB_PERIODS, 50, nb_workers=1, use_numpy=use_numpy)
+            for percentile in montecarlo.PERCENTILES:
+                for expected_amount, amount in zip(expected, simulation.percentiles[percentile]):
+                    self.assertAlmostEqual(expected_amount, amount)
+            self.assertEqual([0] * self.NB_PERIODS, simulation.shortfall)
+
+    def test_reproducible(self):
+        """Test that the same seed gives the same results whatever the number of workers, and another seed other results"""
+        income = montecarlo.parse_distribution("normal:1000:800")
+        for use_numpy in self.USE_NUMPY:
+            simulate = lambda seed, nb_workers: montecarlo.simulate(self._account, self.NB_PERIODS, 300, income, 0.1, seed,
+                                                                    nb_workers=nb_workers, batch_size=100, use_numpy=use_numpy)
+            simulation = simulate(1, 1)
+            self.assertEqual(simulation.percentiles, simulate(1, 2).percentiles)
+            self.assertEqual(simulation.shortfall, simulate(1, 2).shortfall)
+            self.assertNotEqual(simulation.percentiles, simulate(2, 1).percentiles)
+
+    def test_shortfall(self):
+        """Test that the probability of running out of money follows the income"""
+        account = Account(100, 0, "Monte Carlo test", "PND", [RegularPaymentOperation(100, False)])
+        income = montecarlo.parse_distribution("uniform:0:200")
+        simulation = montecarlo.simulate(account, 3, 20000, income, nb_workers=1)
+        self.assertEqual(0, simulation.shortfall[0])
+        self.assertAlmostEqual(0.5, simulation.shortfall[1], delta=0.03)
+        self.assertTrue(simulation.percentiles[5][2] < simulation.percentiles[50][2] < simulation.percentiles[95][2])
+
+    def test_wrongarguments(self):
+        """Test that simulations without periods, paths or workers, or with percentiles out of 0 to 100, are refused"""
+        for nb_periods, nb_paths, percentiles, nb_workers in ((0, 10, (50,), 1), (3, 0, (50,), 1), (3, 10, (150,), 1),
+                                                              (3, 10, (-1,), 1), (3, 10, (), 1), (3, 10, (50,), 0)):
+            self.assertRaises(ValueError, montecarlo.simulate, self._account, nb_periods, nb_paths,
+                              percentiles=percentiles, nb_workers=nb_workers)
+
+        example_account = os.path.join(os.path.dirname(__file__), "example_account.act")
+        with patch("sys.stderr", StringIO()):
+            for wrong in (["--paths", "0"], ["--periods", "0"], ["--percentiles", "150"], ["--workers", "0"]):
+                with patch("sys.argv", ["pyrestriction", "simulate", example_account, "20000"] + wrong):
+                    self.assertRaises(SystemExit, entrypoint)
+
+    def test_parsedistribution(self):
+        """Test that unknown distributions and wrong parameters are refused"""
+        with self.assertRaises(ValueError):
+            montecarlo.parse_distribution("poisson:3")
+        with self.assertRaises(ValueError):
+            montecarlo.parse_distribution("normal:3")
+
+class WatchTest(AccountFileTestMixin, unittest.TestCase):
+    """Test the watch of account files"""
+    def setUp(self):
+        super(WatchTest, self).setUp()
+        self._account = Account(None, 1000, "Watch test", "PND", list(AdvanceTest.OPERATIONS[:-1]))
+        io.write_account_file(self._account, self._account_file)
+
+    def write(self, operations):
+        """Write the account with operations, making sure that its version changes"""
+        account = Account(None, 1000, "Watch test", "PND", operations)
+        io.write_account_file(account, self._account_file)
+        status = os.stat(self._account_file)
+        os.utime(self._account_file, ns=(status.st_atime_ns, status.st_mtime_ns + 1000000))
+
+    def expected_output(self):
+        output = StringIO()
+        AccountView(io.read_account_file(20000, self._account_file), 12, TABLE, output).render()
+        return output.getvalue()
+
+    def test_diffoperations(self):
+        """Test that the operations removed and added are found, whatever their order"""
+        operations = self._account.operations
+        new_operation = SavingOperation(1)
+        removed, added = watch.diff_operations(operations, [new_operation] + operations[:3] + operations[4:])
+        self.assertEqual([operations[3]], removed)
+        self.assertEqual([new_operation], added)
+
+    def test_refresh(self):
+        """Test that the amounts are updated from the changed operations, and only shown again when they changed"""
+        self.check_refresh()
+
+    def test_refreshbinary(self):
+        """Test that the amounts of a binary account file, whose operations cannot be looked for, are updated from the changed operations"""
+        self._account_file = os.path.join(self._directory.name, "example.actb")
+        io.write_account_file(self._account, self._account_file)
+        self.check_refresh()
+
+    def check_refresh(self):
+        watched = watch.WatchedAccount(self._account_file, 20000, 12, TABLE)
+        self.assertEqual(self.expected_output(), watched.refresh())
+        self.assertIsNone(watched.refresh())
+
+        operations = list(self._account.operations)
+        operations[4] = DebtOperation(600, 4, False, 0)
+        self.write(operations)
+        with patch("pyrestriction.watch.project") as project:
+            output = watched.refresh()
+            project.assert_not_called()
+        expected = projection.project(io.read_account_file(20000, self._account_file), 12, use_numpy=False)
+        for expected_amount, amount in zip(expected.avaliable, watched.projection.avaliable):
+            self.assertAlmostEqual(expected_amount, amount)
+        self.assertIn("Avaliable", output)
+
+        #Written again, but with the same amounts
+        self.write(list(reversed(operations)))
+        self.assertIsNone(watched.refresh())
+
+    def test_inotify(self):
+        """Test that inotify notifies of the files written over, and of their journals"""
+        try:
+            notifier = watch.Inotify([self._account_file])
+        except OSError:
+            self.skipTest("inotify is not available")
+        try:
+            self.assertEqual(set(), notifier.wait(0))
+            io.write_account_file(self._account, self._account_file)
+            self.assertEqual({self._account_file}, notifier.wait(1))
+            journal.append(self._account_file, 1)
+            self.assertEqual({self._account_file}, notifier.wait(1))
+        finally:
+            notifier.close()
+
+    def test_inotifyoverflow(self):
+        """Test that every file is told to have changed when events were lost, and that the other events of no watched directory are skipped"""
+        other_file = self.copy_example("other.act")
+        try:
+            notifier = watch.Inotify([self._account_file, other_file])
+        except OSError:
+            self.skipTest("inotify is not available")
+        notifier.close()
+        reading, writing = os.pipe()
+        notifier._descriptor = reading
+        try:
+            name = os.path.basename(self._account_file).encode() + b"\0" * 4
+            watched_directory = next(iter(notifier._directories))
+            os.write(writing, watch.INOTIFY_EVENT.pack(-1, 0, 0, 0)
+                     + watch.INOTIFY_EVENT.pack(watched_directory, watch.IN_MODIFY, 0, len(name)) + name)
+            self.assertEqual({self._account_file}, notifier.wait(1))
+            os.write(writing, watch.INOTIFY_EVENT.pack(-1, watch.IN_Q_OVERFLOW, 0, 0))
+            self.assertEqual({self._account_file, other_file}, notifier.wait(1))
+        finally:
+            os.close(reading)
+            os.close(writing)
+
+class TimelineTest(unittest.TestCase):
+    """Test the lookup of the amounts of periods by segments"""
+    NB_PERIODS = 15
+
+    def assertSameSnapshots(self, expected, snapshots):
+        for expected_snapshot, snapshot in zip(expected, snapshots):
+            self.assertEqual(expected_snapshot.number, snapshot.number)
+            for name in ("total", "saved", "debt", "avaliable"):
+                self.assertAlmostEqual(getattr(expected_snapshot, name), getattr(snapshot, name))
+
+    def test_segments(self):
+        """Test that the segments of the operations give their amounts in every period"""
+        for operation in AdvanceTest.OPERATIONS + IntegerAmountsTest.OPERATIONS:
+            segments = operation.segments()
+            self.assertEqual(0, segments[0][0])
+            for period in range(self.NB_PERIODS):
+                start, amount, slope = [segment for segment in segments if segment[0] <= period][-1]
+                self.assertAlmostEqual(operation.amount_at(period), amount + slope * (period - start))
+
+    def test_timeline(self):
+        """Test that the timeline gives the amounts of the chain of periods, without going through it"""
+        account = Account(20000, 1000, "Timeline test", "PND", list(AdvanceTest.OPERATIONS[:-1]))
+        with profiling.profiled() as report:
+            timeline = account.timeline()
+            snapshots = [timeline.at(period) for period in range(self.NB_PERIODS)]
+        self.assertEqual({}, report["counters"])
+        self.assertLess(len(timeline), self.NB_PERIODS)
+
+        expected = list(account.periods(stop=self.NB_PERIODS))
+        self.assertSameSnapshots(expected, snapshots)
+        self.assertSameSnapshots(expected[5:12], timeline.periods(5, 12))
+        self.assertEqual(10 ** 6, timeline.at(10 ** 6).number)
+        self.assertRaises(IndexError, timeline.at, -1)
+
+    def test_integertimeline(self):
+        """Test that the timeline of an account with integer amounts is exact"""
+        account = Account(20000, 1000, "Timeline test", "PND", list(IntegerAmountsTest.OPERATIONS), integer_amounts=True)
+        self.assertEqual([period._replace(operations=None) for period in account.periods(stop=self.NB_PERIODS)],
+                         list(account.timeline().periods(0, self.NB_PERIODS)))
+
+    def test_floatsegmentstarts(self):
+        """Test that the saved and debt amounts of the first period of each segment are the ones of the chain, without accumulated rounding"""
+        operations = [SavingOperation(11.1), RegularSavingOperation(33.3, 3, 0), RegularSavingOperation(10.2, 7, 0.1),
+                      DebtOperation(0.3, 1, False, 0), RegularPaymentOperation(0.7, True), SavingOperation(5)]
+        account = Account(20000, 1000, "Timeline test", "PND", operations)
+        timeline = account.timeline()
+        expected = list(account.periods(stop=self.NB_PERIODS))
+        for start in timeline.starts:
+            snapshot = timeline.at(start)
+            self.assertEqual((expected[start].saved, expected[start].debt), (snapshot.saved, snapshot.debt))
+            self.assertEqual((type(expected[start].saved), type(expected[start].debt)), (type(snapshot.saved), type(snapshot.debt)))
+        self.assertEqual(33.3 + 10.2, timeline.at(10).saved)
+        self.assertSameSnapshots(expected, timeline.periods(0, self.NB_PERIODS))
+
+        account = Account(20000, 1000, "Timeline test", "PND", [DebtOperation(0.3, 3, False, 0), SavingOperation(4)])
+        self.assertEqual(0, account.timeline().at(3).debt)
+        self.assertIs(int, type(account.timeline().at(3).debt))
+
+    def test_neverending(self):
+        """Test that an operation only known by next can be used for a number of periods, and is refused forever instead of hanging"""
+        class Forever(Operation):
+            def next(self):
+                return self
+        account = Account(20000, 1000, "Timeline test", "PND", [Forever(30), OperationWithNext(40, True)])
+        with patch("pyrestriction.model.LAST_PERIOD_HORIZON", 100):
+            self.assertRaises(ValueError, account.timeline)
+        timeline = account.timeline(self.NB_PERIODS)
+        self.assertSameSnapshots(list(account.periods(stop=self.NB_PERIODS)), timeline.periods(0, self.NB_PERIODS))
+        self.assertRaises(IndexError, timeline.at, self.NB_PERIODS)
+        self.assertEqual(1, OperationWithNext(40, True).last_period())
+
+        output = StringIO()
+        AccountView(account, 3, TABLE, output, start=100).render()
+        self.assertIn("100 | 119920 |", output.getvalue())
+
+    def test_operationsonly(self):
+        """Test that the total and avaliable amounts are unknown in OperationOnly mode"""
+        account = Account(None, 1000, "Timeline test", "PND", [SavingOperation(200)])
+        snapshot = account.timeline().at(3)
+        self.assertEqual((None, 0, None), (snapshot.total, snapshot.saved, snapshot.avaliable))
+
+    def test_viewfrom(self):
+        """Test that the periods shown from a later period are the ones of the chain"""
+        account = Account(20000, 1000, "Timeline test", "PND", list(IntegerAmountsTest.OPERATIONS), integer_amounts=True)
+        output = StringIO()
+        AccountView(account, 3, TABLE, output, start=5).render()
+        rows = [line.split("|") for line in output.getvalue().splitlines()[4:]]
+        for row, period in zip(rows, list(account.periods(stop=8))[5:]):
+            self.assertEqual(str(period.number), row[0].strip())
+            self.assertEqual([period.total, period.debt, period.saved, period.avaliable], [float(value) for value in row[1:]])
+        self.assertEqual(3, len(rows))
+
+class ProjectionCacheTest(AccountFileTestMixin, unittest.TestCase):
+    """Test the projections kept on disk"""
+    def setUp(self):
+        super(ProjectionCacheTest, self).setUp()
+        self._cache_dir = os.path.join(self._directory.name, "cache")
+        self._account_files = [self._account_file, self.copy_example("other.act")]
+        self._reads = list()
+
+    def read_account(self, current_amount, filename):
+        self._reads.append(filename)
+        return io.read_account_file(current_amount, filename)
+
+    def entries(self):
+        return sorted(os.listdir(self._cache_dir)) if os.path.isdir(self._cache_dir) else []
+
+    def test_hit(self):
+        """Test that a projection is only computed once, and shown exactly like without the cache"""
+        projection_cache = cache.ProjectionCache(self._cache_dir)
+        for start in (0, 50):
+            expected = StringIO()
+            AccountView(io.read_account_file(20000, self._account_files[0]), 4, TABLE, expected, start=start).render()
+            for i in range(2):
+                entry = projection_cache.available(self._account_files[0], 20000, start, 4, self.read_account)
+                output = StringIO()
+                AccountView(entry, 4, TABLE, output, projection=entry.projection, start=start).render()
+                self.assertEqual(expected.getvalue(), output.getvalue())
+        self.assertEqual([self._account_files[0]] * 2, self._reads)
+
+        projection_cache.available(self._account_files[0], 30000, 0, 4, self.read_account)
+        self.assertEqual(3, len(self._reads))
+
+    def test_command(self):
+        """Test that the available command shows the same thing with the cache, from the fast command and from the parser"""
+        expected = self.run_command("available", self._account_files[0], "20000", "--periods", "3")
+        self.assertEqual(expected, self.run_command("--projection-cache", self._cache_dir, "available", self._account_files[0], "20000", "--periods", "3"))
+        with profiling.profiled() as report:
+            output = self.run_command("--projection-cache", self._cache_dir, "available", self._account_files[0], "20000", "--periods=3")
+        self.assertEqual(expected, output)
+        self.assertEqual({"projection_cache_hit": 1}, report["counters"])
+        self.assertNotIn("parse", report["phases"])
+
+    def test_entry(self):
+        """Test that the amounts of an entry are read back with their types, and that a broken entry is a miss"""
+        amounts = projection.Projection([20000, 20975.0], [313, 156.5], [25.0, 0], [19662.0, 20818.5])
+        entry = cache.unpack_entry(cache.pack_entry(cache.CachedProjection("Name", "PND", 3, amounts)))
+        self.assertEqual(("Name", "PND", 3), (entry.name, entry.currency, entry.start))
+        for column in ("total", "saved", "debt", "avaliable"):
+            self.assertEqual([(value, type(value)) for value in getattr(amounts, column)],
+                             [(value, type(value)) for value in getattr(entry.projection, column)])
+
+        projection_cache = cache.ProjectionCache(self._cache_dir)
+        key = projection_cache.key(self._account_files[0], 20000, 0, 2)
+        projection_cache.put(key, entry)
+        self.assertIsNotNone(projection_cache.get(key))
+        with open(os.path.join(self._cache_dir, key + cache.EXTENSION), "r+b") as file:
+            file.truncate(cache.HEADER.size + 10)
+        self.assertIsNone(projection_cache.get(key))
+
+    def test_key(self):
+        """Test that the key of an account file changes when it or its journal changes"""
+        projection_cache = cache.ProjectionCache(self._cache_dir)
+        key = projection_cache.key(self._account_files[0], 20000, 0, 2)
+        self.assertEqual(key, projection_cache.key(self._account_files[0], 20000, 0, 2))
+        self.assertNotEqual(key, projection_cache.key(self._account_files[1], 20000, 0, 2))
+        for other in ((20001, 0, 2), (20000, 1, 2), (20000, 0, 3)):
+            self.assertNotEqual(key, projection_cache.key(self._account_files[0], *other))
+        journal.append(self._account_files[0], 1)
+        self.assertNotEqual(key, projection_cache.key(self._account_files[0], 20000, 0, 2))
+
+    def test_eviction(self):
+        """Test that the entries not used for too long, and then the least recently used ones, are evicted"""
+        projection_cache = cache.ProjectionCache(self._cache_dir)
+        for nb_periods in (2, 3, 4):
+            projection_cache.available(self._account_files[0], 20000, 0, nb_periods, self.read_account)
+        old, used, new = [projection_cache.key(self._account_files[0], 20000, 0, nb_periods) + cache.EXTENSION for nb_periods in (2, 3, 4)]
+        now = time.time()
+        for entry, age in ((old, 3600), (used, 60), (new, 10)):
+            os.utime(os.path.join(self._cache_dir, entry), (now - age, now - age))
+
+        projection_cache.max_age = 1800
+        projection_cache.evict()
+        self.assertEqual(sorted([used, new]), self.entries())
+
+        projection_cache.get(used[:-len(cache.EXTENSION)])
+        projection_cache.max_size = os.path.getsize(os.path.join(self._cache_dir, used))
+        projection_cache.evict()
+        self.assertEqual([used], self.entries())
+
+    def test_invalidate(self):
+        """Test that writing an account file removes its entries, and only them"""
+        for account_file in self._account_files:
+            self.run_command("--projection-cache", self._cache_dir, "available", account_file, "20000")
+        other_entries = [entry for entry in self.entries() if entry.startswith(cache._account_prefix(self._account_files[1]))]
+        self.assertEqual(2, len(self.entries()))
+
+        for command in (["endperiod"], ["endperiod", "--journal"], ["format"]):
+            self.run_command("--projection-cache", self._cache_dir, "available", self._account_files[0], "20000")
+            self.assertEqual(2, len(self.entries()))
+            self.run_command("--projection-cache", self._cache_dir, *command, self._account_files[0])
+            self.assertEqual(other_entries, self.entries())
+
+class DatesTest(AccountFileTestMixin, unittest.TestCase):
+    """Test the dates of the periods"""
+    ACCOUNT_STRING = """
+NAME = "Dated account"
+CURRENCY = "PND"
+REGULAR_INCOME = 1000
+{calendar}
+OPERATIONS = [SavingOperation(400), DebtOperation(200, 2, False, 150)]
+"""
+    MONTHLY = 'PERIOD_START = "2026-01-05"\nPERIOD_CADENCE = "monthly"'
+    EXPLICIT = 'PERIOD_DATES = ["2026-01-01", "2026-01-15", "2026-02-03", "2026-03-01"]'
+
+    def parse(self, calendar, current_amount=20000):
+        return parse_account(current_amount, self.ACCOUNT_STRING.format(calendar=calendar))
+
+    def test_cadences(self):
+        """Test the first and last days of the periods of each cadence, and that the period of a date is found by bisection"""
+        for cadence, first_days in (("daily", ["2026-01-30", "2026-01-31", "2026-02-01"]),
+                                    ("weekly", ["2026-01-30", "2026-02-06", "2026-02-13"]),
+                                    ("monthly", ["2026-01-28", "2026-02-28", "2026-03-28"])):
+            calendar = dates.Calendar(dates.CadenceDates(datetime.date(2026, 1, 28 if cadence == "monthly" else 30), cadence))
+            self.assertEqual(first_days, [calendar.first_day(period).isoformat() for period in range(3)])
+            self.assertEqual(calendar.first_day(1) - datetime.timedelta(days=1), calendar.last_day(0))
+            for period in (0, 1, 2, 5000):
+                self.assertEqual(period, calendar.period(calendar.first_day(period)))
+                self.assertEqual(period, calendar.period(calendar.last_day(period)))
+        self.assertRaises(ValueError, dates.CadenceDates, datetime.date(2026, 1, 31), "monthly")
+        self.assertRaises(ValueError, dates.CadenceDates, datetime.date(2026, 1, 1), "yearly")
+
+    def test_lazy(self):
+        """Test that looking for the period of a date only reads a few dates of a cadence"""
+        read = list()
+        class CountedDates(dates.CadenceDates):
+            def __getitem__(self, index):
+                read.append(index)
+                return super(CountedDates, self).__getitem__(index)
+        calendar = dates.Calendar(CountedDates(datetime.date(2026, 1, 1), "daily"))
+        self.assertEqual(100000, calendar.period(datetime.date(2026, 1, 1) + datetime.timedelta(days=100000)))
+        self.assertLess(len(read), 30)
+
+    def test_explicit(self):
+        """Test the periods of an explicit list of dates"""
+        calendar = self.parse(self.EXPLICIT).calendar
+        self.assertEqual((datetime.date(2026, 1, 15), datetime.date(2026, 2, 2)), (calendar.first_day(1), calendar.last_day(1)))
+        self.assertEqual([0, 1, 2], [calendar.period(datetime.date(2026, month, day)) for month, day in ((1, 14), (1, 20), (2, 28))])
+        for day in (datetime.date(2025, 12, 31), datetime.date(2026, 3, 1)):
+            self.assertRaises(NoPeriodDates, calendar.period, day)
+        self.assertFalse(calendar.has_dates(3))
+
+    def test_parse(self):
+        """Test that only the calendars that make sense can be set in an account file"""
+        self.assertIsNone(self.parse("").calendar)
+        self.assertEqual(datetime.date(2026, 2, 5), self.parse(self.MONTHLY).calendar.first_day(1))
+        for calendar in ('PERIOD_START = "2026-01-05"', 'PERIOD_CADENCE = "monthly"', self.MONTHLY + "\n" + self.EXPLICIT,
+                         'PERIOD_START = "2026-01-31"\nPERIOD_CADENCE = "monthly"', 'PERIOD_START = "2026-01-05"\nPERIOD_CADENCE = "yearly"',
+                         'PERIOD_START = "tomorrow"\nPERIOD_CADENCE = "daily"', 'PERIOD_DATES = ["2026-01-01"]',
+                         'PERIOD_DATES = ["2026-02-01", "2026-01-01"]'):
+            self.assertRaises(InvalidAccountFile, self.parse, calendar)
+
+    def test_endperiod(self):
+        """Test that the dates follow the account when periods end, and are written with it"""
+        for calendar, expected in ((self.MONTHLY, 'PERIOD_START = "2026-03-05"\nPERIOD_CADENCE = "monthly"\n'),
+                                   (self.EXPLICIT, 'PERIOD_DATES = ["2026-02-03", "2026-03-01"]\n')):
+            account = self.parse(calendar)
+            advanced = account.advance(2)
+            self.assertEqual(account.next().next().calendar.first_day(0), advanced.calendar.first_day(0))
+            self.assertEqual(account.calendar.first_day(2), advanced.calendar.first_day(0))
+            output = StringIO()
+            write_account(advanced, output)
+            self.assertIn(expected, output.getvalue())
+            self.assertEqual(advanced.calendar.first_day(0), parse_account(None, output.getvalue()).calendar.first_day(0))
+
+        output = StringIO()
+        write_account(self.parse(self.EXPLICIT).advance(3), output)
+        self.assertNotIn("PERIOD", output.getvalue())
+        self.assertRaises(InvalidAccountFile, binary.write_account, self.parse(self.MONTHLY), BytesIO())
+
+    def test_select(self):
+        """Test that the periods to show are chosen from dates"""
+        calendar = self.parse(self.MONTHLY).calendar
+        self.assertEqual((3, 2), dates.select_periods(None, 3, 2))
+        self.assertEqual((2, 2), dates.select_periods(calendar, 0, 2, on=datetime.date(2026, 3, 14)))
+        self.assertEqual((2, 3), dates.select_periods(calendar, 0, 2, on=datetime.date(2026, 3, 14), until=datetime.date(2026, 6, 4)))
+        self.assertEqual((0, 1), dates.select_periods(calendar, 0, 2, until=datetime.date(2026, 1, 5)))
+        self.assertRaises(NoPeriodDates, dates.select_periods, None, 0, 2, on=datetime.date(2026, 3, 14))
+        self.assertRaises(NoPeriodDates, dates.select_periods, calendar, 0, 2, on=datetime.date(2026, 3, 14), until=datetime.date(2026, 2, 1))
+
+    def test_command(self):
+        """Test that the available command shows the periods of dates, with their dates, with and without the projection cache"""
+        account_file = os.path.join(self._directory.name, "dated.act")
+        with open(account_file, "w") as file:
+            file.write(self.ACCOUNT_STRING.format(calendar=self.MONTHLY))
+        arguments = ["available", account_file, "20000", "--layout", "table", "--on", "2026-03-14", "--until", "2026-06-04"]
+        output = self.run_command(*arguments)
+        self.assertIn("2 | 2026-03-05 | 2026-04-04 |", output)
+        self.assertEqual(3, len(output.splitlines()) - 4)
+        for i in range(2):
+            self.assertEqual(output, self.run_command("--projection-cache", os.path.join(self._directory.name, "cache"), *arguments))
+
+        self.assertIn("Dates : 2026-01-05 to 2026-02-04", self.run_command("available", account_file, "20000"))
+        with patch("sys.stderr", StringIO()):
+            for wrong in (["--on", "2025-03-14"], ["--on", "March"], ["--until", "2026-06-04", "--periods", "3"], ["--on", "2026-03-14", "--from", "2"]):
+                self.assertRaises(SystemExit, self.run_command, "available", account_file, "20000", *wrong)
+
+        #The dates cannot be written in the binary format, which the command line reports without writing any file
+        with patch("sys.stderr", StringIO()) as stderr:
+            for arguments in (["format", account_file, "--output", account_file + "b"], ["endperiod", account_file, "--format", "binary"],
+                              ["endperiod", account_file, "--output", account_file + "b"]):
+                self.assertRaises(SystemExit, self.run_command, *arguments)
+        self.assertIn("binary format", stderr.getvalue())
+        self.assertEqual(["cache", "dated.act", "example.act"], sorted(os.listdir(self._directory.name)))
+        self.assertEqual(self.ACCOUNT_STRING.format(calendar=self.MONTHLY), open(account_file).read())